@@ -1,4 +1,3 @@
-from openai import AsyncOpenAI
 from config.config import settings
 import json
 import logging
@@ -65,11 +64,27 @@ class RateLimiter:
 # Глобальний інстанс rate limiter (14 запитів на хвилину)
 rate_limiter = RateLimiter(max_requests=14, time_window=60)
 
-# DeepSeek exposes an OpenAI-compatible API.
-client = AsyncOpenAI(
-    api_key=settings.DEEPSEEK_API_KEY,
-    base_url="https://api.deepseek.com",
-)
+# DeepSeek exposes an OpenAI-compatible API. The `openai` package takes
+# about a second to import on a small ARM box — most of the bot's own import
+# time — so it's imported on the first DeepSeek call (or by warm_up() in the
+# background once the bot is up), not when this module is imported.
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(
+            api_key=settings.DEEPSEEK_API_KEY,
+            base_url="https://api.deepseek.com",
+        )
+    return _client
+
+
+async def warm_up():
+    """Import openai and build the client off the event loop, ahead of the first call."""
+    await asyncio.to_thread(_get_client)
 
 # deepseek-v4-flash is a REASONING model — it emits chain-of-thought before the
 # answer. We deliberately DON'T pass max_tokens: capping the output truncates the
@@ -160,6 +175,20 @@ If no such link is found, return {"url": null}.
 No markdown, no extra text.
 """
 
+# Batch extraction (a burst of forwarded videos): the same rules as
+# SYSTEM_PROMPT, applied to a numbered list of texts in ONE request instead
+# of one request per video. Texts per request — keeps the prompt and the
+# reasoning output a manageable size.
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+6. BATCH INPUT:
+    You will receive SEVERAL texts, numbered "[0] ...", "[1] ...", etc.
+    Apply all rules above to EACH text independently.
+    Return ONLY valid JSON: {"items": [{"index": <int>, "title": <string>, "season": <int>, "episode": <int or null>}, ...]}
+    with exactly one item per input text.
+"""
+BATCH_MAX_TEXTS = 40
+
+
 async def _chat_json(messages: list[dict], retries: int = 2) -> dict | None:
     """
     Call DeepSeek in JSON mode and return the parsed object.
@@ -169,7 +198,7 @@ async def _chat_json(messages: list[dict], retries: int = 2) -> dict | None:
     """
     for attempt in range(retries + 1):
         await rate_limiter.acquire()
-        response = await client.chat.completions.create(
+        response = await _get_client().chat.completions.create(
             model=MODEL_NAME,
             messages=messages,
             response_format={"type": "json_object"},
@@ -237,6 +266,45 @@ async def extract_metadata(text: str) -> dict | None:
         return None
 
 
+async def extract_metadata_batch(texts: list[str]) -> list[dict | None]:
+    """
+    extract_metadata() for many texts in as few DeepSeek calls as possible
+    (BATCH_MAX_TEXTS per call). Returns one dict (or None) per text, in
+    order; texts the batch answer missed fall back to a single
+    extract_metadata() call each.
+    """
+    results: list[dict | None] = [None] * len(texts)
+    for start in range(0, len(texts), BATCH_MAX_TEXTS):
+        chunk = texts[start:start + BATCH_MAX_TEXTS]
+        numbered = "\n".join(f"[{i}] {text}" for i, text in enumerate(chunk))
+        try:
+            data = await _chat_json(
+                [
+                    {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Analyze these texts and extract metadata:\n{numbered}"},
+                ],
+            )
+        except Exception as e:
+            logger.error(f"Error calling DeepSeek API (batch of {len(chunk)}): {e}")
+            data = None
+        for item in (data or {}).get("items") or []:
+            try:
+                i = int(item.get("index"))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= i < len(chunk) and item.get("title"):
+                item["title"] = str(item["title"]).replace('_', ' ').strip()
+                item.pop("index", None)
+                results[start + i] = item
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        logger.warning(f"Batch extraction missed {len(missing)}/{len(texts)} texts — extracting them one by one.")
+        for i, data in zip(missing, await asyncio.gather(*(extract_metadata(texts[i]) for i in missing))):
+            results[i] = data
+    return results
+
+
 async def extract_watch_link(text: str, hyperlinks: list[tuple[str, str]] | None = None) -> str | None:
     """
     Uses DeepSeek to find a "watch online with dub" Telegram link inside an
@@ -2,6 +2,8 @@ import os
 import sqlite3
 import logging
 
+from core.db_executor import AsyncProxy
+
 logger = logging.getLogger(__name__)
 
 DB_PATH = "sessions/mappings.db"
@@ -16,6 +18,9 @@ class TitleMapper:
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
         self._init_db()
+        # Async facade for coroutines — runs on the shared DB thread:
+        #     await mapper.aio.get_mapping(raw_title)
+        self.aio = AsyncProxy(self)
 
     def _connect(self) -> sqlite3.Connection:
         conn = sqlite3.connect(self.db_path, check_same_thread=False)
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+
+from pyrogram.errors import FloodWait
+
+logger = logging.getLogger(__name__)
+
+# Per-method-class call budgets for the userbot account: (calls per minute,
+# burst). Telegram's flood control is per account and per method, and the
+# sensitive ones (joining by invite, reading replies/history) are far tighter
+# than the rest — one shared limit would either throttle cheap calls or let
+# the expensive ones trip FLOOD_WAIT. These are starting points: each bucket
+# slows itself down after a FloodWait (see TokenBucket.penalize).
+METHOD_BUDGETS: dict[str, tuple[float, int]] = {
+    "history":  (20, 3),   # search_messages / get_discussion_replies / get_chat_history
+    "join":     (2, 1),    # join_chat (ImportChatInvite / JoinChannel), leave_chat
+    "messages": (30, 5),   # get_messages (file reference refresh)
+    "folders":  (6, 2),    # get_folders / folder updates
+    "resolve":  (10, 3),   # get_chat by username / invite link
+    "media":    (12, 1),   # media session per download (see ApiScheduler.acquire)
+}
+
+# Raw MTProto function (TLObject.QUALNAME) -> method class. Everything the
+# high-level Pyrogram methods end up invoking goes through Client.invoke, so
+# classifying the raw call covers every code path (folder.py, telegram.py,
+# realtime.py) without wrapping each call site. Unlisted calls (updates,
+# GetState/GetDifference, ...) are never throttled, only held during a
+# global FloodWait pause.
+RAW_METHOD_CLASSES = {
+    "functions.messages.Search":              "history",
+    "functions.messages.GetReplies":          "history",
+    "functions.messages.GetHistory":          "history",
+    "functions.messages.GetDiscussionMessage": "history",
+    "functions.messages.ImportChatInvite":    "join",
+    "functions.messages.CheckChatInvite":     "join",
+    "functions.channels.JoinChannel":         "join",
+    "functions.channels.LeaveChannel":        "join",
+    "functions.messages.GetMessages":         "messages",
+    "functions.channels.GetMessages":         "messages",
+    "functions.messages.GetDialogFilters":    "folders",
+    "functions.messages.UpdateDialogFilter":  "folders",
+    "functions.contacts.ResolveUsername":     "resolve",
+    "functions.channels.GetChannels":         "resolve",
+    "functions.channels.GetFullChannel":      "resolve",
+}
+
+# Not in the map: upload.GetFile and auth.ExportAuthorization. Pyrogram's
+# get_file() opens a fresh media session per download and sends GetFile (one
+# per 1 MiB chunk) on that session directly, never through Client.invoke; the
+# ExportAuthorization it sends first only happens for files on a foreign DC.
+# Opening those sessions back-to-back is the suspected trigger of the
+# "Auth key not found" 401 on media sessions, so TelegramHandler.download()
+# takes one "media" token per download attempt instead — home DC included.
+# At (12, 1) that spaces session setups 5 s apart, like the old
+# INTER_DOWNLOAD_DELAY_SECONDS, without throttling the chunks themselves.
+
+# A FloodWait longer than this is not waited out inside the call — the caller
+# gets the error (the pause still applies to every later call).
+MAX_FLOOD_WAIT_SECONDS = 600
+
+# How many times one call is retried after waiting out a FloodWait.
+FLOOD_WAIT_RETRIES = 3
+
+# After a FloodWait a bucket runs at half its rate (down to this fraction of
+# the configured one) and earns back RECOVERY_STEP of the configured rate
+# per successful call.
+MIN_RATE_FRACTION = 0.1
+RECOVERY_STEP = 0.02
+
+STATS_LOG_INTERVAL_SECONDS = 3600
+
+
+class TokenBucket:
+    """Token bucket with a rate that adapts to FloodWaits."""
+
+    def __init__(self, name: str, per_minute: float, burst: int):
+        self.name = name
+        self.base_rate = per_minute / 60
+        self.rate = self.base_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, waiting for it if needed. Returns seconds waited."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def penalize(self, wait_seconds: float):
+        """A call of this class hit FloodWait — halve the rate and drain the bucket."""
+        self.rate = max(self.base_rate * MIN_RATE_FRACTION, self.rate / 2)
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+        logger.warning(
+            f"API scheduler: FLOOD_WAIT {wait_seconds:.0f}s on '{self.name}' — "
+            f"slowing to {self.rate * 60:.1f} calls/min."
+        )
+
+    def reward(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVERY_STEP)
+
+
+class ApiScheduler:
+    """
+    Single choke point for the userbot's Telegram API calls.
+
+    Replaces the hand-placed pauses between titles/downloads: every call
+    takes a token from its method class's bucket, so calls run back-to-back
+    while budget is available and are spaced out only when it isn't. A
+    FloodWait pauses ALL calls of the account for the requested time
+    (Telegram's limit is per account, the next call of any kind would likely
+    be refused too), slows the offending class down, and the call is retried
+    after the pause instead of failing the whole title.
+    """
+
+    def __init__(self, budgets: dict[str, tuple[float, int]] = METHOD_BUDGETS):
+        self.buckets = {name: TokenBucket(name, *budget) for name, budget in budgets.items()}
+        self._paused_until = 0.0
+
+        self.calls: dict[str, int] = {}
+        self.waited_seconds = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self._last_stats_log = time.monotonic()
+
+    def classify(self, query) -> str | None:
+        return RAW_METHOD_CLASSES.get(getattr(query, "QUALNAME", ""))
+
+    async def _wait_pause(self) -> float:
+        waited = 0.0
+        while (delay := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    async def invoke(self, call, query, **kwargs):
+        """
+        Run `call(query, **kwargs)` (the underlying Client.invoke) within the
+        budget of the query's method class. Pyrogram's own FloodWait sleeping
+        is disabled for these calls so every FloodWait is seen (and learned
+        from) here.
+        """
+        method = self.classify(query)
+        bucket = self.buckets.get(method)
+        for attempt in range(FLOOD_WAIT_RETRIES + 1):
+            waited = await self._wait_pause()
+            if bucket:
+                waited += await bucket.acquire()
+                # The bucket may have been waited on while a pause started.
+                waited += await self._wait_pause()
+            self.waited_seconds += waited
+            try:
+                result = await call(query, sleep_threshold=0, **kwargs)
+            except FloodWait as e:
+                seconds = float(e.value or 1)
+                self.flood_waits += 1
+                self.flood_wait_seconds += seconds
+                self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+                if bucket:
+                    bucket.penalize(seconds)
+                else:
+                    logger.warning(f"API scheduler: FLOOD_WAIT {seconds:.0f}s on {query.QUALNAME}.")
+                if seconds > MAX_FLOOD_WAIT_SECONDS or attempt == FLOOD_WAIT_RETRIES:
+                    raise
+                continue
+            if bucket:
+                bucket.reward()
+            key = method or "other"
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self._maybe_log_stats()
+            return result
+
+    async def acquire(self, method: str) -> float:
+        """
+        Take one token of `method`'s bucket for work that doesn't pass
+        through Client.invoke (a download's media session). Honours a running
+        FloodWait pause. Returns seconds waited.
+        """
+        bucket = self.buckets[method]
+        waited = await self._wait_pause()
+        waited += await bucket.acquire()
+        waited += await self._wait_pause()
+        self.waited_seconds += waited
+        self.calls[method] = self.calls.get(method, 0) + 1
+        return waited
+
+    def log_stats(self):
+        calls = ", ".join(f"{k}={v}" for k, v in sorted(self.calls.items())) or "none"
+        rates = ", ".join(
+            f"{b.name}={b.rate * 60:.1f}/min" for b in self.buckets.values() if b.rate < b.base_rate
+        )
+        logger.info(
+            f"API scheduler: calls {calls}; {self.waited_seconds:.1f}s spent waiting for budget; "
+            f"{self.flood_waits} FloodWaits ({self.flood_wait_seconds:.0f}s)"
+            + (f"; slowed: {rates}" if rates else "")
+        )
+
+    def _maybe_log_stats(self):
+        now = time.monotonic()
+        if now - self._last_stats_log >= STATS_LOG_INTERVAL_SECONDS:
+            self._last_stats_log = now
+            self.log_stats()
+
+
+# Global instance
+api_scheduler = ApiScheduler()
@@ -1,70 +1,129 @@
 import asyncio
+import itertools
 import logging
+import time
 
 from anime_tracker import db
+from anime_tracker.poll_schedule import PollScheduler
 from anime_tracker.sites import get_handler
 from config.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Base poll interval per title; the actual schedule adapts per title (see
+# anime_tracker/poll_schedule.py): dense polling around a predicted drop,
+# exponential backoff for titles with nothing new.
 CHECK_INTERVAL_HOURS = 6
 
-# Pause between titles when checking a batch (background cycle or manual
-# "Перевірити все") — even fully sequential (non-parallel) back-to-back API
-# calls from one account can add up fast enough to trip Telegram's flood
-# control on sensitive methods (join_chat/ImportChatInvite,
-# get_discussion_replies/GetReplies) once there are more than a couple of
-# tracked titles. A few seconds of breathing room between titles is cheap
-# against a 6-hour check interval.
-INTER_SERIES_DELAY_SECONDS = 4
+# With real-time detection active (anime_tracker/realtime.py), new episodes
+# are picked up from userbot updates within seconds — the polling cycle is
+# then only a reconciliation sweep for updates missed while offline or in
+# chats that don't push them (e.g. public channels the account hasn't joined).
+RECONCILE_INTERVAL_HOURS = 24
 
-# Pause between individual episode downloads within the same series.
-# Each download() opens its own per-DC media session (see anime_tracker/
-# sites/telegram.py) — reopening these back-to-back with zero delay is the
-# suspected trigger for the periodic "Auth key not found" 401 hiccup on the
-# media session. A short breather between downloads is cheap insurance.
-INTER_DOWNLOAD_DELAY_SECONDS = 5
+# Longest the checker sleeps without re-reading the active titles (picks up
+# newly added/stopped titles and expires old ones between due checks).
+RESYNC_MINUTES = 30
 
+# Batch checks (background cycle or "Перевірити все") run as a two-stage
+# pipeline: discovery (listing/resolving — a few API calls per title) for
+# every title runs ahead of the download stage (gigabytes per title), so the
+# new work across all titles is known within seconds of a cycle starting
+# instead of title N+1 waiting on title N's transfers. Telegram API pacing is
+# done by anime_tracker/api_scheduler.py, not by these limits.
+DISCOVERY_CONCURRENCY = 4
 
-async def process_series(series: db.sqlite3.Row, client, initial_status_msg=None) -> bool:
+# How many titles' downloads may be in flight together. Episode streams
+# are capped separately — per title and in total — by
+# settings.TRACKER_DOWNLOADS_PER_SERIES / TRACKER_DOWNLOADS_TOTAL.
+DOWNLOAD_CONCURRENCY = 2
+
+# Discovered titles waiting for a download slot. When full, discovery waits —
+# back-pressure rather than listing far ahead of what can be downloaded.
+DOWNLOAD_QUEUE_SIZE = 16
+
+
+# Retry ledger (download_failures table): a failed episode no longer stops
+# the rest of its title — it's skipped and retried after RETRY_BASE_MINUTES,
+# doubling per attempt (30m, 1h, 2h, 4h, ...), and after
+# MAX_DOWNLOAD_ATTEMPTS it's marked dead: shown in the 🔧 fix menu, retried
+# only from there.
+RETRY_BASE_MINUTES = 30
+MAX_DOWNLOAD_ATTEMPTS = 6
+
+
+# series_id -> Lock: one title is never processed twice at the same time
+# (real-time trigger, background cycle and manual "Перевірити все" can all
+# fire for the same title), which would download the same episode twice.
+_series_locks: dict[int, asyncio.Lock] = {}
+
+
+# Global cap on concurrent tracker episode downloads, across all titles.
+_download_slots = asyncio.Semaphore(max(1, settings.TRACKER_DOWNLOADS_TOTAL))
+
+
+def _series_lock(series_id: int) -> asyncio.Lock:
+    return _series_locks.setdefault(series_id, asyncio.Lock())
+
+
+async def process_series(series: db.sqlite3.Row, client, initial_status_msg=None,
+                         available: list[dict] | None = None) -> bool:
     """
-    Check and download all new (not yet downloaded) episodes for one series.
-    Returns True if at least one episode was downloaded.
+    Check and download all new (not yet downloaded) episodes for one series —
+    both stages back to back, serialized per title. Returns True if at least
+    one episode was downloaded.
+
+    `available` — episodes already listed by a shared channel scan (see
+    _list_shared); if None, the series' source is listed here.
 
     `initial_status_msg` — optional Message to finalize with the check result
     (used only for the immediate check triggered right after adding a title,
     so the "⏳ Перевіряю доступні серії..." status doesn't hang forever if
     there turn out to be no new episodes).
     """
-    series_id = series["id"]
-    chat_id   = series["chat_id"]
-    title     = series["title"]  # canonical Romaji — used for folder/file naming
-    display   = db.resolve_display_title(series)  # localized name shown to users (backfills legacy rows)
-    url       = series["base_url"]
-    category  = series["category"]
-    dest_path = settings.DOWNLOAD_PATH if category == "anime" else settings.DORAMA_PATH
-
-    async def _finalize_status(text: str):
+    async with _series_lock(series["id"]):
+        new_eps, summary, finale_downloaded = await _find_new_episodes(series, available)
         if initial_status_msg:
             try:
-                await initial_status_msg.edit_text(text)
+                await initial_status_msg.edit_text(summary)
             except Exception:
                 pass
+        if not new_eps and not finale_downloaded:
+            return False
+        return await _download_new_episodes(series, new_eps, client, finale_downloaded)
+
+
+async def _find_new_episodes(series: db.sqlite3.Row,
+                             available: list[dict] | None = None) -> tuple[list[dict], str, bool]:
+    """
+    Discovery stage: list the series' source (unless `available` is given)
+    and return its not-yet-downloaded episodes in (season, episode) order,
+    a one-line user-facing summary of the result, and whether the finale is
+    already downloaded (tracking stop deferred until earlier episodes finish
+    — see _finish_if_complete).
+    """
+    series_id = series["id"]
+    title     = series["title"]
+    display   = await db.aio.resolve_display_title(series)  # localized name shown to users (backfills legacy rows)
+    url       = series["base_url"]
 
     handler = get_handler(url)
     if not handler:
         logger.error(f"No handler for url: {url}")
-        await _finalize_status(f"❌ **{display}**: джерело не підтримується.")
-        return False
+        return [], f"❌ **{display}**: джерело не підтримується.", False
 
     # Fetch all currently available DUB episodes
-    available = await handler.list_episodes(url)
+    if available is None:
+        available = await handler.list_episodes(url)
     if not available:
         logger.info(f"[{title}] немає доступних дубльованих епізодів.")
-        await _finalize_status(f"⚠️ **{display}**: серій ще не знайдено.")
-        return False
+        return [], f"⚠️ **{display}**: серій ще не знайдено.", False
 
-    done = db.get_downloaded_set(series_id)
+    downloaded = await db.aio.get_downloaded_set(series_id)
+    finale_downloaded = any(
+        e.get("is_finale") and (e["season"], e["episode"]) in downloaded for e in available
+    )
+    done = downloaded | await db.aio.get_blocked_episodes(series_id)  # failed recently / dead — see retry ledger
     new_eps = sorted(
         (e for e in available if (e["season"], e["episode"]) not in done),
         key=lambda e: (e["season"], e["episode"])
@@ -72,119 +131,287 @@ async def process_series(series: db.sqlite3.Row, client, initial_status_msg=None
 
     if not new_eps:
         logger.info(f"[{title}] нових епізодів немає ({len(available)} вже завантажено).")
-        await _finalize_status(
-            f"✅ **{display}**: усі доступні серії вже завантажені ({len(available)})."
-        )
-        return False
+        return [], f"✅ **{display}**: усі доступні серії вже завантажені ({len(available)}).", finale_downloaded
 
     logger.info(f"[{title}] знайдено {len(new_eps)} нових епізодів.")
-    await _finalize_status(
-        f"✅ **{display}**: знайдено {len(new_eps)} нових серій — починаю завантаження..."
+    return (
+        new_eps,
+        f"✅ **{display}**: знайдено {len(new_eps)} нових серій — починаю завантаження...",
+        finale_downloaded,
     )
-    downloaded_any = False
 
-    for i, ep in enumerate(new_eps):
-        season, episode, source = ep["season"], ep["episode"], ep["source"]
 
-        if i > 0:
-            await asyncio.sleep(INTER_DOWNLOAD_DELAY_SECONDS)
+async def _download_new_episodes(series: db.sqlite3.Row, new_eps: list[dict], client,
+                                 finale_downloaded: bool = False) -> bool:
+    """
+    Download stage: download `new_eps` — up to TRACKER_DOWNLOADS_PER_SERIES
+    at a time (and TRACKER_DOWNLOADS_TOTAL across all titles), started in
+    (season, episode) order — recording and announcing each one as it
+    completes. Caller holds the series lock. Episodes downloaded (or failed)
+    since discovery (e.g. by a real-time check) are skipped; a failed
+    episode goes into the retry ledger and the rest still download.
 
-        notify_msg = None
-        try:
-            notify_msg = await client.send_message(
-                chat_id,
-                f"🎬 **{display}** S{season:02d}E{episode:02d}\n⏳ Починаю завантаження..."
+    Tracking stops once the finale is downloaded (now, or earlier:
+    `finale_downloaded`) AND no earlier episode is still waiting for a retry.
+    Returns True if at least one episode was downloaded.
+    """
+    series_id = series["id"]
+    title     = series["title"]  # canonical Romaji — used for folder/file naming
+    display   = await db.aio.resolve_display_title(series)
+    url       = series["base_url"]
+
+    handler = get_handler(url)
+    done = await db.aio.get_downloaded_set(series_id)
+    done |= await db.aio.get_blocked_episodes(series_id)
+    new_eps = [e for e in new_eps if (e["season"], e["episode"]) not in done]
+
+    per_series = asyncio.Semaphore(max(1, settings.TRACKER_DOWNLOADS_PER_SERIES))
+
+    async def _one(ep: dict) -> bool:
+        return await _download_episode(series, handler, display, ep, client, per_series)
+
+    results = await asyncio.gather(*(_one(ep) for ep in new_eps))
+    downloaded_any = any(results)
+
+    if finale_downloaded or any(ok and ep.get("is_finale") for ep, ok in zip(new_eps, results)):
+        await _finish_if_complete(series, handler, display, client)
+
+    return downloaded_any
+
+
+async def _download_episode(series: db.sqlite3.Row, handler, display: str, ep: dict, client,
+                            per_series: asyncio.Semaphore) -> bool:
+    """
+    Download, record and announce one episode (or log it in the retry
+    ledger). Returns success. The per-title and global download slots are
+    held only for the transfer — a move out of the scratch dir
+    (handler.finish_download) runs after they're freed.
+    """
+    series_id = series["id"]
+    chat_id   = series["chat_id"]
+    title     = series["title"]
+    dest_path = settings.DOWNLOAD_PATH if series["category"] == "anime" else settings.DORAMA_PATH
+    season, episode, source = ep["season"], ep["episode"], ep["source"]
+
+    notify_msg = None
+    try:
+        async with per_series, _download_slots:
+            try:
+                notify_msg = await client.send_message(
+                    chat_id,
+                    f"🎬 **{display}** S{season:02d}E{episode:02d}\n⏳ Починаю завантаження..."
+                )
+            except Exception as e:
+                logger.warning(f"Notify failed: {e}")
+
+            try:
+                ok = await handler.download(
+                    source, title, season, episode,
+                    dest_path, notify_msg=notify_msg
+                )
+            except Exception as e:
+                # handler.download() is expected to return False on failure, never
+                # raise — but guard against it anyway so a bug in a handler can't
+                # silently kill this task (asyncio.create_task is fire-and-forget
+                # on the immediate-add path in main.py).
+                logger.error(f"[{title}] download() raised unexpectedly: {e}", exc_info=True)
+                ok = False
+
+        if ok:
+            ok = await handler.finish_download(source)
+    finally:
+        handler.forget_download(source)
+
+    if ok:
+        await db.aio.record_episode(series_id, season, episode,
+                                    posted_at=ep.get("posted_at"), source=ep["source"])
+        done_text = f"✅ Завантажено: **{display}** S{season:02d}E{episode:02d}"
+        all_users = settings.allowed_users_set or {chat_id}
+        for uid in all_users:
+            try:
+                if uid == chat_id and notify_msg:
+                    await notify_msg.edit_text(done_text)
+                else:
+                    await client.send_message(uid, done_text)
+            except Exception as e:
+                logger.warning(f"Failed to notify {uid}: {e}")
+        return True
+
+    reason = handler.failure_reason(source) or "download failed"
+    failure = await db.aio.record_download_failure(
+        series_id, season, episode, reason, RETRY_BASE_MINUTES, MAX_DOWNLOAD_ATTEMPTS
+    )
+    if failure["dead"]:
+        logger.error(f"[{title}] S{season:02d}E{episode:02d} failed {failure['attempts']} times — giving up: {reason}")
+        retry_note = f"спроб: {failure['attempts']} — більше не повторюю, див. 🔧 Виправити тайтл"
+    else:
+        logger.warning(
+            f"[{title}] S{season:02d}E{episode:02d} failed (attempt {failure['attempts']}), "
+            f"retry after {failure['next_attempt_at']} UTC: {reason}"
+        )
+        retry_note = f"спроба {failure['attempts']}/{MAX_DOWNLOAD_ATTEMPTS}, повторю пізніше"
+    try:
+        if notify_msg:
+            await notify_msg.edit_text(
+                f"❌ Помилка завантаження: **{display}** S{season:02d}E{episode:02d}\n"
+                f"({retry_note})"
             )
+    except Exception:
+        pass
+    return False
+
+
+async def _finish_if_complete(series: db.sqlite3.Row, handler, display: str, client):
+    """
+    The finale is downloaded — stop tracking, unless an earlier episode is
+    still waiting for a retry (it would never be retried on a stopped title).
+    Dead episodes don't hold the stop back; they stay in the 🔧 fix menu.
+    """
+    series_id = series["id"]
+    title     = series["title"]
+    if await db.aio.get_next_retry_at(series_id):
+        logger.info(f"[{title}] фінал завантажено, але є серії на повторі — відстеження поки триває.")
+        return
+    await db.aio.stop_series(series_id)
+    try:
+        await handler.cleanup(series["base_url"])
+    except Exception as e:
+        logger.warning(f"[{title}] cleanup() after finale failed: {e}")
+    logger.info(f"[{title}] фінальна серія завантажена — відстеження зупинено.")
+    for uid in settings.allowed_users_set or {series["chat_id"]}:
+        try:
+            await client.send_message(uid, f"🏁 **{display}**: останню серію завантажено — знято з відстеження.")
         except Exception as e:
-            logger.warning(f"Notify failed: {e}")
+            logger.warning(f"Failed to notify {uid}: {e}")
+
+
+async def _list_shared(series_list: list) -> dict[int, list[dict]]:
+    """
+    Pre-list every series that shares its source with at least one other
+    tracked title (e.g. several topics of one media-library channel) in ONE
+    pass per source. Returns {series_id: available episodes}; series missing
+    from the result are listed individually by process_series as before.
+    """
+    groups: dict[tuple[type, str], list] = {}
+    handlers = {}
+    for s in series_list:
+        handler = get_handler(s["base_url"])
+        key = handler.shared_scan_key(s["base_url"]) if handler else None
+        if key:
+            groups.setdefault((type(handler), key), []).append(s)
+            handlers[(type(handler), key)] = handler
 
+    listed: dict[int, list[dict]] = {}
+    for group_key, members in groups.items():
+        if len(members) < 2:
+            continue
         try:
-            ok = await handler.download(
-                source, title, season, episode,
-                dest_path, notify_msg=notify_msg
-            )
+            by_url = await handlers[group_key].list_episodes_shared([s["base_url"] for s in members])
         except Exception as e:
-            # handler.download() is expected to return False on failure, never
-            # raise — but guard against it anyway so a bug in a handler can't
-            # silently kill this task (asyncio.create_task is fire-and-forget
-            # on the immediate-add path in main.py).
-            logger.error(f"[{title}] download() raised unexpectedly: {e}", exc_info=True)
-            ok = False
+            logger.error(f"Shared listing of {group_key[1]} failed, falling back to per-title: {e}")
+            continue
+        for s in members:
+            if s["base_url"] in by_url:
+                listed[s["id"]] = by_url[s["base_url"]]
+    return listed
 
-        if ok:
-            db.record_episode(series_id, season, episode)
-            downloaded_any = True
-            is_finale = ep.get("is_finale", False)
 
-            done_text = (
-                f"✅ Завантажено: **{display}** S{season:02d}E{episode:02d}"
-                + ("\n🏁 Це остання серія — знято з відстеження." if is_finale else "")
-            )
+async def check_series_batch(series_list: list, client) -> dict[int, bool]:
+    """
+    Check a batch of titles (background cycle or manual "Перевірити все").
 
-            all_users = settings.allowed_users_set or {chat_id}
-            for uid in all_users:
-                try:
-                    if uid == chat_id and notify_msg:
-                        await notify_msg.edit_text(done_text)
-                    else:
-                        await client.send_message(uid, done_text)
-                except Exception as e:
-                    logger.warning(f"Failed to notify {uid}: {e}")
-
-            if is_finale:
-                db.stop_series(series_id)
-                try:
-                    await handler.cleanup(url)
-                except Exception as e:
-                    logger.warning(f"[{title}] cleanup() after finale failed: {e}")
-                logger.info(f"[{title}] фінальна серія завантажена — відстеження зупинено.")
-                break
-        else:
+    Titles sharing one channel are listed together first (_list_shared).
+    Then discovery (DISCOVERY_CONCURRENCY workers) feeds a bounded priority
+    queue of titles with new episodes, which DOWNLOAD_CONCURRENCY download
+    workers drain in global order — the title whose oldest pending episode
+    was posted earliest goes first (backlog without a known posting time
+    before everything else). Returns {series_id: whether anything was
+    downloaded}.
+    """
+    listed = await _list_shared(series_list)
+    results: dict[int, bool] = {s["id"]: False for s in series_list}
+    pending: asyncio.Queue = asyncio.Queue()
+    for s in series_list:
+        pending.put_nowait(s)
+    downloads: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=DOWNLOAD_QUEUE_SIZE)
+    seq = itertools.count()  # tie-breaker: never compare Rows/dicts
+    started = time.monotonic()
+    found = {"titles": 0, "episodes": 0}
+
+    async def _discover():
+        while True:
             try:
-                if notify_msg:
-                    await notify_msg.edit_text(
-                        f"❌ Помилка завантаження: **{display}** S{season:02d}E{episode:02d}"
-                    )
-            except Exception:
-                pass
-            # Stop on failure — retry this & remaining episodes next cycle
-            break
+                s = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                new_eps, _, finale_downloaded = await _find_new_episodes(s, listed.get(s["id"]))
+            except Exception as e:
+                logger.error(f"Error listing '{s['title']}': {e}")
+                continue
+            if new_eps:
+                found["titles"] += 1
+                found["episodes"] += len(new_eps)
+            if new_eps or finale_downloaded:
+                oldest = min((e.get("posted_at") or "" for e in new_eps), default="")
+                await downloads.put((oldest, next(seq), s, new_eps, finale_downloaded))
 
-    return downloaded_any
+    async def _download():
+        while True:
+            _, _, s, new_eps, finale_downloaded = await downloads.get()
+            try:
+                async with _series_lock(s["id"]):
+                    results[s["id"]] = await _download_new_episodes(s, new_eps, client, finale_downloaded)
+            except Exception as e:
+                logger.error(f"Error processing '{s['title']}': {e}")
+            finally:
+                downloads.task_done()
 
+    workers = [asyncio.create_task(_download()) for _ in range(DOWNLOAD_CONCURRENCY)]
+    try:
+        await asyncio.gather(*(_discover() for _ in range(DISCOVERY_CONCURRENCY)))
+        logger.info(
+            f"Discovery done in {time.monotonic() - started:.1f}s: {found['episodes']} new "
+            f"episodes across {found['titles']} of {len(series_list)} titles."
+        )
+        await downloads.join()
+    finally:
+        for w in workers:
+            w.cancel()
+    return results
 
-async def run_checker(client):
+
+async def run_checker(client, realtime_covered: set[int] | None = None):
     """
-    Background coroutine. Runs immediately on startup, then every CHECK_INTERVAL_HOURS.
-    Checks all active series for new episodes.
+    Background coroutine. Checks each active title when it's due according to
+    its adaptive schedule (PollScheduler) — every title once on startup, then
+    around its predicted next drop and with backoff otherwise. The base
+    interval is CHECK_INTERVAL_HOURS, or RECONCILE_INTERVAL_HOURS for titles
+    in `realtime_covered` — series whose new episodes real-time update
+    handlers deliver as they're posted (read on every reschedule, so the set
+    may change while this runs).
     """
     logger.info("🔁 Anime checker started.")
+    realtime_covered = realtime_covered if realtime_covered is not None else set()
+    schedule = PollScheduler()
 
     while True:
-        logger.info("⏰ Anime check cycle running...")
         try:
-            db.deactivate_expired()
-            active = db.get_active_series()
-
-            if not active:
-                logger.info("No active anime titles to check.")
-            else:
-                logger.info(f"Checking {len(active)} active series...")
-                # Strictly sequential, WITH a pause between titles: this all
-                # runs through ONE userbot account, and Telegram rate-limits
-                # per-account regardless of how many titles we're checking —
-                # firing every series' API calls back-to-back (even
-                # non-concurrently) was still enough to trip FLOOD_WAIT once
-                # there were more than a couple of tracked titles.
-                for i, s in enumerate(active):
-                    try:
-                        await process_series(s, client)
-                    except Exception as e:
-                        logger.error(f"Error processing '{s['title']}': {e}")
-                    if i < len(active) - 1:
-                        await asyncio.sleep(INTER_SERIES_DELAY_SECONDS)
+            await db.aio.deactivate_expired()
+            active = await db.aio.get_active_series()
+            schedule.sync(active)
+            due_ids = set(schedule.pop_due())
+            due = [s for s in active if s["id"] in due_ids]
+
+            if due:
+                logger.info(f"⏰ Checking {len(due)} of {len(active)} active series...")
+                results = await check_series_batch(due, client)
+                for s in due:
+                    base_hours = (RECONCILE_INTERVAL_HOURS if s["id"] in realtime_covered
+                                  else CHECK_INTERVAL_HOURS)
+                    await schedule.reschedule(s["id"], results.get(s["id"], False), base_hours)
 
         except Exception as e:
             logger.error(f"Checker cycle error: {e}", exc_info=True)
 
-        await asyncio.sleep(CHECK_INTERVAL_HOURS * 3600)
+        await asyncio.sleep(schedule.seconds_until_next(RESYNC_MINUTES * 60))
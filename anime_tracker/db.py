@@ -1,9 +1,11 @@
 import sqlite3
+import sys
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 from analyzer.mapper import mapper
+from core.db_executor import AsyncProxy
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +47,47 @@ def init_db():
                 episode     INTEGER NOT NULL,
                 PRIMARY KEY (chat, message_id)
             );
+            CREATE TABLE IF NOT EXISTS message_media (
+                chat            TEXT    NOT NULL,
+                message_id      INTEGER NOT NULL,
+                file_id         TEXT    NOT NULL,
+                file_unique_id  TEXT    NOT NULL,
+                file_size       INTEGER NOT NULL DEFAULT 0,
+                mime_type       TEXT,
+                file_name       TEXT,
+                dc_id           INTEGER,
+                file_ref_at     TEXT    NOT NULL DEFAULT (datetime('now')),
+                PRIMARY KEY (chat, message_id)
+            );
+            CREATE TABLE IF NOT EXISTS download_failures (
+                series_id        INTEGER NOT NULL REFERENCES series(id),
+                season           INTEGER NOT NULL,
+                episode          INTEGER NOT NULL,
+                attempts         INTEGER NOT NULL DEFAULT 0,
+                last_error       TEXT,
+                next_attempt_at  TEXT    NOT NULL,
+                dead             INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (series_id, season, episode)
+            );
+            CREATE TABLE IF NOT EXISTS file_checks (
+                path        TEXT    PRIMARY KEY,
+                size        INTEGER NOT NULL,
+                mtime_ns    INTEGER NOT NULL,
+                series_id   INTEGER NOT NULL,
+                season      INTEGER NOT NULL,
+                episode     INTEGER NOT NULL,
+                ok          INTEGER NOT NULL,
+                reason      TEXT,
+                duration    REAL,
+                checked_at  TEXT    NOT NULL DEFAULT (datetime('now'))
+            );
+            CREATE TABLE IF NOT EXISTS scan_cursors (
+                chat             TEXT    NOT NULL,
+                topic            INTEGER NOT NULL,
+                last_message_id  INTEGER NOT NULL,
+                full_scan_at     TEXT    NOT NULL,
+                PRIMARY KEY (chat, topic)
+            );
         """)
         # Migration: `category` exists for legacy rows only (an earlier,
         # since-removed tracking mode used a different value here). "anime"
@@ -57,6 +100,56 @@ def init_db():
         # used for folder/file naming. Older DBs predate this column.
         if "display_title" not in cols:
             conn.execute("ALTER TABLE series ADD COLUMN display_title TEXT")
+        # Migration: `resolved_chat_id` caches the chat id an invite link
+        # resolved to, so later cycles/restarts never re-resolve it
+        # (get_chat on an invite link is always a Telegram API call).
+        if "resolved_chat_id" not in cols:
+            conn.execute("ALTER TABLE series ADD COLUMN resolved_chat_id INTEGER")
+        # Migration: incremental scanning serves previously-seen episodes
+        # straight from caption_cache, so it needs to know which topic each
+        # cached message belongs to (0 = whole chat, i.e. a dedicated private
+        # channel) and whether its caption marked the finale. Legacy rows
+        # have topic NULL until the first full rescan of their topic tags them.
+        cache_cols = {row["name"] for row in conn.execute("PRAGMA table_info(caption_cache)").fetchall()}
+        if "topic" not in cache_cols:
+            conn.execute("ALTER TABLE caption_cache ADD COLUMN topic INTEGER")
+        if "is_finale" not in cache_cols:
+            conn.execute("ALTER TABLE caption_cache ADD COLUMN is_finale INTEGER NOT NULL DEFAULT 0")
+        # Migration: `posted_at` is when the episode's message was posted
+        # (UTC), as opposed to downloaded_at — the posting cadence the
+        # adaptive poll schedule (anime_tracker/poll_schedule.py) learns from.
+        # NULL for legacy rows and for episodes seeded from disk.
+        ep_cols = {row["name"] for row in conn.execute("PRAGMA table_info(episodes)").fetchall()}
+        if "posted_at" not in ep_cols:
+            conn.execute("ALTER TABLE episodes ADD COLUMN posted_at TEXT")
+        # Migration: `source` is the handler source the episode was downloaded
+        # from (for Telegram "chat:message_id"), so a 🔄 redownload only has to
+        # look at that message and the ones posted after it, not re-list the
+        # whole channel. NULL for legacy rows and episodes seeded from disk.
+        if "source" not in ep_cols:
+            conn.execute("ALTER TABLE episodes ADD COLUMN source TEXT")
+        # Migration: `episodes` had no index at all — every per-series lookup
+        # full-scanned a table that only ever grows — and nothing stopped the
+        # same (series, season, episode) being recorded twice. Collapse any
+        # existing duplicates (keeping the earliest row) BEFORE creating the
+        # unique index, or the CREATE would fail on older DBs.
+        indexes = {row["name"] for row in conn.execute("PRAGMA index_list(episodes)").fetchall()}
+        if "idx_episodes_series_ep" not in indexes:
+            n = conn.execute("""
+                DELETE FROM episodes WHERE id NOT IN (
+                    SELECT MIN(id) FROM episodes GROUP BY series_id, season, episode
+                )
+            """).rowcount
+            if n:
+                logger.info(f"Removed {n} duplicate episode rows before adding unique index.")
+        conn.executescript("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_episodes_series_ep
+                ON episodes(series_id, season, episode);
+            CREATE INDEX IF NOT EXISTS idx_series_active_started
+                ON series(active, started_at);
+            CREATE INDEX IF NOT EXISTS idx_caption_cache_topic
+                ON caption_cache(chat, topic);
+        """)
     logger.info("Anime tracking DB initialized.")
 
 
@@ -101,6 +194,26 @@ def set_display_title(series_id: int, display_title: str):
         )
 
 
+def get_resolved_chat_id(url: str) -> int | None:
+    """The chat id a tracked source URL was last resolved to, if known."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT resolved_chat_id FROM series WHERE base_url = ? AND resolved_chat_id IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (url,)
+        ).fetchone()
+    return row["resolved_chat_id"] if row else None
+
+
+def set_resolved_chat_id(url: str, chat_id: int):
+    """Remember the chat id for every series row tracking this source URL."""
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE series SET resolved_chat_id = ? WHERE base_url = ?",
+            (chat_id, url)
+        )
+
+
 def resolve_display_title(series: sqlite3.Row) -> str:
     """
     Return the localized display name for a series row shown in bot
@@ -223,17 +336,159 @@ def stop_series(series_id: int):
         conn.execute("UPDATE series SET active = 0 WHERE id = ?", (series_id,))
 
 
-def record_episode(series_id: int, season: int, episode: int):
-    """Update last downloaded episode and insert episode record."""
+def record_episode(series_id: int, season: int, episode: int, posted_at: str | None = None,
+                   source: str | None = None):
+    """
+    Update last downloaded episode and upsert the episode record — a
+    redownload of an already-recorded episode just refreshes downloaded_at
+    instead of adding a second row (enforced by idx_episodes_series_ep).
+    `posted_at` — UTC 'YYYY-MM-DD HH:MM:SS' the source message was posted,
+    if known; a redownload keeps the originally recorded value.
+    `source` — what the file was downloaded from (see get_episode_source);
+    a redownload replaces it with the newer source.
+    """
     with _connect() as conn:
+        # Only ever moves forward — a redownload/retry of an older episode
+        # must not roll the "last episode" shown in /anime back.
         conn.execute(
-            "UPDATE series SET last_season = ?, last_episode = ? WHERE id = ?",
-            (season, episode, series_id)
+            "UPDATE series SET last_season = ?, last_episode = ? WHERE id = ? "
+            "AND (last_season < ? OR (last_season = ? AND last_episode < ?))",
+            (season, episode, series_id, season, season, episode)
         )
         conn.execute(
-            "INSERT INTO episodes (series_id, season, episode) VALUES (?, ?, ?)",
+            "DELETE FROM download_failures WHERE series_id = ? AND season = ? AND episode = ?",
+            (series_id, season, episode)
+        )
+        # A fresh file supersedes any earlier verification verdict.
+        conn.execute(
+            "DELETE FROM file_checks WHERE series_id = ? AND season = ? AND episode = ?",
+            (series_id, season, episode)
+        )
+        conn.execute(
+            "INSERT INTO episodes (series_id, season, episode, posted_at, source) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(series_id, season, episode) "
+            "DO UPDATE SET downloaded_at = datetime('now'), "
+            "posted_at = COALESCE(episodes.posted_at, excluded.posted_at), "
+            "source = COALESCE(excluded.source, episodes.source)",
+            (series_id, season, episode, posted_at, source)
+        )
+
+
+def get_episode_source(series_id: int, season: int, episode: int) -> str | None:
+    """The source a downloaded episode came from, if it was recorded (None for legacy/seeded rows)."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT source FROM episodes WHERE series_id = ? AND season = ? AND episode = ?",
+            (series_id, season, episode)
+        ).fetchone()
+    return row["source"] if row else None
+
+
+def record_download_failure(series_id: int, season: int, episode: int, error: str,
+                            base_minutes: float, max_attempts: int) -> sqlite3.Row:
+    """
+    Count a failed download attempt in the retry ledger: the episode becomes
+    eligible again after base_minutes × 2^(attempts-1), and is marked dead
+    (never retried automatically — only from the 🔧 fix menu) once it has
+    failed `max_attempts` times. Returns the updated ledger row.
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT attempts FROM download_failures WHERE series_id = ? AND season = ? AND episode = ?",
             (series_id, season, episode)
+        ).fetchone()
+        attempts = (row["attempts"] if row else 0) + 1
+        delay = f"+{base_minutes * 2 ** (attempts - 1):.0f} minutes"
+        conn.execute(
+            "INSERT INTO download_failures "
+            "(series_id, season, episode, attempts, last_error, next_attempt_at, dead) "
+            "VALUES (?, ?, ?, ?, ?, datetime('now', ?), ?) "
+            "ON CONFLICT(series_id, season, episode) DO UPDATE SET "
+            "attempts = excluded.attempts, last_error = excluded.last_error, "
+            "next_attempt_at = excluded.next_attempt_at, dead = excluded.dead",
+            (series_id, season, episode, attempts, error[:500], delay, int(attempts >= max_attempts))
         )
+        return conn.execute(
+            "SELECT * FROM download_failures WHERE series_id = ? AND season = ? AND episode = ?",
+            (series_id, season, episode)
+        ).fetchone()
+
+
+def get_blocked_episodes(series_id: int) -> set[tuple[int, int]]:
+    """Episodes the checker must skip for now: dead, or still backing off after a failure."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT season, episode FROM download_failures "
+            "WHERE series_id = ? AND (dead = 1 OR next_attempt_at > datetime('now'))",
+            (series_id,)
+        ).fetchall()
+    return {(r["season"], r["episode"]) for r in rows}
+
+
+def get_next_retry_at(series_id: int) -> datetime | None:
+    """When the series' earliest not-yet-dead failed episode becomes eligible again (UTC)."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT MIN(next_attempt_at) AS at FROM download_failures WHERE series_id = ? AND dead = 0",
+            (series_id,)
+        ).fetchone()
+    if not row or not row["at"]:
+        return None
+    return datetime.strptime(row["at"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def get_download_failures(series_id: int) -> list[sqlite3.Row]:
+    """Retry-ledger rows of a series (for the 🔧 fix menu), dead ones first."""
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT * FROM download_failures WHERE series_id = ? ORDER BY dead DESC, season, episode",
+            (series_id,)
+        ).fetchall()
+
+
+def get_file_check(path: str) -> sqlite3.Row | None:
+    """Cached ffprobe verdict for a library file (see anime_tracker/verifier.py)."""
+    with _connect() as conn:
+        return conn.execute("SELECT * FROM file_checks WHERE path = ?", (path,)).fetchone()
+
+
+def save_file_check(path: str, size: int, mtime_ns: int, series_id: int, season: int, episode: int,
+                    ok: bool, reason: str | None, duration: float | None):
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO file_checks "
+            "(path, size, mtime_ns, series_id, season, episode, ok, reason, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, series_id, season, episode, int(ok), reason, duration)
+        )
+
+
+def get_failed_checks(series_id: int) -> dict[tuple[int, int], str]:
+    """{(season, episode): reason} for a series' files that failed verification."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT season, episode, reason FROM file_checks WHERE series_id = ? AND ok = 0",
+            (series_id,)
+        ).fetchall()
+    return {(r["season"], r["episode"]): r["reason"] for r in rows}
+
+
+def get_arrival_times(series_id: int, limit: int = 12) -> list[datetime]:
+    """
+    When the series' most recent episodes were posted (UTC, oldest first) —
+    input for the adaptive poll schedule. Episodes without a known posting
+    time (legacy rows, seeded from disk) are left out.
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT posted_at FROM episodes WHERE series_id = ? AND posted_at IS NOT NULL "
+            "ORDER BY posted_at DESC LIMIT ?",
+            (series_id, limit)
+        ).fetchall()
+    return sorted(
+        datetime.strptime(r["posted_at"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        for r in rows
+    )
 
 
 def seed_downloaded_episodes(series_id: int, episodes: set[tuple[int, int]]):
@@ -247,17 +502,10 @@ def seed_downloaded_episodes(series_id: int, episodes: set[tuple[int, int]]):
     if not episodes:
         return
     with _connect() as conn:
-        already = {
-            (r["season"], r["episode"])
-            for r in conn.execute(
-                "SELECT season, episode FROM episodes WHERE series_id = ?", (series_id,)
-            ).fetchall()
-        }
-        for season, episode in episodes - already:
-            conn.execute(
-                "INSERT INTO episodes (series_id, season, episode) VALUES (?, ?, ?)",
-                (series_id, season, episode)
-            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO episodes (series_id, season, episode) VALUES (?, ?, ?)",
+            [(series_id, season, episode) for season, episode in episodes]
+        )
         max_season, max_episode = max(episodes)
         conn.execute(
             "UPDATE series SET last_season = ?, last_episode = ? WHERE id = ?",
@@ -281,16 +529,126 @@ def get_cached_caption(chat: str, message_id: int) -> tuple[int, int] | None:
     return (row["season"], row["episode"]) if row else None
 
 
-def cache_caption(chat: str, message_id: int, season: int, episode: int):
-    """Persist a resolved (season, episode) for a message so it's never re-parsed."""
+def cache_caption(chat: str, message_id: int, season: int, episode: int,
+                  topic: int | None = None, is_finale: bool = False):
+    """
+    Persist a resolved (season, episode) for a message so it's never re-parsed.
+    `topic` — forum-topic anchor id the message belongs to (0 for a dedicated
+    private channel); `is_finale` — whether its caption marked the last episode.
+    """
     with _connect() as conn:
         conn.execute(
-            "INSERT OR REPLACE INTO caption_cache (chat, message_id, season, episode) "
-            "VALUES (?, ?, ?, ?)",
-            (chat, message_id, season, episode)
+            "INSERT OR REPLACE INTO caption_cache (chat, message_id, season, episode, topic, is_finale) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (chat, message_id, season, episode, topic, int(is_finale))
         )
 
 
+def get_cached_episodes(chat: str, topic: int) -> list[sqlite3.Row]:
+    """All cached (already resolved) episode messages of one chat/topic, oldest first."""
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT message_id, season, episode, is_finale FROM caption_cache "
+            "WHERE chat = ? AND topic = ? ORDER BY message_id",
+            (chat, topic)
+        ).fetchall()
+
+
+def sync_topic_cache(chat: str, topic: int, episodes: list[tuple[int, int, int, bool]]):
+    """
+    After a FULL rescan of a chat/topic, make caption_cache match exactly what
+    is currently there: tag every listed (message_id, season, episode,
+    is_finale) with this topic, and drop rows of this topic whose message no
+    longer exists (deleted/replaced upload), so incremental cycles stop
+    offering them.
+    """
+    with _connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO caption_cache (chat, message_id, season, episode, topic, is_finale) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(chat, mid, season, episode, topic, int(fin)) for mid, season, episode, fin in episodes]
+        )
+        keep = {mid for mid, _, _, _ in episodes}
+        stale = [
+            r["message_id"]
+            for r in conn.execute(
+                "SELECT message_id FROM caption_cache WHERE chat = ? AND topic = ?", (chat, topic)
+            ).fetchall()
+            if r["message_id"] not in keep
+        ]
+        conn.executemany(
+            "DELETE FROM caption_cache WHERE chat = ? AND message_id = ?",
+            [(chat, mid) for mid in stale]
+        )
+    if stale:
+        logger.info(f"Dropped {len(stale)} vanished messages of {chat}/{topic} from caption cache.")
+
+
+def save_message_media(records: list[dict]):
+    """
+    Upsert the media metadata captured while listing (file_id with its file
+    reference, size, mime, DC) for each episode message, keyed by
+    (chat, message_id) — lets download() skip re-fetching the message.
+    `file_ref_at` records when the embedded file reference was obtained.
+    """
+    if not records:
+        return
+    with _connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO message_media "
+            "(chat, message_id, file_id, file_unique_id, file_size, mime_type, file_name, dc_id, file_ref_at) "
+            "VALUES (:chat, :message_id, :file_id, :file_unique_id, :file_size, :mime_type, :file_name, :dc_id, "
+            "datetime('now'))",
+            records
+        )
+
+
+def get_message_media(chat: str, message_id: int) -> sqlite3.Row | None:
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT * FROM message_media WHERE chat = ? AND message_id = ?",
+            (chat, message_id)
+        ).fetchone()
+
+
+def get_scan_cursor(chat: str, topic: int) -> sqlite3.Row | None:
+    """High-water mark (last_message_id, full_scan_at) for a chat/topic, if scanned before."""
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT last_message_id, full_scan_at FROM scan_cursors WHERE chat = ? AND topic = ?",
+            (chat, topic)
+        ).fetchone()
+
+
+def advance_scan_cursor(chat: str, topic: int, last_message_id: int, full: bool = False):
+    """
+    Move a chat/topic's high-water mark forward (never backwards). `full` —
+    this scan walked the whole history, so the mark is SET (it may move back,
+    below a message that couldn't be resolved) and the full-rescan clock is
+    reset.
+    """
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO scan_cursors (chat, topic, last_message_id, full_scan_at) "
+            "VALUES (?, ?, ?, datetime('now')) "
+            "ON CONFLICT(chat, topic) DO UPDATE SET "
+            + ("last_message_id = excluded.last_message_id, full_scan_at = excluded.full_scan_at" if full
+               else "last_message_id = MAX(last_message_id, excluded.last_message_id)"),
+            (chat, topic, last_message_id)
+        )
+
+
+def full_rescan_due(cursor: sqlite3.Row | None, interval_hours: int) -> bool:
+    """True if a chat/topic has never been scanned, or its last full scan is older than `interval_hours` (0 = never periodic)."""
+    if cursor is None:
+        return True
+    if interval_hours <= 0:
+        return False
+    # full_scan_at is written by SQLite's datetime('now'), which is UTC.
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=interval_hours)).strftime("%Y-%m-%d %H:%M:%S")
+    return cursor["full_scan_at"] <= cutoff
+
+
 def deactivate_expired():
     """Deactivate series older than MAX_AGE_DAYS."""
     cutoff = _cutoff_date()
@@ -305,3 +663,11 @@ def deactivate_expired():
 
 def _cutoff_date() -> str:
     return (datetime.now() - timedelta(days=MAX_AGE_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Async facade for coroutines (handlers, checker, site handlers) — every call
+# runs on the shared DB thread instead of blocking the event loop:
+#     await db.aio.get_downloaded_set(series_id)
+# The plain functions above stay synchronous for use on that thread itself
+# (and for init_db() at startup, before the loop is busy).
+aio = AsyncProxy(sys.modules[__name__])
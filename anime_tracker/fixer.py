@@ -1,10 +1,11 @@
-import glob
+import asyncio
 import logging
 import os
 
 from anime_tracker import db
 from anime_tracker.sites import get_handler
 from config.config import settings
+from core.library_index import library_index
 from core.renamer import sanitize_title
 
 logger = logging.getLogger(__name__)
@@ -14,7 +15,24 @@ def _dest_path(series: db.sqlite3.Row) -> str:
     return settings.DOWNLOAD_PATH if series["category"] == "anime" else settings.DORAMA_PATH
 
 
-def delete_episode(series: db.sqlite3.Row, season: int, episode: int) -> bool:
+def _remove_episode_files(series: db.sqlite3.Row, season: int, episode: int) -> bool:
+    folder = os.path.join(_dest_path(series), sanitize_title(series["title"]))
+    removed_any = False
+    for path in library_index.files_for(folder, season, episode):
+        try:
+            os.remove(path)
+            removed_any = True
+            logger.info(f"Deleted file: {path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not delete {path}: {e}")
+            continue
+        library_index.remove_file(path)
+    return removed_any
+
+
+async def delete_episode(series: db.sqlite3.Row, season: int, episode: int) -> bool:
     """
     Remove a downloaded episode's file(s) from disk AND its DB record, so the
     next check cycle treats it as not-yet-downloaded again. Used to fix a
@@ -26,18 +44,14 @@ def delete_episode(series: db.sqlite3.Row, season: int, episode: int) -> bool:
     Best-effort on the file: a missing file is not an error (the DB record
     is always removed if present). Returns True only if a file was actually
     found and deleted, so the caller can tell the two cases apart.
+
+    The files are looked up in the library index (core/library_index.py)
+    instead of globbing the folder. The lookup/remove runs in a worker thread
+    (the library is usually a network mount) and the DB record goes through
+    the DB thread — neither blocks the event loop.
     """
-    safe = sanitize_title(series["title"])
-    pattern = os.path.join(_dest_path(series), safe, f"{safe} - S{season:02d}E{episode:02d}.*")
-    removed_any = False
-    for path in glob.glob(pattern):
-        try:
-            os.remove(path)
-            removed_any = True
-            logger.info(f"Deleted file: {path}")
-        except Exception as e:
-            logger.warning(f"Could not delete {path}: {e}")
-    db.delete_episode(series["id"], season, episode)
+    removed_any = await asyncio.to_thread(_remove_episode_files, series, season, episode)
+    await db.aio.delete_episode(series["id"], season, episode)
     return removed_any
 
 
@@ -45,10 +59,11 @@ async def redownload_episode(series: db.sqlite3.Row, season: int, episode: int)
     """
     Re-resolve the CURRENT source message for (season, episode) in the
     tracked channel/topic and download it again, overwriting whatever's on
-    disk. Does NOT touch the DB episode record — the season/episode number
-    is still correct, only the file content is being replaced — so this
-    works standalone to fix a wrong-variant download without needing
-    delete_episode() first.
+    disk. The season/episode number is still correct, only the file content
+    is being replaced, so this works standalone to fix a wrong-variant
+    download without needing delete_episode() first. On success the episode
+    is (re-)recorded, which also clears it from the retry ledger — the same
+    button retries an episode the checker gave up on.
 
     Returns False if no matching episode is currently found in the source
     (e.g. it was deleted rather than replaced with a corrected upload).
@@ -56,8 +71,11 @@ async def redownload_episode(series: db.sqlite3.Row, season: int, episode: int)
     handler = get_handler(series["base_url"])
     if not handler:
         return False
-    available = await handler.list_episodes(series["base_url"])
-    candidates = [e for e in available if e["season"] == season and e["episode"] == episode]
+    # The whole point is to notice an upload that REPLACED the one we already
+    # have — find_episode() looks at the recorded source message and anything
+    # posted after it (or re-lists the whole source if none was recorded).
+    recorded = await db.aio.get_episode_source(series["id"], season, episode)
+    candidates = await handler.find_episode(series["base_url"], season, episode, source=recorded)
     if not candidates:
         logger.warning(
             f"redownload_episode: no current source for S{season:02d}E{episode:02d} "
@@ -66,7 +84,15 @@ async def redownload_episode(series: db.sqlite3.Row, season: int, episode: int)
         return False
     # If more than one message currently resolves to this (season, episode) —
     # e.g. the old wrong upload wasn't actually deleted, just superseded —
-    # prefer the last one listed (channels are iterated oldest-first, so this
-    # is the most recently posted candidate).
+    # prefer the last one listed (candidates are ordered by message id, so
+    # this is the most recently posted one).
     source = candidates[-1]["source"]
-    return await handler.download(source, series["title"], season, episode, _dest_path(series))
+    try:
+        ok = await handler.download(source, series["title"], season, episode, _dest_path(series))
+        ok = ok and await handler.finish_download(source)
+    finally:
+        handler.forget_download(source)
+    if ok:
+        await db.aio.record_episode(series["id"], season, episode,
+                                    posted_at=candidates[-1].get("posted_at"), source=source)
+    return ok
@@ -0,0 +1,139 @@
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from statistics import median
+
+from anime_tracker import db
+
+logger = logging.getLogger(__name__)
+
+# Most airing titles post one episode a week on a fixed weekday and hour, so
+# polling every title every few hours is mostly wasted: the learned cadence
+# (median gap between the last episodes' posting times) predicts the next
+# drop, and only the window around it is polled densely.
+ARRIVAL_HISTORY = 8
+
+# Gaps shorter than this are a batch upload (several episodes at once, a
+# re-upload), not the release cadence — ignored when learning it.
+MIN_CADENCE_HOURS = 12
+
+# Polling window around a predicted drop. Dubs often land a few hours after
+# the expected slot, so the window reaches further after it than before.
+WINDOW_BEFORE_HOURS = 2
+WINDOW_AFTER_HOURS = 12
+DENSE_POLL_MINUTES = 15
+
+# A prediction that has been missed this many cadences in a row is dropped —
+# the title finished, went on break or changed schedule; plain backoff takes over.
+MAX_MISSED_CADENCES = 3
+
+# Outside the window each poll without a new episode doubles the interval
+# (base, 2×, 4×, ...) up to this cap (or the base interval, if larger).
+MAX_BACKOFF_HOURS = 48
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def predict_next_arrival(arrivals: list[datetime], now: datetime) -> datetime | None:
+    """
+    Next expected posting time from past arrivals (UTC, oldest first), or
+    None without a usable cadence yet (fewer than two real gaps).
+    """
+    gaps = [
+        b - a for a, b in zip(arrivals, arrivals[1:])
+        if b - a >= timedelta(hours=MIN_CADENCE_HOURS)
+    ]
+    if len(gaps) < 2:
+        return None
+    cadence = median(gaps)
+    predicted = arrivals[-1] + cadence
+    missed = 0
+    while predicted + timedelta(hours=WINDOW_AFTER_HOURS) < now:
+        predicted += cadence
+        missed += 1
+        if missed >= MAX_MISSED_CADENCES:
+            return None
+    return predicted
+
+
+def next_poll_time(arrivals: list[datetime], misses: int, now: datetime, base_hours: float) -> datetime:
+    """
+    When to poll a title next: every DENSE_POLL_MINUTES inside the window
+    around its predicted drop, otherwise after an exponentially growing
+    interval — but never later than the start of the next window.
+    """
+    backoff = timedelta(hours=min(base_hours * 2 ** min(misses, 10), max(MAX_BACKOFF_HOURS, base_hours)))
+    due = now + backoff
+    predicted = predict_next_arrival(arrivals, now)
+    if predicted:
+        start = predicted - timedelta(hours=WINDOW_BEFORE_HOURS)
+        if start <= now:
+            return now + timedelta(minutes=DENSE_POLL_MINUTES)
+        due = min(due, start)
+    return due
+
+
+class PollScheduler:
+    """
+    Priority queue of active titles keyed by next-due time — replaces the
+    fixed "check everything, sleep CHECK_INTERVAL_HOURS" loop in run_checker.
+
+    A newly seen title is due immediately. After each check the title is
+    re-queued via next_poll_time: a check that found nothing bumps its miss
+    counter (longer backoff), a download resets it. Miss counters live in
+    memory only — after a restart every title is checked once and the
+    backoff is rebuilt; the cadence itself comes from episodes.posted_at.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}
+        self._misses: dict[int, int] = {}
+
+    def _push(self, series_id: int, due: datetime):
+        ts = due.timestamp()
+        self._due[series_id] = ts
+        heapq.heappush(self._heap, (ts, series_id))
+
+    def sync(self, active: list):
+        """Queue newly active titles (due now) and forget deactivated ones."""
+        ids = {s["id"] for s in active}
+        now = _now()
+        for series_id in ids - self._due.keys():
+            self._push(series_id, now)
+        for series_id in self._due.keys() - ids:
+            del self._due[series_id]
+            self._misses.pop(series_id, None)
+
+    def pop_due(self) -> list[int]:
+        """Remove and return every title whose time has come."""
+        now = _now().timestamp()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            ts, series_id = heapq.heappop(self._heap)
+            # Stale entry (rescheduled since, or deactivated) — skip it.
+            if self._due.get(series_id) != ts:
+                continue
+            del self._due[series_id]
+            due.append(series_id)
+        return due
+
+    async def reschedule(self, series_id: int, found_new: bool, base_hours: float):
+        misses = 0 if found_new else self._misses.get(series_id, -1) + 1
+        self._misses[series_id] = misses
+        arrivals = await db.aio.get_arrival_times(series_id, ARRIVAL_HISTORY)
+        due = next_poll_time(arrivals, misses, _now(), base_hours)
+        # A failed episode due for its retry (see checker.RETRY_BASE_MINUTES)
+        # shouldn't wait out the title's backoff.
+        retry_at = await db.aio.get_next_retry_at(series_id)
+        if retry_at:
+            due = min(due, max(retry_at, _now()))
+        self._push(series_id, due)
+        logger.info(f"Series #{series_id}: next check at {due:%Y-%m-%d %H:%M} UTC (misses={misses}).")
+
+    def seconds_until_next(self, max_seconds: float) -> float:
+        if not self._heap:
+            return max_seconds
+        return max(0.0, min(max_seconds, self._heap[0][0] - _now().timestamp()))
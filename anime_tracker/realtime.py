@@ -0,0 +1,130 @@
+import asyncio
+import logging
+
+from pyrogram import filters
+from pyrogram.errors import UserNotParticipant
+from pyrogram.handlers import MessageHandler
+
+from anime_tracker import db, checker
+from anime_tracker.sites.telegram import URL_RE, INVITE_RE, thread_id_of
+
+logger = logging.getLogger(__name__)
+
+# How long to wait after the first new video in a tracked chat before
+# checking the title — channels often post an episode together with a
+# variant/duplicate (or several episodes at once); one check picks them all up.
+DEBOUNCE_SECONDS = 10
+
+# chat_id -> [(series_id, topic anchor id, or 0 for a whole dedicated channel)]
+_index: dict[int, list[tuple[int, int]]] = {}
+
+# Series whose chat the userbot has joined, i.e. that really get update
+# pushes. Only these move to the checker's slower reconciliation interval;
+# refreshed in place by refresh_index().
+covered: set[int] = set()
+
+# series_id -> pending debounced check
+_pending: dict[int, asyncio.Task] = {}
+
+_userbot = None
+_bot_client = None
+
+
+def install(userbot, bot_client):
+    """
+    Subscribe the userbot to new video/document messages so a newly posted
+    episode of a tracked title starts downloading within seconds, instead of
+    waiting for the next polling cycle. `bot_client` is used for the usual
+    download notifications (same as the checker).
+
+    Only chats the userbot account actually receives updates for are covered
+    (joined channels — dedicated private channels always are, since they're
+    auto-joined); the checker's reconciliation sweep covers the rest.
+    """
+    global _userbot, _bot_client
+    _userbot, _bot_client = userbot, bot_client
+    userbot.add_handler(MessageHandler(_on_message, filters.video | filters.document))
+
+
+def _topic_of(url: str) -> int | None:
+    m = URL_RE.match(url.strip())
+    if m:
+        return int(m.group(2))
+    return 0 if INVITE_RE.match(url.strip()) else None
+
+
+async def refresh_index():
+    """
+    Rebuild the chat -> series index from the active series. Call at startup
+    and after adding a title. Forum-topic sources are keyed by their
+    channel's numeric id, resolved once and kept on the series row. Also
+    rebuilds `covered` from the chats the account is a member of.
+    """
+    index: dict[int, list[tuple[int, int]]] = {}
+    for s in await db.aio.get_active_series():
+        topic = _topic_of(s["base_url"])
+        if topic is None:
+            continue
+        chat_id = s["resolved_chat_id"]
+        if not chat_id and topic and _userbot:
+            try:
+                chat_id = (await _userbot.get_chat(URL_RE.match(s["base_url"].strip()).group(1))).id
+                await db.aio.set_resolved_chat_id(s["base_url"], chat_id)
+            except Exception as e:
+                logger.warning(f"Real-time: could not resolve chat for {s['base_url']}: {e}")
+                continue
+        if chat_id:
+            index.setdefault(chat_id, []).append((s["id"], topic))
+    joined = set()
+    for chat_id in index:
+        if await _is_member(chat_id):
+            joined.add(chat_id)
+    _index.clear()
+    _index.update(index)
+    covered.clear()
+    covered.update(series_id for chat_id in joined for series_id, _ in index[chat_id])
+    logger.info(
+        f"Real-time index: {sum(map(len, index.values()))} titles across {len(index)} chats, "
+        f"{len(covered)} titles in {len(joined)} joined chats."
+    )
+
+
+async def _is_member(chat_id: int) -> bool:
+    """Whether the userbot receives updates from the chat — non-joined public channels send none."""
+    if not _userbot:
+        return False
+    try:
+        await _userbot.get_chat_member(chat_id, "me")
+        return True
+    except UserNotParticipant:
+        return False
+    except Exception as e:
+        logger.warning(f"Real-time: could not check membership of chat {chat_id}: {e}")
+        return False
+
+
+async def _on_message(_, message):
+    entries = _index.get(message.chat.id) if message.chat else None
+    if not entries:
+        return
+    thread = thread_id_of(message)
+    for series_id, topic in entries:
+        if topic and thread != topic:
+            continue
+        if series_id in _pending and not _pending[series_id].done():
+            continue
+        logger.info(f"Real-time: new media in chat {message.chat.id} for series #{series_id}.")
+        _pending[series_id] = asyncio.create_task(_check_soon(series_id))
+
+
+async def _check_soon(series_id: int):
+    try:
+        await asyncio.sleep(DEBOUNCE_SECONDS)
+        series = await db.aio.get_series_by_id(series_id)
+        if not series or not series["active"]:
+            return
+        await checker.process_series(series, _bot_client)
+    except Exception as e:
+        logger.error(f"Real-time check of series #{series_id} failed: {e}", exc_info=True)
+    finally:
+        _pending.pop(series_id, None)
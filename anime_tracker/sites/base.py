@@ -17,16 +17,49 @@ class BaseSiteHandler(ABC):
         """Fetch a clean series title from the given URL."""
 
     @abstractmethod
-    async def list_episodes(self, url: str) -> list[dict]:
+    async def list_episodes(self, url: str, full: bool = False) -> list[dict]:
         """
         Return ALL currently available DUB (Ukrainian voice-over) episodes.
         Subtitle-only tracks and unsupported players are skipped.
 
+        Handlers may serve previously-seen episodes from a cache and only
+        fetch what's new since the last call; `full=True` forces a complete
+        re-read of the source (e.g. to notice a replaced upload).
+
         Each item: {"season": int, "episode": int, "source": str}
         where `source` is either a direct .m3u8 URL or a player page URL
         that download() knows how to resolve.
         """
 
+    def shared_scan_key(self, url: str) -> str | None:
+        """
+        Optional: a key identifying the shared source this URL lives in (e.g.
+        one channel hosting many titles as topics). URLs with the same key can
+        be listed together in one pass via list_episodes_shared(). Default:
+        None — every URL is listed on its own.
+        """
+        return None
+
+    async def list_episodes_shared(self, urls: list[str]) -> dict[str, list[dict]]:
+        """
+        List several URLs that share a shared_scan_key() at once, returning
+        {url: episodes} in the same format as list_episodes(). Default: list
+        each one separately.
+        """
+        return {url: await self.list_episodes(url) for url in urls}
+
+    async def find_episode(self, url: str, season: int, episode: int,
+                           source: str | None = None) -> list[dict]:
+        """
+        Current candidates for ONE episode, in list_episodes() format, oldest
+        first — used by the 🔄 redownload. `source` — what the episode was
+        last downloaded from (episodes.source), if known: handlers that can
+        should look only at that item and anything posted after it. Default:
+        a full list_episodes() filtered to (season, episode).
+        """
+        available = await self.list_episodes(url, full=True)
+        return [e for e in available if e["season"] == season and e["episode"] == episode]
+
     @abstractmethod
     async def download(self, source: str, title: str, season: int, episode: int,
                        path: str, notify_msg=None) -> bool:
@@ -37,6 +70,30 @@ class BaseSiteHandler(ABC):
         Returns True on success.
         """
 
+    async def finish_download(self, source: str) -> bool:
+        """
+        Optional: wait until the file the last successful download() of
+        `source` fetched is in its final place (e.g. still being moved out of
+        a local scratch dir) — called after the caller has freed its
+        download slot, before the episode is recorded. Returns False if
+        that failed. Default: True (download() already finished the job).
+        """
+        return True
+
+    def forget_download(self, source: str):
+        """
+        Optional: drop whatever download() kept for finish_download() — the
+        caller's cleanup (in a finally), for when finish_download() is never
+        reached (e.g. the caller was cancelled in between). Default: nothing.
+        """
+
+    def failure_reason(self, source: str) -> str | None:
+        """
+        Optional: a short description of why the last download() of `source`
+        by this handler instance failed, for the retry ledger. Default: None.
+        """
+        return None
+
     async def cleanup(self, url: str) -> None:
         """
         Optional hook called when a tracked title stops being tracked (finale
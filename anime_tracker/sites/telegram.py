@@ -3,13 +3,22 @@ import logging
 import os
 import re
 import time
+from datetime import timezone
+
+from pyrogram.enums import MessagesFilter
+from pyrogram.errors import FileReferenceExpired
+from pyrogram.file_id import FileId
 
 from anime_tracker import db as anime_db
+from anime_tracker.api_scheduler import api_scheduler
 from anime_tracker.sites.base import BaseSiteHandler
 from anime_tracker.userbot import get_userbot_client
 from anime_tracker.folder import join_and_file, unfile_and_leave
 from analyzer.ai_cleaner import extract_metadata
-from core.downloader import progress_bar
+from config.config import settings
+from core.disk_space import disk_gate
+from core.downloader import IncompleteDownloadError, progress_bar, stream_to_file
+from core.library_index import library_index
 from core.renamer import sanitize_title
 
 logger = logging.getLogger(__name__)
@@ -60,6 +69,100 @@ def _is_finale(caption: str) -> bool:
     return current == total > 0
 
 
+def thread_id_of(msg) -> int | None:
+    """The forum topic / discussion thread a message was posted in, if any."""
+    return msg.message_thread_id or msg.reply_to_top_message_id or msg.reply_to_message_id
+
+
+# Server-side search filters covering everything list_episodes() can use —
+# a video posted as a video, or as a plain file. Listing through these instead
+# of get_chat_history()/get_discussion_replies() means text posts, stickers,
+# polls and photos never cross the wire at all.
+MEDIA_FILTERS = (MessagesFilter.VIDEO, MessagesFilter.DOCUMENT)
+
+
+async def _merge_newest_first(sources):
+    """
+    Merge several async iterators that each yield messages newest first into
+    ONE newest-first stream (dropping a message both yield), pulling lazily so
+    a caller breaking out early never pages further back than it needs to.
+    """
+    iters = [src.__aiter__() for src in sources]
+    heads = {}
+    for i, it in enumerate(iters):
+        try:
+            heads[i] = await it.__anext__()
+        except StopAsyncIteration:
+            pass
+    last_id = None
+    while heads:
+        i = max(heads, key=lambda k: heads[k].id)
+        msg = heads[i]
+        try:
+            heads[i] = await iters[i].__anext__()
+        except StopAsyncIteration:
+            del heads[i]
+        if msg.id != last_id:
+            last_id = msg.id
+            yield msg
+
+
+def _iter_media(client, chat, thread_id: int | None = None):
+    """Video/document messages of a chat (or one topic of it), newest first, filtered server-side."""
+    return _merge_newest_first([
+        client.search_messages(chat, filter=f, thread_id=thread_id) for f in MEDIA_FILTERS
+    ])
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _media_record(chat_key: str, msg) -> dict | None:
+    """The message_media row for a video/document message (see db.save_message_media)."""
+    media = msg.video or msg.document if msg else None
+    if not media:
+        return None
+    return {
+        "chat": chat_key,
+        "message_id": msg.id,
+        "file_id": media.file_id,
+        "file_unique_id": media.file_unique_id,
+        "file_size": media.file_size or 0,
+        "mime_type": media.mime_type,
+        "file_name": media.file_name,
+        "dc_id": FileId.decode(media.file_id).dc_id,
+    }
+
+
+class _CachedMedia:
+    """Adapts a message_media row to what stream_media() reads off a media object."""
+
+    def __init__(self, record):
+        self.file_id = record["file_id"]
+        self.file_size = record["file_size"]
+
+
+def _posted_at(msg) -> str | None:
+    """Message date as the UTC 'YYYY-MM-DD HH:MM:SS' string stored in episodes.posted_at."""
+    if not msg.date:
+        return None
+    # Pyrogram hands out naive local-time datetimes — astimezone() reads them as local.
+    return msg.date.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _episode_dict(chat_key: str, message_id: int, season: int, episode: int, is_finale: bool,
+                  posted_at: str | None = None) -> dict:
+    return {
+        "season": season,
+        "episode": episode,
+        "source": f"{chat_key}:{message_id}",
+        "is_finale": is_finale,
+        "posted_at": posted_at,
+    }
+
+
 class TelegramHandler(BaseSiteHandler):
     """
     Tracks anime episodes posted to Telegram, in either of two shapes:
@@ -79,6 +182,12 @@ class TelegramHandler(BaseSiteHandler):
     """
     DOMAINS = ["t.me"]
 
+    def __init__(self):
+        # source -> why its last download() failed (see failure_reason)
+        self._failures: dict[str, str] = {}
+        # source -> future of its downloaded file's final path (see finish_download)
+        self._placing: dict[str, asyncio.Future] = {}
+
     def is_valid_url(self, url: str) -> bool:
         url = url.strip()
         return bool(URL_RE.match(url)) or bool(INVITE_RE.match(url))
@@ -94,56 +203,137 @@ class TelegramHandler(BaseSiteHandler):
         if not client:
             logger.error("Userbot client not configured (USERBOT_SESSION_STRING missing).")
             return
-        async for msg in client.get_discussion_replies(chat, anchor_id):
+        async for msg in _iter_media(client, chat, anchor_id):
             if msg.id == anchor_id:
                 continue
             if msg.video or msg.document:
                 yield msg
 
     async def _ensure_joined(self, invite_url: str) -> int | None:
-        """Join the private per-title channel (filing it into the anime folder), returning its chat_id."""
+        """
+        Join the private per-title channel (filing it into the anime folder),
+        returning its chat_id. Once resolved, the id is kept on the series row
+        and reused — no get_chat(invite_url) round trip on every cycle.
+        """
+        chat_id = await anime_db.aio.get_resolved_chat_id(invite_url)
+        if chat_id:
+            return chat_id
         client = get_userbot_client()
         if not client:
             logger.error("Userbot client not configured (USERBOT_SESSION_STRING missing).")
             return None
-        return await join_and_file(client, invite_url)
+        chat_id = await join_and_file(client, invite_url)
+        if chat_id:
+            await anime_db.aio.set_resolved_chat_id(invite_url, chat_id)
+        return chat_id
 
-    async def _resolve_episode_from_message(self, chat_key: str, msg) -> tuple[dict | None, bool]:
+    async def _resolve_episode_from_message(self, chat_key: str, topic: int, msg) -> tuple[dict | None, str]:
         """
         Shared per-message resolution used by both the forum-topic and
-        private-channel listing paths. Returns (episode_dict_or_None, was_cache_hit).
+        private-channel listing paths. Returns (episode_dict_or_None, how):
+        "cached" / "resolved" (via DeepSeek) for an episode, "skipped" when
+        the message is definitely not one (ignored variant, no episode number
+        in the answer), "failed" when DeepSeek gave no answer at all (API
+        error) — worth retrying on the next cycle.
         """
         caption = str(msg.caption or msg.text or "")
 
         if _is_ignored_variant(caption):
             logger.info(f"Skipping ignored variant (matched marker): {caption[:60]!r}")
-            return None, False
+            return None, "skipped"
+
+        is_finale = _is_finale(caption)
 
         # A message's caption never changes after posting — once resolved,
         # never re-run DeepSeek on it again. This is what previously made
         # every 6-hour check cycle burn one API call PER EPISODE PER SERIES,
         # forever, even for episodes downloaded months ago.
-        cached = anime_db.get_cached_caption(chat_key, msg.id)
+        cached = await anime_db.aio.get_cached_caption(chat_key, msg.id)
         if cached:
             season, episode = cached
-            was_cached = True
+            how = "cached"
         else:
             data = await extract_metadata(caption)
             if not data or data.get("episode") is None:
                 logger.warning(f"Could not parse episode from caption: {caption[:60]!r}")
-                return None, False
+                return None, "failed" if not data else "skipped"
             season = data.get("season", 1)
             episode = data["episode"]
-            anime_db.cache_caption(chat_key, msg.id, season, episode)
-            was_cached = False
+            await anime_db.aio.cache_caption(chat_key, msg.id, season, episode, topic=topic, is_finale=is_finale)
+            how = "resolved"
+
+        return _episode_dict(chat_key, msg.id, season, episode, is_finale, _posted_at(msg)), how
 
-        episode_dict = {
-            "season": season,
-            "episode": episode,
-            "source": f"{chat_key}:{msg.id}",
-            "is_finale": _is_finale(caption),
-        }
-        return episode_dict, was_cached
+    async def _collect_episodes(self, chat_key: str, topic: int, messages, full: bool,
+                                scanned_to: int = 0) -> list[dict]:
+        """
+        Shared incremental listing for both source shapes. `messages` — async
+        iterator over the chat's/topic's messages, NEWEST FIRST (that's how
+        Telegram's history/search methods iterate); it's cut off client-side
+        at the high-water mark, since search_messages can't filter by min_id.
+        `scanned_to` — newest message id the caller's own walk covered (a
+        shared channel scan), so a topic with nothing new still moves forward.
+
+        Incremental (the normal case): stops at the stored high-water mark for
+        (chat, topic) and serves everything older straight from caption_cache
+        — no API calls for messages already seen on an earlier cycle. Full
+        (first scan, every FULL_RESCAN_HOURS, or `full=True`): walks the whole
+        history and re-syncs the cache, so deleted/replaced uploads drop out.
+        Returned episodes are ordered oldest message first.
+
+        A message whose caption couldn't be resolved because DeepSeek failed
+        holds the mark just below it, so it's retried on the next cycle rather
+        than only on the next full rescan.
+        """
+        cursor = await anime_db.aio.get_scan_cursor(chat_key, topic)
+        full = full or anime_db.full_rescan_due(cursor, settings.FULL_RESCAN_HOURS)
+        min_id = 0 if full else cursor["last_message_id"]
+
+        found: dict[int, dict] = {}
+        media_records: list[dict] = []
+        top_id = 0
+        failed: list[int] = []
+        cache_hits = cache_misses = 0
+        async for msg in messages:
+            if msg.id <= min_id:
+                break
+            top_id = max(top_id, msg.id)
+            if msg.id == topic or not (msg.video or msg.document):
+                continue
+            ep, how = await self._resolve_episode_from_message(chat_key, topic, msg)
+            if ep:
+                found[msg.id] = ep
+                media_records.append(_media_record(chat_key, msg))
+                cache_hits += how == "cached"
+                cache_misses += how == "resolved"
+            elif how == "failed":
+                failed.append(msg.id)
+
+        await anime_db.aio.save_message_media(media_records)
+        if full and top_id:
+            await anime_db.aio.sync_topic_cache(chat_key, topic, [
+                (mid, ep["season"], ep["episode"], ep["is_finale"]) for mid, ep in found.items()
+            ])
+        new_count = len(found)
+        if not full:
+            for row in await anime_db.aio.get_cached_episodes(chat_key, topic):
+                found.setdefault(row["message_id"], _episode_dict(
+                    chat_key, row["message_id"], row["season"], row["episode"], bool(row["is_finale"])
+                ))
+        mark = max(top_id, scanned_to)
+        if failed:
+            mark = min(mark, min(failed) - 1)
+        if mark > min_id or (full and top_id):
+            await anime_db.aio.advance_scan_cursor(chat_key, topic, mark, full=full)
+
+        logger.info(
+            f"list_episodes({chat_key}/{topic}, {'full' if full else f'since #{min_id}'}): "
+            f"{len(found)} episodes, {new_count} seen this scan "
+            f"({cache_hits} from cache, {cache_misses} newly resolved via DeepSeek"
+            + (f", {len(failed)} failed — retried next cycle from #{mark}" if failed else "")
+            + ")."
+        )
+        return [found[mid] for mid in sorted(found)]
 
     # ------------------------------------------------------------------ interface
 
@@ -166,7 +356,7 @@ class TelegramHandler(BaseSiteHandler):
         chat_id = await self._ensure_joined(invite_url)
         if not chat_id:
             return None
-        async for msg in client.get_chat_history(chat_id):
+        async for msg in _iter_media(client, chat_id):
             if not (msg.video or msg.document):
                 continue
             caption = str(msg.caption or msg.text or "")
@@ -177,27 +367,81 @@ class TelegramHandler(BaseSiteHandler):
                 return data["title"]
         return None
 
-    async def list_episodes(self, url: str) -> list[dict]:
+    async def list_episodes(self, url: str, full: bool = False) -> list[dict]:
         url = url.strip()
         if INVITE_RE.match(url):
-            return await self._list_episodes_private(url)
+            return await self._list_episodes_private(url, full)
 
+        client = get_userbot_client()
+        if not client:
+            logger.error("Userbot client not configured (USERBOT_SESSION_STRING missing).")
+            return []
         chat, anchor_id = self._parse(url)
-        episodes: list[dict] = []
-        cache_hits = cache_misses = 0
-        async for msg in self._iter_video_replies(chat, anchor_id):
-            ep, was_cached = await self._resolve_episode_from_message(chat, msg)
-            if ep:
-                episodes.append(ep)
-                cache_hits += was_cached
-                cache_misses += not was_cached
+        return await self._collect_episodes(chat, anchor_id, _iter_media(client, chat, anchor_id), full)
+
+    def shared_scan_key(self, url: str) -> str | None:
+        """Forum-topic URLs of the same channel share one scan; a dedicated private channel never does."""
+        m = URL_RE.match(url.strip())
+        return m.group(1).lower() if m else None
+
+    async def list_episodes_shared(self, urls: list[str]) -> dict[str, list[dict]]:
+        """
+        List many tracked topics of ONE shared media-library channel (e.g.
+        RH_MediaLib) with a single walk of the channel's history, instead of
+        one walk per topic: each new media message is
+        routed to its topic by thread id. Turns per-cycle listing cost from
+        O(titles) into O(channels).
+
+        Topics due a full rescan (never scanned, or FULL_RESCAN_HOURS passed)
+        are listed on their own first — the channel walk only goes back as
+        far as the OLDEST per-topic high-water mark among the rest.
+        """
+        client = get_userbot_client()
+        if not client:
+            logger.error("Userbot client not configured (USERBOT_SESSION_STRING missing).")
+            return {}
+
+        results: dict[str, list[dict]] = {}
+        cursors: dict[int, int] = {}
+        url_by_anchor: dict[int, str] = {}
+        chat = None
+        for url in urls:
+            chat, anchor_id = self._parse(url)
+            cursor = await anime_db.aio.get_scan_cursor(chat, anchor_id)
+            if anime_db.full_rescan_due(cursor, settings.FULL_RESCAN_HOURS):
+                results[url] = await self.list_episodes(url, full=True)
+            else:
+                cursors[anchor_id] = cursor["last_message_id"]
+                url_by_anchor[anchor_id] = url
+        if not cursors:
+            return results
+
+        buckets: dict[int, list] = {anchor_id: [] for anchor_id in cursors}
+        top_id = 0
+        scanned = 0
+        min_id = min(cursors.values())
+        async for msg in _iter_media(client, chat):
+            if msg.id <= min_id:
+                break
+            scanned += 1
+            top_id = max(top_id, msg.id)
+            thread = thread_id_of(msg)
+            if thread in buckets and msg.id > cursors[thread]:
+                buckets[thread].append(msg)
+
         logger.info(
-            f"list_episodes({chat}): {len(episodes)} episodes, "
-            f"{cache_hits} from cache, {cache_misses} newly resolved via DeepSeek."
+            f"Shared scan of {chat}: {scanned} new media messages routed to "
+            f"{sum(map(len, buckets.values()))} across {len(buckets)} tracked topics."
         )
-        return episodes
-
-    async def _list_episodes_private(self, invite_url: str) -> list[dict]:
+        for anchor_id, msgs in buckets.items():
+            # Every topic is now known-current up to the channel's newest
+            # message, even ones with nothing new in this pass.
+            results[url_by_anchor[anchor_id]] = await self._collect_episodes(
+                chat, anchor_id, _aiter(msgs), full=False, scanned_to=top_id
+            )
+        return results
+
+    async def _list_episodes_private(self, invite_url: str, full: bool = False) -> list[dict]:
         client = get_userbot_client()
         if not client:
             logger.error("Userbot client not configured (USERBOT_SESSION_STRING missing).")
@@ -205,23 +449,57 @@ class TelegramHandler(BaseSiteHandler):
         chat_id = await self._ensure_joined(invite_url)
         if not chat_id:
             return []
+        # topic 0 = the whole chat (a dedicated per-title channel has no topics)
+        return await self._collect_episodes(str(chat_id), 0, _iter_media(client, chat_id), full)
 
-        chat_key = str(chat_id)
-        episodes: list[dict] = []
-        cache_hits = cache_misses = 0
-        async for msg in client.get_chat_history(chat_id):
-            if not (msg.video or msg.document):
+    async def find_episode(self, url: str, season: int, episode: int,
+                           source: str | None = None) -> list[dict]:
+        """
+        Targeted lookup for a 🔄 redownload: walk the title's topic (or
+        dedicated channel) newest first only down to the message the episode
+        was downloaded from, instead of re-listing its whole history. A
+        replacement upload is always posted after the original, so nothing
+        older can supersede it. Captions of messages seen before come from
+        caption_cache, so typically nothing but the few newest messages is
+        resolved via DeepSeek. Falls back to a full listing when the episode
+        has no recorded source (legacy rows, episodes seeded from disk).
+        """
+        url = url.strip()
+        client = get_userbot_client()
+        if not client:
+            logger.error("Userbot client not configured (USERBOT_SESSION_STRING missing).")
+            return []
+        if INVITE_RE.match(url):
+            chat = await self._ensure_joined(url)
+            if not chat:
+                return []
+            chat_key, topic = str(chat), 0
+        else:
+            chat, topic = self._parse(url)
+            chat_key = chat
+
+        source_chat, _, source_id = (source or "").rpartition(":")
+        if source_chat != chat_key or not source_id.isdigit():
+            return await super().find_episode(url, season, episode, source)
+        source_id = int(source_id)
+
+        found, media_records, scanned = [], [], 0
+        async for msg in _iter_media(client, chat, topic or None):
+            if msg.id < source_id:
+                break
+            scanned += 1
+            if msg.id == topic or not (msg.video or msg.document):
                 continue
-            ep, was_cached = await self._resolve_episode_from_message(chat_key, msg)
-            if ep:
-                episodes.append(ep)
-                cache_hits += was_cached
-                cache_misses += not was_cached
+            ep, _ = await self._resolve_episode_from_message(chat_key, topic, msg)
+            if ep and ep["season"] == season and ep["episode"] == episode:
+                found.append(ep)
+                media_records.append(_media_record(chat_key, msg))
+        await anime_db.aio.save_message_media(media_records)
         logger.info(
-            f"list_episodes(private {chat_id}): {len(episodes)} episodes, "
-            f"{cache_hits} from cache, {cache_misses} newly resolved via DeepSeek."
+            f"find_episode({chat_key}/{topic}, S{season:02d}E{episode:02d}): "
+            f"{scanned} messages since #{source_id}, {len(found)} candidates."
         )
-        return episodes
+        return found[::-1]
 
     async def download(self, source: str, title: str, season: int, episode: int,
                        path: str, notify_msg=None) -> bool:
@@ -234,6 +512,7 @@ class TelegramHandler(BaseSiteHandler):
             client = get_userbot_client()
             if not client:
                 logger.error("Userbot client not available for download.")
+                self._failures[source] = "userbot not available"
                 return False
 
             chat_str, msg_id_str = source.split(":", 1)
@@ -245,17 +524,24 @@ class TelegramHandler(BaseSiteHandler):
             except ValueError:
                 chat = chat_str  # public username (forum-topic case)
 
-            message = await client.get_messages(chat, int(msg_id_str))
-            media = message.video or message.document
-            if not media:
-                logger.error(f"No media on message {source}")
-                return False
+            msg_id = int(msg_id_str)
+
+            # Media metadata captured at listing time — no extra
+            # get_messages() round trip unless we've never seen this message
+            # (e.g. listed before this cache existed) or its reference expired.
+            record = await anime_db.aio.get_message_media(chat_str, msg_id)
+            if record is None:
+                record = await self._refresh_media_record(client, chat, chat_str, msg_id)
+                if record is None:
+                    logger.error(f"No media on message {source}")
+                    self._failures[source] = "no media on message"
+                    return False
 
             safe = sanitize_title(title)
             out_dir = os.path.join(path, safe)
             os.makedirs(out_dir, exist_ok=True)
 
-            _, ext = os.path.splitext(media.file_name or "")
+            _, ext = os.path.splitext(record["file_name"] or "")
             if not ext:
                 ext = ".mp4"
             target = os.path.join(out_dir, f"{safe} - S{season:02d}E{episode:02d}{ext}")
@@ -265,32 +551,92 @@ class TelegramHandler(BaseSiteHandler):
             async def progress(current, total):
                 await progress_bar(current, total, notify_msg, start_time)
 
-            downloaded_path = None
-            last_error = None
-            for attempt in range(1, DOWNLOAD_RETRY_ATTEMPTS + 1):
-                try:
-                    downloaded_path = await client.download_media(
-                        message, file_name=target, progress=progress
+            async def on_hold():
+                if notify_msg:
+                    await notify_msg.edit_text(
+                        f"⏸ {safe} S{season:02d}E{episode:02d}\nОчікую вільне місце на диску..."
                     )
-                    break
-                except Exception as e:
-                    last_error = e
+
+            # Held (not failed) until the file fits on the library volume —
+            # see core/disk_space.py.
+            async with disk_gate.reserve(out_dir, record["file_size"], on_hold=on_hold,
+                                         chat_id=notify_msg.chat.id if notify_msg else None):
+                refreshed = False
+                attempt = 0
+                while True:
+                    attempt += 1
+                    # Each attempt opens a new media session — paced, see
+                    # api_scheduler.RAW_METHOD_CLASSES.
+                    await api_scheduler.acquire("media")
+                    try:
+                        # Returns once the transfer is over — the move out of the
+                        # scratch dir (if any) is awaited in finish_download().
+                        self._placing[source] = await stream_to_file(
+                            client, _CachedMedia(record), target, progress=progress
+                        )
+                        self._failures.pop(source, None)
+                        return True
+                    except (FileReferenceExpired, IncompleteDownloadError) as e:
+                        # The file reference embedded in a file_id expires after a
+                        # while. get_file() swallows FILE_REFERENCE_EXPIRED and just
+                        # ends the stream early, so a short read is usually the only
+                        # sign of it — refresh the reference from the message once
+                        # and try again (not counted against the flaky-connection
+                        # retries). A second failure is retried like any other.
+                        error = e
+                        if not refreshed:
+                            logger.info(f"{type(e).__name__} for {source} ({e}), refreshing the file reference.")
+                            record = await self._refresh_media_record(client, chat, chat_str, msg_id)
+                            if record is None:
+                                logger.error(f"No media on message {source} (deleted?)")
+                                self._failures[source] = "no media on message (deleted?)"
+                                return False
+                            refreshed = True
+                            attempt -= 1
+                            continue
+                    except Exception as e:
+                        error = e
                     logger.warning(
-                        f"download_media attempt {attempt}/{DOWNLOAD_RETRY_ATTEMPTS} "
-                        f"failed for {source}: {type(e).__name__}: {e}"
+                        f"download attempt {attempt}/{DOWNLOAD_RETRY_ATTEMPTS} "
+                        f"failed for {source}: {type(error).__name__}: {error}"
                     )
-                    if attempt < DOWNLOAD_RETRY_ATTEMPTS:
-                        await asyncio.sleep(DOWNLOAD_RETRY_DELAY_SECONDS)
-
-            if downloaded_path is None:
-                if last_error:
-                    raise last_error
-                return False
-            return bool(downloaded_path)
+                    if attempt >= DOWNLOAD_RETRY_ATTEMPTS:
+                        raise error
+                    await asyncio.sleep(DOWNLOAD_RETRY_DELAY_SECONDS)
         except Exception as e:
             logger.error(f"Telegram download failed: {e}", exc_info=True)
+            self._failures[source] = f"{type(e).__name__}: {e}"
+            return False
+
+    async def finish_download(self, source: str) -> bool:
+        """Wait for download()'s file to reach the library, then index it. Never raises."""
+        placed = self._placing.pop(source, None)
+        if placed is None:
+            return True
+        try:
+            path = await placed
+            await asyncio.to_thread(library_index.add_file, path)
+            return True
+        except Exception as e:
+            logger.error(f"Moving {source} into the library failed: {e}", exc_info=True)
+            self._failures[source] = f"move failed: {type(e).__name__}: {e}"
             return False
 
+    def forget_download(self, source: str):
+        self._placing.pop(source, None)
+
+    def failure_reason(self, source: str) -> str | None:
+        return self._failures.get(source)
+
+    async def _refresh_media_record(self, client, chat, chat_key: str, msg_id: int):
+        """Re-fetch a message to get a fresh file reference, persisting and returning its media record."""
+        message = await client.get_messages(chat, msg_id)
+        record = _media_record(chat_key, message)
+        if record is None:
+            return None
+        await anime_db.aio.save_message_media([record])
+        return record
+
     async def cleanup(self, url: str) -> None:
         """Leave a dedicated per-title channel once tracking ends. No-op for
         forum-topic URLs — that's a shared media-library channel other
@@ -302,7 +648,9 @@ class TelegramHandler(BaseSiteHandler):
         if not client:
             return
         try:
-            chat = await client.get_chat(url)
-            await unfile_and_leave(client, chat.id)
+            chat_id = await anime_db.aio.get_resolved_chat_id(url)
+            if not chat_id:
+                chat_id = (await client.get_chat(url)).id
+            await unfile_and_leave(client, chat_id)
         except Exception as e:
             logger.warning(f"cleanup({url}) failed: {e}")
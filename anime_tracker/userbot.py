@@ -1,14 +1,28 @@
 import logging
 
 from pyrogram import Client
+from pyrogram.session import Session
 
+from anime_tracker.api_scheduler import api_scheduler
 from config.config import settings
+from core.session_storage import SeededFileStorage
 
 logger = logging.getLogger(__name__)
 
 _userbot_client: Client | None = None
 
 
+class ScheduledClient(Client):
+    """
+    Userbot client whose every API call goes through the shared
+    api_scheduler (per-method budgets, account-wide FloodWait pause).
+    """
+
+    async def invoke(self, query, retries: int = Session.MAX_RETRIES,
+                     timeout: float = Session.WAIT_TIMEOUT, sleep_threshold: float = None):
+        return await api_scheduler.invoke(super().invoke, query, retries=retries, timeout=timeout)
+
+
 def build_userbot_client() -> Client | None:
     """
     Construct (but don't start) the userbot client used to read channels/topics
@@ -21,12 +35,14 @@ def build_userbot_client() -> Client | None:
             "USERBOT_SESSION_STRING not set — Telegram-source anime tracking disabled."
         )
         return None
-    _userbot_client = Client(
+    # Persisted (sessions/userbot_reader.session), seeded from the session
+    # string — keeps resolved channels/access hashes across restarts instead
+    # of re-resolving every tracked chat on the first check cycle.
+    _userbot_client = ScheduledClient(
         "userbot_reader",
         api_id=settings.API_ID,
         api_hash=settings.API_HASH,
-        session_string=settings.USERBOT_SESSION_STRING,
-        in_memory=True,
+        storage=SeededFileStorage("userbot_reader", settings.USERBOT_SESSION_STRING),
     )
     return _userbot_client
 
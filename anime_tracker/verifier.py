@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from anime_tracker import db
+from config.config import settings
+from core.library_index import library_index
+from core.renamer import sanitize_title
+
+logger = logging.getLogger(__name__)
+
+# ffprobe processes run at once. Each mostly waits on the NAS reading the
+# file's headers/tail, so a few in parallel keep the link busy without
+# thrashing it.
+VERIFY_WORKERS = 4
+
+# Per-file ffprobe timeout — a stalled network read must not hang the run.
+PROBE_TIMEOUT_SECONDS = 120
+
+# Anything shorter isn't a real episode (broken upload, trailer, stub file).
+MIN_DURATION_SECONDS = 60
+
+# How much of the end of the file is read to catch truncation: a cut-off
+# download still carries the full duration in its container header, but has
+# no video packets near the end.
+TAIL_SECONDS = 15
+
+
+def _ffprobe(args: list[str]) -> tuple[int, str, str]:
+    proc = subprocess.run(
+        ["ffprobe", "-v", "error", *args],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT_SECONDS,
+    )
+    return proc.returncode, proc.stdout, proc.stderr.strip()
+
+
+def probe_file(path: str) -> tuple[bool, str | None, float | None]:
+    """
+    Check one file with ffprobe: readable container, a video stream, a
+    plausible duration, and video packets within the last TAIL_SECONDS.
+    Returns (ok, reason_if_not, duration). Runs in a worker process.
+    """
+    try:
+        code, out, err = _ffprobe([
+            "-show_entries", "format=duration:stream=codec_type",
+            "-of", "json", path,
+        ])
+        if code != 0:
+            return False, f"ffprobe: {err[:200] or f'exit {code}'}", None
+        info = json.loads(out or "{}")
+        if not any(s.get("codec_type") == "video" for s in info.get("streams", [])):
+            return False, "no video stream", None
+        duration = float(info.get("format", {}).get("duration") or 0)
+        if duration < MIN_DURATION_SECONDS:
+            return False, f"duration {duration:.0f}s", duration
+
+        start = max(0.0, duration - TAIL_SECONDS)
+        code, out, err = _ffprobe([
+            "-select_streams", "v:0", "-read_intervals", f"{start:.3f}%",
+            "-show_entries", "packet=pts_time", "-of", "csv=p=0", path,
+        ])
+        if code != 0 or not out.strip():
+            return False, f"truncated (no video after {start / 60:.1f} min)", duration
+        return True, None, duration
+    except subprocess.TimeoutExpired:
+        return False, "ffprobe timed out", None
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}", None
+
+
+def _episode_files(series, episodes) -> list[tuple[int, int, str | None]]:
+    """
+    (season, episode, path or None if missing) for each of a series' recorded
+    `episodes` (rows from db.get_episodes — fetched by the caller through the
+    DB thread; this runs in a worker thread for the filesystem lookups).
+    """
+    dest = settings.DOWNLOAD_PATH if series["category"] == "anime" else settings.DORAMA_PATH
+    folder = os.path.join(dest, sanitize_title(series["title"]))
+    result = []
+    for ep in episodes:
+        paths = library_index.files_for(folder, ep["season"], ep["episode"])
+        if not paths:
+            result.append((ep["season"], ep["episode"], None))
+        result.extend((ep["season"], ep["episode"], p) for p in paths)
+    return result
+
+
+async def verify_library(series_list: list | None = None, progress=None) -> list[dict]:
+    """
+    Verify every downloaded episode of `series_list` (default: all titles of
+    the last MAX_AGE_DAYS, active or stopped), running ffprobe in a process
+    pool. Results are cached by (path, size, mtime) in `file_checks`, so a
+    rerun only probes new or changed files. Returns the failures as dicts
+    {series_id, title, season, episode, path, reason} — each one fixable
+    with fixer.redownload_episode (🔄 in the fix menu).
+
+    `progress` — optional async callable(done, total), called as files finish.
+    """
+    if not shutil.which("ffprobe"):
+        raise RuntimeError("ffprobe not found — install ffmpeg")
+    if series_list is None:
+        series_list = await db.aio.get_recent_series()
+
+    jobs = []  # (series, season, episode, path, size, mtime_ns)
+    failures: list[dict] = []
+    for s in series_list:
+        episodes = await db.aio.get_episodes(s["id"])
+        for season, episode, path in await asyncio.to_thread(_episode_files, s, episodes):
+            if path is None:
+                failures.append({"series_id": s["id"], "title": s["title"], "season": season,
+                                 "episode": episode, "path": None, "reason": "file missing"})
+                continue
+            try:
+                st = await asyncio.to_thread(os.stat, path)
+            except FileNotFoundError:
+                continue
+            cached = await db.aio.get_file_check(path)
+            if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+                if not cached["ok"]:
+                    failures.append({"series_id": s["id"], "title": s["title"], "season": season,
+                                     "episode": episode, "path": path, "reason": cached["reason"]})
+                continue
+            jobs.append((s, season, episode, path, st.st_size, st.st_mtime_ns))
+
+    logger.info(f"Library verify: {len(jobs)} files to probe ({len(failures)} known failures/missing).")
+    loop = asyncio.get_running_loop()
+    done = 0
+    with ProcessPoolExecutor(max_workers=VERIFY_WORKERS) as pool:
+        async def _run(job):
+            return job, await loop.run_in_executor(pool, probe_file, job[3])
+
+        for next_done in asyncio.as_completed([_run(job) for job in jobs]):
+            (s, season, episode, path, size, mtime_ns), (ok, reason, duration) = await next_done
+            await db.aio.save_file_check(path, size, mtime_ns, s["id"], season, episode, ok, reason, duration)
+            if not ok:
+                logger.warning(f"Library verify: {path}: {reason}")
+                failures.append({"series_id": s["id"], "title": s["title"], "season": season,
+                                 "episode": episode, "path": path, "reason": reason})
+            done += 1
+            if progress:
+                try:
+                    await progress(done, len(jobs))
+                except Exception:
+                    pass
+    return failures
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    found = asyncio.run(verify_library())
+    for f in found:
+        print(f"{f['title']} S{f['season']:02d}E{f['episode']:02d}: {f['reason']} ({f['path']})")
+    print(f"{len(found)} problem(s).")
@@ -24,6 +24,31 @@ class Settings(BaseSettings):
     # itself can't access (Telegram Bot API has no chat-history endpoints)
     USERBOT_SESSION_STRING: str | None = None
 
+    # Anime tracking: each check cycle only fetches messages newer than the
+    # last one seen per channel/topic. Every FULL_RESCAN_HOURS the whole
+    # history is walked again instead, to notice deleted/replaced uploads
+    # (0 = never, only on first scan and manual redownloads).
+    FULL_RESCAN_HOURS: int = 168
+
+    # Anime tracking: how many episodes download at once — per title, and in
+    # total across all titles (one Telegram account, one uplink).
+    TRACKER_DOWNLOADS_PER_SERIES: int = 2
+    TRACKER_DOWNLOADS_TOTAL: int = 3
+
+    # Downloads only start if the destination volume keeps at least this much
+    # free space after the file (and every other in-flight download) lands;
+    # otherwise they wait for space instead of failing mid-transfer.
+    DISK_SPACE_MARGIN_MB: int = 2048
+
+    # Optional local directory downloads land in first; finished files are
+    # then moved into DOWNLOAD_PATH/DORAMA_PATH (usually a NAS mount) with
+    # large sequential writes. Unset = download straight into the library.
+    SCRATCH_PATH: str | None = None
+
+    # fsync policy for downloaded files: "none", "end" (once before the file
+    # is renamed into place) or "periodic" (also every 256 MiB while writing).
+    DOWNLOAD_FSYNC: str = "end"
+
     # Access Control
     ALLOWED_USERS: str | None = None # Comma-separated IDs
 
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# A forward of many videos arrives as that many separate updates, a few
+# hundred ms apart (an album — shared media_group_id — even closer). A burst
+# ends once no new video arrived in the chat for this long...
+BURST_WINDOW_SECONDS = 2.0
+
+# ...or at the latest this long after its first video, so a steady trickle
+# of forwards can't postpone processing forever.
+BURST_MAX_WAIT_SECONDS = 15.0
+
+
+class BurstCollector:
+    """
+    Collects videos arriving in quick succession in one chat into one job.
+
+    Forwarding 40 episodes at once used to run the whole Normal-mode
+    pipeline 40 times in parallel — 40 status replies, 40 DeepSeek calls, 40
+    mapper lookups and, for an unknown title, 40 competing prompts. Each
+    video is now held until the chat has been quiet for BURST_WINDOW_SECONDS
+    (or BURST_MAX_WAIT_SECONDS passed since the first one), then
+    `flush(chat_id, messages)` gets the whole burst in arrival order. Album
+    parts (same media_group_id) arrive within the window by construction,
+    and the window is measured from the last part.
+
+    A single forwarded video is flushed as a burst of one, just
+    BURST_WINDOW_SECONDS later than before.
+    """
+
+    def __init__(self, flush, window: float = BURST_WINDOW_SECONDS,
+                 max_wait: float = BURST_MAX_WAIT_SECONDS):
+        self._flush = flush  # async callable(chat_id, list[Message])
+        self.window = window
+        self.max_wait = max_wait
+        self._pending: dict[int, list] = {}
+        self._started: dict[int, float] = {}
+        self._timers: dict[int, asyncio.Task] = {}
+
+    def add(self, chat_id: int, message):
+        """Add a video to the chat's current burst (starting one if needed)."""
+        if chat_id not in self._pending:
+            self._pending[chat_id] = []
+            self._started[chat_id] = time.monotonic()
+        self._pending[chat_id].append(message)
+        timer = self._timers.get(chat_id)
+        if timer and not timer.done():
+            timer.cancel()
+        delay = min(self.window, self._started[chat_id] + self.max_wait - time.monotonic())
+        self._timers[chat_id] = asyncio.create_task(self._fire(chat_id, max(0.0, delay)))
+
+    async def _fire(self, chat_id: int, delay: float):
+        await asyncio.sleep(delay)
+        messages = self._pending.pop(chat_id, [])
+        self._started.pop(chat_id, None)
+        self._timers.pop(chat_id, None)
+        if not messages:
+            return
+        groups = {m.media_group_id for m in messages if getattr(m, "media_group_id", None)}
+        logger.info(f"Burst in chat {chat_id}: {len(messages)} videos ({len(groups)} albums).")
+        try:
+            await self._flush(chat_id, messages)
+        except Exception as e:
+            logger.error(f"Burst processing failed in chat {chat_id}: {e}", exc_info=True)
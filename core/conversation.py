@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often expired prompts are swept. A prompt's timeout is honoured to
+# within this many seconds.
+SWEEP_SECONDS = 5
+
+# Appended to a prompt sent while other questions in the chat are still
+# open — a plain (non-reply) answer goes to the OLDEST open question.
+REPLY_HINT = "\n\n↩️ _Reply to this message to answer it — {n} questions open_"
+
+
+class _Prompt:
+    __slots__ = ("chat_id", "future", "message_id", "expires_at")
+
+    def __init__(self, chat_id: int, future: asyncio.Future, expires_at: float):
+        self.chat_id = chat_id
+        self.future = future
+        self.message_id: int | None = None
+        self.expires_at = expires_at
+
+
+class ConversationManager:
+    """
+    Open questions to the user, any number per chat.
+
+    Previously main.py kept ONE Future per chat: two handlers asking at the
+    same time (two forwarded videos with unknown titles, a Batch episode
+    prompt next to a Normal-mode title prompt) silently replaced each
+    other's Future, so a chat's ingestion effectively ran one question at a
+    time. Now every prompt is queued per chat and a text message is routed
+    to the prompt it REPLIES to (Telegram reply-to message id), or — if it
+    isn't a reply to one — to the oldest open prompt (FIFO).
+
+    Timeouts are enforced by one sweeper task (every SWEEP_SECONDS) that
+    expires overdue prompts and drops them, instead of a timer per prompt.
+    """
+
+    def __init__(self):
+        self._pending: dict[int, list[_Prompt]] = {}
+        self._sweeper: asyncio.Task | None = None
+
+    def open_count(self, chat_id: int) -> int:
+        return len(self._pending.get(chat_id, []))
+
+    async def ask(self, chat_id: int, text: str, send, timeout: float) -> str:
+        """
+        Show `text` via `send(text)` (async callable returning the Message
+        the question is in) and wait for the answer. Raises
+        asyncio.TimeoutError if none arrives within `timeout` seconds.
+        """
+        self._ensure_sweeper()
+        loop = asyncio.get_running_loop()
+        prompt = _Prompt(chat_id, loop.create_future(), time.monotonic() + timeout)
+        queue = self._pending.setdefault(chat_id, [])
+        if queue:
+            text += REPLY_HINT.format(n=len(queue) + 1)
+        # Registered before sending, so an instant answer can't be missed.
+        queue.append(prompt)
+        try:
+            sent = await send(text)
+            prompt.message_id = getattr(sent, "id", None)
+            return await prompt.future
+        finally:
+            self._remove(prompt)
+
+    def route(self, message) -> bool:
+        """Deliver a text message to the prompt it answers. Returns False if no prompt is open."""
+        queue = [p for p in self._pending.get(message.chat.id, []) if not p.future.done()]
+        if not queue:
+            return False
+        reply_to = getattr(message, "reply_to_message_id", None)
+        target = next((p for p in queue if reply_to and p.message_id == reply_to), queue[0])
+        target.future.set_result(message.text or "")
+        return True
+
+    def _remove(self, prompt: _Prompt):
+        queue = self._pending.get(prompt.chat_id)
+        if queue and prompt in queue:
+            queue.remove(prompt)
+        if not queue:
+            self._pending.pop(prompt.chat_id, None)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self):
+        while self._pending:
+            await asyncio.sleep(SWEEP_SECONDS)
+            now = time.monotonic()
+            for queue in list(self._pending.values()):
+                for prompt in list(queue):
+                    if prompt.expires_at <= now and not prompt.future.done():
+                        prompt.future.set_exception(asyncio.TimeoutError())
+                        self._remove(prompt)
+                        logger.info(f"Prompt {prompt.message_id} in chat {prompt.chat_id} expired.")
+
+
+# Global instance
+conversations = ConversationManager()
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Max number of DB calls waiting for the DB thread. When full, callers yield to
+# the event loop and retry rather than blocking it — back-pressure instead of
+# an unbounded backlog if the sessions volume stalls for a while.
+DB_QUEUE_SIZE = 256
+
+# How often the "time kept off the event loop" summary is logged.
+STATS_LOG_INTERVAL_SECONDS = 3600
+
+# Event-loop lag heartbeat: a task that sleeps this long and records how late
+# it woke up. Anything blocking the loop (a SQLite call run on it, a slow
+# listdir, ...) shows up as lag — this, not the queue-submit time, is what
+# shows whether the loop is actually free.
+HEARTBEAT_SECONDS = 0.1
+
+
+def _set_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
+
+
+class DBExecutor:
+    """
+    Runs every SQLite call on ONE dedicated thread, fed by a bounded queue.
+
+    All SQLite access used to happen directly on the event loop, inside
+    Pyrogram handlers and the checker — one slow fsync on the NAS-backed
+    sessions volume stalled every handler at once, progress callbacks
+    included. A single thread also means a single writer: anime.db and
+    mappings.db never see two writers competing for the file lock.
+
+    Keeps running totals so the effect is measurable from the log:
+    `db_seconds` — time spent inside SQLite (previously spent blocking the
+    loop), `loop_seconds` — what the loop still pays per call (queueing),
+    and, once start_lag_monitor() runs, the event loop's wake-up lag as seen
+    by a HEARTBEAT_SECONDS heartbeat task.
+    """
+
+    def __init__(self, maxsize: int = DB_QUEUE_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+        self.jobs = 0
+        self.db_seconds = 0.0
+        self.max_db_seconds = 0.0
+        self.loop_seconds = 0.0
+        self.max_loop_seconds = 0.0
+        self.lag_samples = 0
+        self.lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._lag_task: asyncio.Task | None = None
+        self._last_stats_log = time.monotonic()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-executor", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            loop, future, fn, args, kwargs = item
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                callback, value = _set_exception, e
+            else:
+                callback, value = _set_result, result
+            elapsed = time.perf_counter() - start
+            self.jobs += 1
+            self.db_seconds += elapsed
+            self.max_db_seconds = max(self.max_db_seconds, elapsed)
+            try:
+                loop.call_soon_threadsafe(callback, future, value)
+            except RuntimeError:
+                pass  # loop already closed (shutdown) — nobody is waiting anymore
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on the DB thread and await its result."""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item = (loop, future, fn, args, kwargs)
+        while True:
+            start = time.perf_counter()
+            try:
+                self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                pass
+            finally:
+                elapsed = time.perf_counter() - start
+                self.loop_seconds += elapsed
+                self.max_loop_seconds = max(self.max_loop_seconds, elapsed)
+            await asyncio.sleep(0.01)
+        result = await future
+        self._maybe_log_stats()
+        return result
+
+    def start_lag_monitor(self, interval: float = HEARTBEAT_SECONDS) -> asyncio.Task:
+        """Start the event-loop lag heartbeat (idempotent)."""
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = asyncio.create_task(self._heartbeat(interval))
+        return self._lag_task
+
+    async def _heartbeat(self, interval: float):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            self.lag_samples += 1
+            self.lag_seconds += lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def stats(self) -> dict:
+        return {
+            "jobs": self.jobs,
+            "db_seconds": self.db_seconds,
+            "max_db_seconds": self.max_db_seconds,
+            "loop_seconds": self.loop_seconds,
+            "max_loop_seconds": self.max_loop_seconds,
+            "lag_samples": self.lag_samples,
+            "mean_lag_seconds": self.lag_seconds / self.lag_samples if self.lag_samples else 0.0,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
+
+    def log_stats(self):
+        lag = ""
+        if self.lag_samples:
+            lag = (
+                f" Event-loop lag: mean {self.lag_seconds / self.lag_samples * 1000:.1f} ms, "
+                f"max {self.max_lag_seconds * 1000:.1f} ms over {self.lag_samples} heartbeats."
+            )
+        logger.info(
+            f"DB thread: {self.jobs} calls, {self.db_seconds:.3f}s in SQLite off the "
+            f"event loop (max {self.max_db_seconds * 1000:.1f} ms/call); queue-submit cost "
+            f"{self.loop_seconds * 1000:.1f} ms total (max {self.max_loop_seconds * 1000:.2f} ms/call)."
+            + lag
+        )
+
+    def _maybe_log_stats(self):
+        now = time.monotonic()
+        if now - self._last_stats_log >= STATS_LOG_INTERVAL_SECONDS:
+            self._last_stats_log = now
+            self.log_stats()
+
+    def shutdown(self):
+        """Stop the DB thread after the already-queued calls finish."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+class AsyncProxy:
+    """
+    Wrap a module/object so every callable attribute becomes a coroutine
+    function executed on the DB thread:
+
+        await db.aio.get_downloaded_set(series_id)
+
+    Non-callable attributes are passed through unchanged. The wrapped
+    functions themselves stay plain synchronous code (and may call each other
+    freely — they're already on the DB thread when they do).
+    """
+
+    def __init__(self, target, executor: DBExecutor | None = None):
+        self._target = target
+        self._executor = executor or db_executor
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self._executor.run(attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
+# Global instance
+db_executor = DBExecutor()
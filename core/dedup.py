@@ -0,0 +1,304 @@
+import argparse
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+from core.library_index import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Smaller files aren't worth it (subtitles, covers, .nfo) — episodes are
+# hundreds of MB.
+MIN_SIZE_BYTES = 1024 * 1024
+
+# Bytes hashed at the start and at the end of a file in the partial-hash
+# pass. Same-size files that are different episodes almost always differ in
+# their container header already; only real candidates get a full read.
+PARTIAL_BYTES = 1024 * 1024
+
+HASH_BUFFER_BYTES = 8 * 1024 * 1024
+
+# In-progress files (downloads, mover copies) — never touched.
+_SKIP_SUFFIXES = (".temp", ".part", ".moving", ".dedup")
+
+# linux/fs.h: _IOW(0x94, 9, int) — clone the source file's extents into the
+# destination (btrfs, XFS with reflink=1, bcachefs, ...).
+FICLONE = 0x40049409
+
+LINK_MODES = ("auto", "reflink", "hardlink")
+
+
+def _hash_file(path: str, partial: bool) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        if partial:
+            h.update(f.read(PARTIAL_BYTES))
+            f.seek(max(0, os.fstat(f.fileno()).st_size - PARTIAL_BYTES))
+            h.update(f.read(PARTIAL_BYTES))
+        else:
+            while chunk := f.read(HASH_BUFFER_BYTES):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src: str, dest: str):
+    with open(src, "rb") as fin, open(dest, "wb") as fout:
+        fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+
+
+class Deduplicator:
+    """
+    Finds byte-identical episode files across the library roots and replaces
+    the extra copies with reflinks (copy-on-write clones) or hardlinks.
+
+    Duplicates appear when a title mapping is corrected after the fact (the
+    same episode lands in the old and the new title folder), when the same
+    video is forwarded in Normal mode and later downloaded by the tracker,
+    or when DOWNLOAD_PATH and DORAMA_PATH overlap.
+
+    Candidates are narrowed in three passes — size, then a hash of the first
+    and last PARTIAL_BYTES, then a full hash — so only real duplicates are
+    read in full. Hashes are cached in sessions/library.db by path + size +
+    mtime, so a later run only hashes new or changed files. Files that are
+    already links of each other (same inode) are counted once.
+
+    Only files on the same filesystem can share data; duplicates across
+    filesystems are reported, not touched. Everything here is blocking
+    filesystem work — run it from the CLI or via asyncio.to_thread().
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path          TEXT    PRIMARY KEY,
+                    size          INTEGER NOT NULL,
+                    mtime_ns      INTEGER NOT NULL,
+                    partial_hash  TEXT,
+                    full_hash     TEXT
+                );
+                CREATE TABLE IF NOT EXISTS dedup_runs (
+                    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+                    finished_at      TEXT    NOT NULL DEFAULT (datetime('now')),
+                    files            INTEGER NOT NULL,
+                    hashed_bytes     INTEGER NOT NULL,
+                    duplicates       INTEGER NOT NULL,
+                    linked           INTEGER NOT NULL,
+                    reclaimed_bytes  INTEGER NOT NULL,
+                    dry_run          INTEGER NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ── Scanning / hashing ──────────────────────────────────────────────────
+
+    @staticmethod
+    def _walk(roots: list[str]) -> dict[str, os.stat_result]:
+        """Every candidate file under `roots`, keyed by real path (overlapping roots are walked once)."""
+        files: dict[str, os.stat_result] = {}
+        for root in {os.path.realpath(r) for r in roots}:
+            for dirpath, dirnames, names in os.walk(root):
+                # Dot-folders are the bot's own staging areas (e.g. .pending).
+                dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+                for name in names:
+                    if name.endswith(_SKIP_SUFFIXES):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path, follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    if st.st_size >= MIN_SIZE_BYTES and os.path.isfile(path) and not os.path.islink(path):
+                        files[path] = st
+        return files
+
+    def _hashes(self, files: dict[str, os.stat_result], column: str, stats: dict) -> dict[str, str]:
+        """`column` ("partial_hash"/"full_hash") for each path, computing and caching what's missing."""
+        partial = column == "partial_hash"
+        result = {}
+        with self._connect() as conn:
+            for path, st in files.items():
+                row = conn.execute(
+                    f"SELECT size, mtime_ns, {column} FROM file_hashes WHERE path = ?", (path,)
+                ).fetchone()
+                if row and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns and row[column]:
+                    result[path] = row[column]
+                    continue
+                try:
+                    digest = _hash_file(path, partial)
+                except OSError as e:
+                    logger.warning(f"Dedup: cannot read {path}: {e}")
+                    continue
+                stats["hashed_bytes"] += min(st.st_size, 2 * PARTIAL_BYTES) if partial else st.st_size
+                result[path] = digest
+                if row and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns:
+                    conn.execute(f"UPDATE file_hashes SET {column} = ? WHERE path = ?", (digest, path))
+                else:
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, {column}) VALUES (?, ?, ?, ?)",
+                        (path, st.st_size, st.st_mtime_ns, digest)
+                    )
+        return result
+
+    @staticmethod
+    def _regroup(groups: list[list[str]], keys: dict[str, str]) -> list[list[str]]:
+        out = []
+        for group in groups:
+            by_key: dict[str, list[str]] = {}
+            for path in group:
+                if path in keys:
+                    by_key.setdefault(keys[path], []).append(path)
+            out.extend(g for g in by_key.values() if len(g) > 1)
+        return out
+
+    def find_duplicates(self, roots: list[str], stats: dict | None = None) -> list[list[str]]:
+        """Groups of paths with identical content (one path per inode), each sorted oldest first."""
+        stats = stats if stats is not None else {"files": 0, "hashed_bytes": 0}
+        files = self._walk(roots)
+        stats["files"] = len(files)
+
+        # One representative per inode: hardlinks are already deduplicated.
+        by_inode: dict[tuple[int, int], str] = {}
+        for path, st in sorted(files.items()):
+            by_inode.setdefault((st.st_dev, st.st_ino), path)
+        unique = {p: files[p] for p in by_inode.values()}
+
+        by_size: dict[int, list[str]] = {}
+        for path, st in unique.items():
+            by_size.setdefault(st.st_size, []).append(path)
+        groups = [g for g in by_size.values() if len(g) > 1]
+
+        candidates = {p: unique[p] for g in groups for p in g}
+        groups = self._regroup(groups, self._hashes(candidates, "partial_hash", stats))
+        candidates = {p: unique[p] for g in groups for p in g}
+        groups = self._regroup(groups, self._hashes(candidates, "full_hash", stats))
+        return [sorted(g, key=lambda p: (unique[p].st_mtime_ns, p)) for g in groups]
+
+    # ── Linking ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _link(keep: str, dup: str, mode: str) -> str:
+        """
+        Replace `dup` with a reflink/hardlink of `keep` through a temp name
+        and an atomic rename — `dup` is never missing, even if this fails
+        halfway. Returns the method used.
+        """
+        temp = f"{dup}.dedup"
+        try:
+            if mode in ("auto", "reflink"):
+                try:
+                    _reflink(keep, temp)
+                    os.replace(temp, dup)
+                    return "reflink"
+                except OSError as e:
+                    if os.path.exists(temp):
+                        os.remove(temp)
+                    if mode == "reflink" or e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY,
+                                                             errno.EXDEV, errno.EINVAL):
+                        raise
+            os.link(keep, temp)
+            os.replace(temp, dup)
+            return "hardlink"
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+
+    def run(self, roots: list[str], mode: str = "auto", dry_run: bool = False) -> dict:
+        """
+        Find duplicates under `roots` and link them to the oldest copy of
+        each group. Returns (and records in `dedup_runs`) the totals:
+        files, hashed_bytes, duplicates, linked, reclaimed_bytes.
+        """
+        if mode not in LINK_MODES:
+            raise ValueError(f"mode must be one of {LINK_MODES}, got {mode!r}")
+        stats = {"files": 0, "hashed_bytes": 0, "duplicates": 0, "linked": 0, "reclaimed_bytes": 0}
+        for group in self.find_duplicates(roots, stats):
+            keep = group[0]
+            keep_st = os.stat(keep)
+            for dup in group[1:]:
+                stats["duplicates"] += 1
+                dup_st = os.stat(dup)
+                if dup_st.st_dev != keep_st.st_dev:
+                    logger.info(f"Dedup: {dup} duplicates {keep} on another filesystem — left as is.")
+                    continue
+                if dry_run:
+                    logger.info(f"Dedup (dry run): {dup} = {keep}")
+                    stats["reclaimed_bytes"] += dup_st.st_size
+                    continue
+                try:
+                    method = self._link(keep, dup, mode)
+                except OSError as e:
+                    logger.warning(f"Dedup: could not link {dup} -> {keep}: {e}")
+                    continue
+                stats["linked"] += 1
+                stats["reclaimed_bytes"] += dup_st.st_size
+                logger.info(f"Dedup: {dup} -> {keep} ({method}, {dup_st.st_size / 1024**2:.0f} MB)")
+                with self._connect() as conn:
+                    # The link has keep's inode and mtime — re-hashed (cheaply,
+                    # from keep's row) only if it ever changes again.
+                    conn.execute(
+                        "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, partial_hash, full_hash) "
+                        "SELECT ?, size, ?, partial_hash, full_hash FROM file_hashes WHERE path = ?",
+                        (dup, os.stat(dup).st_mtime_ns, keep)
+                    )
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO dedup_runs (files, hashed_bytes, duplicates, linked, reclaimed_bytes, dry_run) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (stats["files"], stats["hashed_bytes"], stats["duplicates"], stats["linked"],
+                 stats["reclaimed_bytes"], int(dry_run))
+            )
+            # Forget files that are gone, so the cache doesn't grow forever.
+            known = [r["path"] for r in conn.execute("SELECT path FROM file_hashes").fetchall()]
+            conn.executemany("DELETE FROM file_hashes WHERE path = ?",
+                             [(p,) for p in known if not os.path.exists(p)])
+        return stats
+
+    def total_reclaimed(self) -> int:
+        """Bytes reclaimed by all non-dry runs so far."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT COALESCE(SUM(reclaimed_bytes), 0) AS n FROM dedup_runs "
+                               "WHERE dry_run = 0").fetchone()
+        return row["n"]
+
+
+# ── CLI: python -m core.dedup [--dry-run] [--mode auto|reflink|hardlink] [DIR ...] ──
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Link byte-identical episode files across the library")
+    parser.add_argument("dirs", nargs="*", help="Roots to scan (default: DOWNLOAD_PATH and DORAMA_PATH)")
+    parser.add_argument("--mode", choices=LINK_MODES, default="auto",
+                        help="auto = reflink where the filesystem supports it, else hardlink")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be linked")
+    args = parser.parse_args()
+
+    roots = args.dirs
+    if not roots:
+        from config.config import settings
+        roots = [settings.DOWNLOAD_PATH, settings.DORAMA_PATH]
+
+    dedup = Deduplicator()
+    start = time.perf_counter()
+    result = dedup.run(roots, mode=args.mode, dry_run=args.dry_run)
+    print(
+        f"{result['files']} files, {result['hashed_bytes'] / 1024**2:.0f} MB hashed, "
+        f"{result['duplicates']} duplicates, {result['linked']} linked, "
+        f"{result['reclaimed_bytes'] / 1024**3:.2f} GB {'reclaimable' if args.dry_run else 'reclaimed'} "
+        f"in {time.perf_counter() - start:.1f}s "
+        f"(all runs: {dedup.total_reclaimed() / 1024**3:.2f} GB)"
+    )
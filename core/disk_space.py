@@ -0,0 +1,187 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# While downloads are held for lack of space, free space is re-checked this
+# often — space is usually freed outside the bot (files moved/deleted on the
+# NAS), which nothing here gets notified about.
+RECHECK_SECONDS = 60
+
+
+def _device_and_free(path: str) -> tuple[int, int]:
+    """(st_dev, bytes available to us) of the filesystem `path` lives on —
+    walks up to the nearest existing parent (the title folder may not exist yet)."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    st = os.statvfs(path)
+    return os.stat(path).st_dev, st.f_bavail * st.f_frsize
+
+
+class _Reservation:
+    __slots__ = ("dev", "size", "remaining")
+
+    def __init__(self, dev: int, size: int):
+        self.dev = dev
+        self.size = size
+        self.remaining = size  # not yet taken up on disk — see DiskSpaceGate.claim
+
+
+# The reservations the current task runs under, innermost last (tasks
+# created inside a reserve() block inherit them).
+_active: contextvars.ContextVar[tuple[_Reservation, ...]] = contextvars.ContextVar(
+    "disk_reservations", default=()
+)
+
+
+class DiskSpaceGate:
+    """
+    Admission control for downloads: a job may start only if the destination
+    filesystem has room for its file PLUS everything already reserved by
+    in-flight jobs on the same filesystem PLUS settings.DISK_SPACE_MARGIN_MB.
+
+    Previously a full library volume was only noticed mid-transfer — after
+    the bandwidth was spent — leaving partial files behind and failing (or
+    retrying) forever. A job that doesn't fit is HELD instead, and resumes
+    on its own when another job finishes or space is freed externally.
+    Users get one consolidated warning when holding starts and one notice
+    when it ends, not one per job.
+
+    What a job has already put on disk (a preallocated file, written
+    chunks) is in statvfs' free space already — claim() takes it off the
+    job's reservation, so in-flight downloads aren't counted twice.
+    """
+
+    def __init__(self):
+        self._reserved: dict[int, int] = {}  # st_dev -> bytes reserved by running jobs
+        self._cond = asyncio.Condition()
+        self._released = 0  # bumped on every release, so a waiter can't miss one
+        self._held = 0
+        self._held_chats: set[int] = set()
+        self._notify = None  # async callable(text, chat_ids) — set by main via set_notifier()
+
+    def set_notifier(self, notify):
+        """`notify(text, chat_ids)` — chat_ids: the chats of the held jobs, for when no users are configured."""
+        self._notify = notify
+
+    async def _announce(self, text: str, chat_ids: set[int]):
+        if not self._notify:
+            return
+        try:
+            await self._notify(text, chat_ids)
+        except Exception as e:
+            logger.warning(f"Disk space notice failed: {e}")
+
+    def claim(self, dev: int, nbytes: int):
+        """
+        The current task's job now occupies `nbytes` more on `dev` (negative:
+        freed again, e.g. a failed attempt's file) — move them from its
+        innermost reservation on that filesystem to "on disk".
+        """
+        for reservation in reversed(_active.get()):
+            if reservation.dev == dev:
+                taken = max(reservation.remaining - reservation.size,
+                            min(nbytes, reservation.remaining))
+                reservation.remaining -= taken
+                self._reserved[dev] -= taken
+                return
+
+    def _margin(self) -> int:
+        return settings.DISK_SPACE_MARGIN_MB * 1024 * 1024
+
+    async def has_room(self, path: str, size: int) -> bool:
+        """Non-blocking check: would a `size`-byte job to `path` be admitted right now?"""
+        dev, free = await asyncio.to_thread(_device_and_free, path)
+        return free >= size + self._reserved.get(dev, 0) + self._margin()
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, path: str, size: int, on_hold=None, chat_id: int | None = None):
+        """
+        Hold `size` bytes on `path`'s filesystem for the duration of the
+        block, waiting (not failing) until they fit. `on_hold` — optional
+        async callable, awaited once if the job has to wait; `chat_id` — the
+        chat the job belongs to, told about the hold if no users are
+        configured.
+
+        Only the bookkeeping runs under the lock: statvfs (slow on a NAS),
+        the notices and `on_hold` (Telegram calls) run outside it, so they
+        never stall other jobs' reservations and releases.
+        """
+        size = max(0, size or 0)
+        dev = None
+        held = False
+        admitted = False
+        try:
+            while True:
+                dev, free = await asyncio.to_thread(_device_and_free, path)
+                just_held, warning = False, None
+                async with self._cond:
+                    released = self._released
+                    needed = size + self._reserved.get(dev, 0) + self._margin()
+                    if free >= needed:
+                        self._reserved[dev] = self._reserved.get(dev, 0) + size
+                        reservation = _Reservation(dev, size)
+                        admitted = True
+                    elif not held:
+                        held = just_held = True
+                        self._held += 1
+                        if chat_id is not None:
+                            self._held_chats.add(chat_id)
+                        logger.warning(
+                            f"Not enough space for {size / 1024**2:.0f} MB in {path}: "
+                            f"{free / 1024**3:.1f} GB free, {needed / 1024**3:.1f} GB needed — holding."
+                        )
+                        if self._held == 1:
+                            warning = (
+                                f"⚠️ Мало місця на диску ({free / 1024**3:.1f} GB вільно) — "
+                                f"завантаження призупинені, продовжу, щойно звільниться місце."
+                            )
+                    chats = set(self._held_chats)
+                if admitted:
+                    break
+                if warning:
+                    await self._announce(warning, chats)
+                if just_held and on_hold:
+                    try:
+                        await on_hold()
+                    except Exception:
+                        pass
+                async with self._cond:
+                    try:
+                        await asyncio.wait_for(
+                            self._cond.wait_for(lambda: self._released != released), RECHECK_SECONDS
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            if held:
+                async with self._cond:
+                    self._held -= 1
+                    resumed = self._held == 0
+                    chats = set(self._held_chats)
+                    if resumed:
+                        self._held_chats.clear()
+                if resumed:
+                    await self._announce("✅ Місце на диску звільнилось — завантаження продовжено.", chats)
+        token = _active.set(_active.get() + (reservation,))
+        try:
+            yield
+        finally:
+            _active.reset(token)
+            async with self._cond:
+                self._reserved[dev] -= reservation.remaining
+                self._released += 1
+                self._cond.notify_all()
+
+
+# Global instance
+disk_gate = DiskSpaceGate()
@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 import logging
 import time
@@ -6,6 +8,10 @@ from pyrogram.types import Message
 from pyrogram.errors import FloodWait
 from config.config import settings
 from core.renamer import get_target_path, generate_filename
+from core.disk_space import disk_gate
+from core.file_writer import PreallocatedWriter
+from core.library_index import library_index
+from core.mover import mover
 
 logger = logging.getLogger(__name__)
 
@@ -46,11 +52,334 @@ async def progress_bar(current, total, status_msg: Message, start_time):
     except Exception as e:
         logger.debug(f"Failed to update progress: {e}") 
 
-async def download_video(client: Client, message: Message, metadata: dict, status_msg: Message = None):
+# Staging folder (inside DOWNLOAD_PATH, so on the library filesystem) for
+# Normal-mode downloads whose title the user hasn't confirmed yet — see
+# ProvisionalDownload. Dot-named, so the library index never treats it as a
+# title folder.
+PENDING_DIR = ".pending"
+
+
+class ProvisionalDownload:
+    """
+    A Normal-mode download that starts before the user has confirmed the
+    title. Previously an unknown title blocked the download until the user
+    answered (up to 5 minutes), with the connection idle meanwhile. Now the
+    file downloads straight away to PENDING_DIR under a name built from the
+    AI-detected title, while the question is open:
+
+    - confirm(name) before the download starts → it goes to the final place
+      directly, as if the title had been known;
+    - confirm(name) later → finalize() renames the staged file into
+      get_target_path() once the download is done (same filesystem → one
+      atomic rename);
+    - cancel() → a queued download is skipped, a running one is stopped,
+      and a finished staged file is deleted.
+
+    The caller doesn't wait for the download: finalize_later() runs
+    finalize() in the background once `result` is set. The staged name is
+    prefixed with `key` (the message id), so two unconfirmed forwards with
+    the same detected title and episode don't share a file.
+
+    Passed to download_video() as metadata["provisional"].
+    """
+
+    def __init__(self, provisional_name: str, key: int):
+        self.provisional_name = provisional_name
+        self.key = key
+        self.final_name: str | None = None
+        self.cancelled = False
+        # Path download_video() left the file at (staging or final), or None.
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._task: asyncio.Task | None = None
+
+    def confirm(self, final_name: str):
+        self.final_name = final_name
+
+    def cancel(self):
+        self.cancelled = True
+        if self._task and not self._task.done():
+            self._task.cancel()
+        elif self._task is None:
+            # Still queued — nothing to wait for; the worker skips it.
+            self.abandon()
+
+    def staged_filename(self, season: int, episode: int, ext: str) -> str:
+        return f"{self.key} {generate_filename(self.provisional_name, season, episode, ext)}"
+
+    def _resolve(self, path: str | None):
+        if not self.result.done():
+            self.result.set_result(path)
+
+    def abandon(self):
+        """Nothing was (or will be) downloaded — finalize() returns None."""
+        self._resolve(None)
+
+    async def finalize(self, season: int, episode: int) -> str | None:
+        """
+        Wait for the download, then move a staged file to its final name
+        (or delete it if cancelled). Returns the final path, or None.
+        """
+        path = await self.result
+        if not path:
+            return None
+        if self.cancelled:
+            await asyncio.to_thread(_remove_quietly, path)
+            logger.info(f"Discarded cancelled provisional download: {path}")
+            return None
+        if os.path.dirname(path) != _pending_folder():
+            return path  # confirmed before the download started
+        _, ext = os.path.splitext(path)
+        target = get_target_path(self.final_name, generate_filename(self.final_name, season, episode, ext))
+        await mover.move(path, target)
+        await asyncio.to_thread(library_index.add_file, target)
+        logger.info(f"Provisional download confirmed: {path} -> {target}")
+        return target
+
+    def finalize_later(self, season: int, episode: int, on_done=None):
+        """
+        finalize() in the background — `on_done` (optional async
+        callable(path | None)) is awaited with its result.
+        """
+        task = asyncio.create_task(self._finalize_then(season, episode, on_done))
+        _finalizers.add(task)
+        task.add_done_callback(_finalizers.discard)
+
+    async def _finalize_then(self, season: int, episode: int, on_done):
+        try:
+            path = await self.finalize(season, episode)
+        except Exception as e:
+            logger.error(f"Finalizing provisional download {self.provisional_name} failed: {e}")
+            path = None
+        if on_done:
+            try:
+                await on_done(path)
+            except Exception as e:
+                logger.debug(f"Provisional download callback failed: {e}")
+
+
+# Background finalize_later() tasks — strong references until they finish.
+_finalizers: set[asyncio.Task] = set()
+
+
+def discard_stale_pending() -> int:
+    """
+    Delete files left in PENDING_DIR — staged downloads whose title prompt
+    died with the previous run. Call once at startup, before the queue runs.
+    """
+    folder = _pending_folder()
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            _remove_quietly(path)
+            removed += 1
+    if removed:
+        logger.info(f"Discarded {removed} stale provisional download(s) from {folder}")
+    return removed
+
+
+def _pending_folder() -> str:
+    return os.path.join(settings.DOWNLOAD_PATH, PENDING_DIR)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def display_path(path: str) -> str:
+    """Display Path Replacement (Docker -> Windows) for completion messages."""
+    internal_root = settings.DOWNLOAD_PATH # e.g. /data/downloads
+    windows_root = r"Z:\Video\Anime"
+    if path.startswith(internal_root):
+        path = path.replace(internal_root, windows_root, 1)
+    # Normalize slashes for Windows look
+    return path.replace("/", "\\")
+
+
+class IncompleteDownloadError(IOError):
+    """The stream ended before `file_size` bytes arrived."""
+
+
+def _scratch_path(target_path: str) -> str | None:
+    """
+    Where to download `target_path` first, if a scratch dir is configured:
+    <SCRATCH_PATH>/<title folder>-<hash of its full path>/<file>, so the same
+    title under DOWNLOAD_PATH and DORAMA_PATH never shares a scratch file.
+    """
+    if not settings.SCRATCH_PATH:
+        return None
+    folder = os.path.dirname(os.path.abspath(target_path))
+    key = hashlib.blake2b(folder.encode(), digest_size=4).hexdigest()
+    return os.path.join(settings.SCRATCH_PATH, f"{os.path.basename(folder)}-{key}", os.path.basename(target_path))
+
+
+async def _stream(client: Client, media, path: str, total: int, progress=None):
+    """Stream `media` into `path` through a ".temp" file that's renamed into place on success."""
+    temp_path = f"{path}.temp"
+    current = 0
+    writer = None
+    try:
+        # Preallocated, batched, off-loop writes — see core/file_writer.py.
+        writer = PreallocatedWriter(temp_path, total, fsync=settings.DOWNLOAD_FSYNC,
+                                    on_allocated=disk_gate.claim)
+        await writer.open()
+        async for chunk in client.stream_media(media):
+            await writer.write(chunk)
+            current += len(chunk)
+            if progress and total:
+                await progress(min(current, total), total)
+        if total and current != total:
+            raise IncompleteDownloadError(
+                f"stream ended after {current} of {total} bytes for {os.path.basename(path)}"
+            )
+        await writer.close()
+        await asyncio.to_thread(os.replace, temp_path, path)
+    except BaseException:
+        if writer:
+            writer.abort()
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+async def _via_scratch(client: Client, media, scratch: str, target_path: str, total: int,
+                       progress, transferred: asyncio.Future) -> str:
+    """Download to `scratch`, signal `transferred`, then move the file to `target_path`."""
+    # The scratch copy occupies the scratch volume until the mover has
+    # removed it — held (not failed) until it fits, like the library volume.
+    async with disk_gate.reserve(scratch, total):
+        await asyncio.to_thread(os.makedirs, os.path.dirname(scratch), exist_ok=True)
+        await _stream(client, media, scratch, total, progress)
+        transferred.set_result(None)
+        try:
+            return await mover.move(scratch, target_path)
+        except BaseException:
+            # Nothing retries a failed move — the download is retried as a
+            # whole — so don't leave the scratch copy behind.
+            await asyncio.to_thread(_remove_quietly, scratch)
+            raise
+
+
+async def stream_to_file(client: Client, media, target_path: str, progress=None) -> asyncio.Future:
     """
-    Downloads video using Pyrogram's built-in download_media method.
-    This is more stable than the custom multi-threaded downloader.
+    Download `media` (a Message, or any object with `file_id`/`file_size`,
+    e.g. a cached media record) to `target_path` via stream_media(), through
+    a ".temp" file that's renamed into place on success.
+
+    Unlike download_media() — which swallows every error and just returns
+    None — this RAISES on failure. Pyrogram's get_file() (under
+    stream_media) itself logs and swallows most errors, FILE_REFERENCE_EXPIRED
+    included, and just stops yielding chunks — so a stream that ends short
+    of `file_size` raises IncompleteDownloadError instead of leaving a
+    truncated episode in place; callers refresh the reference and retry.
+
+    Returns as soon as the transfer is over (callers free their download
+    slot then), with a future that resolves to `target_path` once the file
+    is in place — await it before indexing/recording the file. Without
+    settings.SCRATCH_PATH it's already done. With it, the file lands on
+    local scratch and core.mover copies it into the library in the
+    background; the future raises if that fails.
     """
+    total = getattr(media, "file_size", 0) or 0
+    scratch = _scratch_path(target_path)
+    if not scratch:
+        await _stream(client, media, target_path, total, progress)
+        placed = asyncio.get_running_loop().create_future()
+        placed.set_result(target_path)
+        return placed
+
+    transferred = asyncio.get_running_loop().create_future()
+    placed = asyncio.create_task(_via_scratch(client, media, scratch, target_path, total, progress, transferred))
+    try:
+        await asyncio.wait({transferred, placed}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        placed.cancel()
+        raise
+    if not transferred.done():
+        placed.result()  # the transfer failed — raise its error here
+    return placed
+
+
+async def _finish_download(placed: asyncio.Future, staged: bool, provisional: "ProvisionalDownload | None",
+                           status_msg: Message = None) -> str | None:
+    """Second half of download_video(): wait for the file to be in place, index it, report."""
+    try:
+        downloaded_path = await placed
+    except Exception as e:
+        logger.error(f"Moving the download into the library failed: {e}")
+        if status_msg:
+            try:
+                await status_msg.edit_text(f"❌ Error moving the file into the library: {e}")
+            except Exception:
+                pass
+        return None
+
+    if provisional:
+        provisional._resolve(downloaded_path)
+    if staged:
+        # Confirmed meanwhile — finalize_later() reports the final place.
+        if status_msg and not provisional.final_name:
+            try:
+                await status_msg.edit_text("✅ Downloaded — waiting for the title confirmation...")
+            except Exception:
+                pass
+        logger.info(f"Download staged until the title is confirmed: {downloaded_path}")
+        return downloaded_path
+
+    await asyncio.to_thread(library_index.add_file, downloaded_path)
+
+    if status_msg:
+        try:
+            await status_msg.edit_text(f"✅ Download Complete!\nSaved to: `{display_path(downloaded_path)}`")
+        except FloodWait as e:
+            logger.warning(f"FloodWait on completion message: need to wait {e.value}s")
+        except Exception as e:
+            logger.debug(f"Failed to update completion message: {e}")
+
+    logger.info(f"Download completed: {downloaded_path}")
+    return downloaded_path
+
+
+async def download_video(client: Client, message: Message, metadata: dict,
+                         status_msg: Message = None) -> asyncio.Task | None:
+    """
+    Downloads video with stream_to_file() — the same single-stream path as
+    tracker downloads (so it also uses the scratch dir + mover when
+    configured). Single stream, like download_media(): the old custom
+    multi-threaded downloader raced inside Pyrogram.
+
+    Returns once the transfer is over: None if it failed or was cancelled,
+    else a task resolving to the final path (or None) that finishes the job
+    — waits for the move out of the scratch dir, indexes the file and
+    reports completion — so the queue worker can start the next download
+    meanwhile.
+    """
+    provisional: ProvisionalDownload | None = metadata.get("provisional")
+    finishing = None
+    try:
+        finishing = await _download_video(client, message, metadata, status_msg)
+        return finishing
+    finally:
+        # Whatever way this ends — no media, an error, a cancel, a worker
+        # shutdown — ProvisionalDownload.finalize() must not wait forever.
+        if provisional:
+            if finishing is None:
+                provisional.abandon()
+            else:
+                finishing.add_done_callback(lambda _: provisional.abandon())
+
+
+async def _download_video(client: Client, message: Message, metadata: dict,
+                          status_msg: Message = None) -> asyncio.Task | None:
     canonical_name = metadata['canonical_name']
     season = metadata.get('season') 
     episode = metadata.get('episode')
@@ -65,49 +394,57 @@ async def download_video(client: Client, message: Message, metadata: dict, statu
     if not ext:
         ext = ".mp4"
         
-    new_filename = generate_filename(canonical_name, season, episode, ext)
-    target_path = get_target_path(canonical_name, new_filename)
+    provisional: ProvisionalDownload | None = metadata.get("provisional")
+    staged = False
+    if provisional:
+        if provisional.cancelled:
+            if status_msg:
+                try:
+                    await status_msg.edit_text("❌ Cancelled by user.")
+                except Exception:
+                    pass
+            return None
+        if provisional.final_name:
+            canonical_name = provisional.final_name
+        else:
+            staged = True
+
+    if staged:
+        os.makedirs(_pending_folder(), exist_ok=True)
+        target_path = os.path.join(_pending_folder(), provisional.staged_filename(season, episode, ext))
+    else:
+        new_filename = generate_filename(canonical_name, season, episode, ext)
+        target_path = get_target_path(canonical_name, new_filename)
     
     logger.info(f"Starting download: {target_path} | Size: {file_size/1024/1024:.2f} MB")
     
     start_time = time.time()
     
     async def progress(current, total):
-        """Progress callback для download_media"""
+        """Progress callback для stream_to_file"""
         await progress_bar(current, total, status_msg, start_time)
     
     try:
-        # Використовуємо вбудований Pyrogram downloader
-        downloaded_path = await client.download_media(
-            message,
-            file_name=target_path,
-            progress=progress
-        )
+        download = asyncio.create_task(stream_to_file(client, media, target_path, progress=progress))
+        if provisional:
+            provisional._task = download
+        try:
+            placed = await download
+        except asyncio.CancelledError:
+            # cancel() from the title prompt — not a shutdown of the worker itself.
+            if provisional and provisional.cancelled and not asyncio.current_task().cancelling():
+                logger.info(f"Provisional download cancelled: {target_path}")
+                if status_msg:
+                    try:
+                        await status_msg.edit_text("❌ Cancelled by user.")
+                    except Exception:
+                        pass
+                return None
+            raise
         
         # Final progress update
         await progress_bar(file_size, file_size, status_msg, start_time)
-        
-        if status_msg:
-            # Display Path Replacement (Docker -> Windows)
-            display_path = downloaded_path
-            internal_root = settings.DOWNLOAD_PATH # e.g. /data/downloads
-            windows_root = r"Z:\Video\Anime"
-            
-            if display_path.startswith(internal_root):
-                display_path = display_path.replace(internal_root, windows_root, 1)
-            
-            # Normalize slashes for Windows look
-            display_path = display_path.replace("/", "\\")
-            
-            try:
-                await status_msg.edit_text(f"✅ Download Complete!\nSaved to: `{display_path}`")
-            except FloodWait as e:
-                logger.warning(f"FloodWait on completion message: need to wait {e.value}s")
-            except Exception as e:
-                logger.debug(f"Failed to update completion message: {e}")
-            
-        logger.info(f"Download completed: {downloaded_path}")
-        return downloaded_path
+        return asyncio.create_task(_finish_download(placed, staged, provisional, status_msg))
         
     except Exception as e:
         logger.error(f"Download failed: {e}")
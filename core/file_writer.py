@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import ctypes
+import errno
+import logging
+import os
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pyrogram streams files in 1 MiB chunks. They're collected into writes of
+# this size (a multiple of 1 MiB, so every write starts 1 MiB-aligned) and
+# handed to the kernel in ONE vectored pwritev call, without first copying
+# them into a joint buffer.
+WRITE_BUFFER_BYTES = 8 * 1024 * 1024
+
+# fsync policy for downloaded files (settings.DOWNLOAD_FSYNC):
+#   "none"     — leave it to the OS;
+#   "end"      — once, before the file is renamed into place (default);
+#   "periodic" — additionally every FSYNC_INTERVAL_BYTES, so a multi-GB file
+#                doesn't pile up gigabytes of dirty pages on a slow NAS.
+FSYNC_POLICIES = ("none", "end", "periodic")
+FSYNC_INTERVAL_BYTES = 256 * 1024 * 1024
+
+
+def _load_fallocate():
+    """libc fallocate(2) on Linux, else None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fn = getattr(libc, "fallocate64", None) or libc.fallocate
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+# Not os.posix_fallocate: where the filesystem can't reserve space natively
+# (NFS < 4.2, SMB, ...) glibc emulates it by writing every block — on the NAS
+# targets this is meant for, that writes the whole file twice.
+_fallocate = _load_fallocate()
+
+
+def _open_preallocated(path: str, size: int) -> tuple[int, int, bool]:
+    """
+    Open `path` for writing and reserve `size` bytes where the filesystem
+    supports it natively. Returns (fd, st_dev, whether it was preallocated).
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    dev = os.fstat(fd).st_dev
+    if not size or _fallocate is None:
+        return fd, dev, False
+    if _fallocate(fd, 0, 0, size) != 0:
+        err = ctypes.get_errno()
+        if err not in (errno.EOPNOTSUPP, errno.ENOSYS):
+            os.close(fd)
+            raise OSError(err, os.strerror(err), path)
+        logger.debug(f"fallocate unsupported for {path}, writing without preallocation.")
+        return fd, dev, False
+    return fd, dev, True
+
+
+def _pwritev_all(fd: int, buffers: list[bytes], offset: int) -> int:
+    """Write all `buffers` at `offset`, finishing any short vectored write. Returns bytes written."""
+    total = sum(len(b) for b in buffers)
+    if hasattr(os, "pwritev"):
+        written = os.pwritev(fd, buffers, offset)
+    else:
+        written = 0
+    if written < total:
+        rest = memoryview(b"".join(buffers))[written:]
+        while rest:
+            n = os.pwrite(fd, rest, offset + written)
+            written += n
+            rest = rest[n:]
+    return written
+
+
+class PreallocatedWriter:
+    """
+    Writer for downloads of known size.
+
+    Pyrogram's own path appends 1 MiB chunks to a growing temp file: on
+    ext4/NFS a multi-GB file grows in thousands of small extents (fragmented)
+    and every append is also a size/metadata update. open() reserves the
+    whole file up front with Linux fallocate(2) where the filesystem supports
+    it natively (elsewhere — EOPNOTSUPP, other OSes — it just doesn't
+    preallocate), then writes at explicit offsets in WRITE_BUFFER_BYTES
+    batches. Every file operation runs off the event loop. close() raises if
+    fewer bytes arrived than announced.
+
+    Offsets are explicit (pwritev), so parts could be assembled out of
+    order — but downloads deliberately stay single-stream: parallel part
+    downloads raced inside Pyrogram (see CHANGELOG 2025-12-18).
+
+    `on_allocated` — optional callable(st_dev, nbytes), told whenever the
+    file takes up more disk (the whole size once preallocated, else every
+    write) and, with a negative count, what it gave back on abort(). The
+    downloader passes DiskSpaceGate.claim, so space already in use isn't
+    counted again as reserved.
+    """
+
+    def __init__(self, path: str, size: int = 0, fsync: str = "end",
+                 buffer_bytes: int = WRITE_BUFFER_BYTES, on_allocated=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.size = size or 0
+        self.fsync = fsync
+        self.buffer_bytes = buffer_bytes
+        self.written = 0
+        self._pending: list[bytes] = []
+        self._pending_bytes = 0
+        self._since_sync = 0
+        self._fd: int | None = None
+        self._dev = 0
+        self._preallocated = False
+        self._allocated = 0
+        self._on_allocated = on_allocated
+
+    async def open(self):
+        """Create the file and preallocate it (in a thread — both can block on a NAS)."""
+        self._fd, self._dev, self._preallocated = await asyncio.to_thread(
+            _open_preallocated, self.path, self.size
+        )
+        if self._preallocated:
+            self._allocate(self.size)
+
+    def _allocate(self, nbytes: int):
+        self._allocated += nbytes
+        if self._on_allocated and nbytes:
+            self._on_allocated(self._dev, nbytes)
+
+    async def write(self, chunk: bytes):
+        self._pending.append(chunk)
+        self._pending_bytes += len(chunk)
+        if self._pending_bytes >= self.buffer_bytes:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        buffers, self._pending, self._pending_bytes = self._pending, [], 0
+        n = await asyncio.to_thread(_pwritev_all, self._fd, buffers, self.written)
+        if not self._preallocated:
+            self._allocate(n)
+        self.written += n
+        self._since_sync += n
+        if self.fsync == "periodic" and self._since_sync >= FSYNC_INTERVAL_BYTES:
+            self._since_sync = 0
+            await asyncio.to_thread(os.fsync, self._fd)
+
+    async def close(self):
+        """Flush, check that `size` bytes arrived, fsync per policy, close."""
+        try:
+            await self._flush()
+            if self.written < self.size:
+                raise IOError(f"{self.path}: wrote {self.written} of {self.size} bytes")
+            if self.fsync != "none":
+                await asyncio.to_thread(os.fsync, self._fd)
+        finally:
+            self._close_fd()
+
+    def abort(self):
+        """Close without flushing (the caller removes the file)."""
+        self._allocate(-self._allocated)
+        self._close_fd()
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# ── CLI: python -m core.file_writer bench [--size-mb N] [DIR ...] ───────────
+
+async def _bench_one(directory: str, size: int, chunk: bytes, fsync: str) -> tuple[float, float]:
+    chunks = size // len(chunk)
+
+    path = os.path.join(directory, "writer-bench-append.bin")
+    start = time.perf_counter()
+    with open(path, "wb") as f:
+        for _ in range(chunks):
+            f.write(chunk)
+        if fsync != "none":
+            f.flush()
+            os.fsync(f.fileno())
+    append_s = time.perf_counter() - start
+    os.remove(path)
+
+    path = os.path.join(directory, "writer-bench-prealloc.bin")
+    start = time.perf_counter()
+    writer = PreallocatedWriter(path, size, fsync=fsync)
+    await writer.open()
+    for _ in range(chunks):
+        await writer.write(chunk)
+    await writer.close()
+    prealloc_s = time.perf_counter() - start
+    os.remove(path)
+    return append_s, prealloc_s
+
+
+async def _bench(dirs: list[str], size_mb: int, fsync: str):
+    chunk = os.urandom(1024 * 1024)  # Pyrogram's chunk size
+    size = size_mb * len(chunk)
+    for directory in dirs:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not a directory, skipped")
+            continue
+        append_s, prealloc_s = await _bench_one(directory, size, chunk, fsync)
+        print(
+            f"{directory} ({size_mb} MiB, fsync={fsync}): "
+            f"append 1 MiB chunks {size_mb / append_s:8.0f} MiB/s | "
+            f"preallocated + {WRITE_BUFFER_BYTES // 1024**2} MiB pwritev {size_mb / prealloc_s:8.0f} MiB/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download writer throughput benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="Compare plain appends with PreallocatedWriter")
+    bench.add_argument("dirs", nargs="*", default=["/dev/shm", tempfile.gettempdir()],
+                       help="Directories to test in (default: /dev/shm = tmpfs, and the temp dir)")
+    bench.add_argument("--size-mb", type=int, default=1024)
+    bench.add_argument("--fsync", choices=FSYNC_POLICIES, default="end")
+    args = parser.parse_args()
+    asyncio.run(_bench(args.dirs, args.size_mb, args.fsync))
@@ -0,0 +1,285 @@
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import logging
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Anchored at the repo root rather than the working directory, and only
+# created on first use (not at import), so importing this module — e.g. from
+# a CLI run elsewhere — never leaves a stray sessions/library.db behind.
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions", "library.db")
+
+# Matches the "... - SxxExx.ext" suffix this project always generates
+# (see core.renamer.generate_filename), regardless of the title portion.
+EPISODE_FILE_RE = re.compile(r' - S(\d+)E(\d+)\.', re.IGNORECASE)
+
+# In-progress downloads — never indexed as episodes.
+_PARTIAL_SUFFIXES = (".temp", ".part")
+
+
+def _parse(name: str) -> tuple[int, int] | None:
+    if name.endswith(_PARTIAL_SUFFIXES):
+        return None
+    m = EPISODE_FILE_RE.search(name)
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+class LibraryIndex:
+    """
+    Persistent index of the episode files in the library folders:
+    title folder -> {(season, episode): path, size, mtime}, backed by SQLite.
+
+    The library is usually a NAS mount (SMB/NFS), where listing a folder is a
+    network round trip per call, and with hundreds of title folders and
+    thousands of files the old listdir/glob scans took seconds. A folder is
+    only re-listed when its own mtime changed (creating, deleting or
+    renaming a file in it updates that) — otherwise one stat() answers.
+    Downloads and deletions made by the bot update the index directly.
+
+    Methods touch the filesystem — call them via asyncio.to_thread() from
+    coroutines (not on the DB thread, which is meant for quick SQLite work,
+    not network-mount I/O). The database is opened on first use.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            self._init_db()
+        return self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._init_lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            with self._open() as conn:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS folders (
+                        path      TEXT    PRIMARY KEY,
+                        mtime_ns  INTEGER NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS files (
+                        folder    TEXT    NOT NULL,
+                        name      TEXT    NOT NULL,
+                        season    INTEGER NOT NULL,
+                        episode   INTEGER NOT NULL,
+                        size      INTEGER NOT NULL,
+                        mtime_ns  INTEGER NOT NULL,
+                        PRIMARY KEY (folder, name)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_files_episode ON files(folder, season, episode);
+                """)
+            self._ready = True
+
+    # ── Refresh ──────────────────────────────────────────────────────────────
+
+    def refresh_folder(self, folder: str, force: bool = False) -> bool:
+        """
+        Re-list `folder` if its mtime differs from the indexed one (or
+        `force`). A folder that no longer exists is dropped from the index.
+        Returns True if the folder was re-listed.
+        """
+        folder = os.path.normpath(folder)
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except FileNotFoundError:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM files WHERE folder = ?", (folder,))
+                conn.execute("DELETE FROM folders WHERE path = ?", (folder,))
+            return False
+
+        if not force:
+            with self._connect() as conn:
+                row = conn.execute("SELECT mtime_ns FROM folders WHERE path = ?", (folder,)).fetchone()
+            if row and row["mtime_ns"] == mtime_ns:
+                return False
+
+        rows = []
+        with os.scandir(folder) as it:
+            for entry in it:
+                parsed = _parse(entry.name)
+                if not parsed or not entry.is_file():
+                    continue
+                st = entry.stat()
+                rows.append((folder, entry.name, parsed[0], parsed[1], st.st_size, st.st_mtime_ns))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE folder = ?", (folder,))
+            conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute(
+                "INSERT INTO folders (path, mtime_ns) VALUES (?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+                (folder, mtime_ns)
+            )
+        return True
+
+    def refresh(self, roots: list[str], force: bool = False) -> tuple[int, int]:
+        """
+        Refresh every title folder under `roots` (one level deep, like the
+        library layout <root>/<title>/<title> - SxxExx.ext). Folders that
+        disappeared are dropped. Returns (folders seen, folders re-listed).
+        """
+        seen = relisted = 0
+        current: set[str] = set()
+        for root in roots:
+            root = os.path.normpath(root)
+            if not os.path.isdir(root):
+                continue
+            with os.scandir(root) as it:
+                for entry in it:
+                    # Dot-folders are the bot's own staging areas (e.g. .pending).
+                    if not entry.is_dir() or entry.name.startswith("."):
+                        continue
+                    folder = os.path.normpath(entry.path)
+                    current.add(folder)
+                    seen += 1
+                    relisted += self.refresh_folder(folder, force=force)
+        with self._connect() as conn:
+            known = [r["path"] for r in conn.execute("SELECT path FROM folders").fetchall()]
+            gone = [(p,) for p in known
+                    if any(os.path.dirname(p) == os.path.normpath(r) for r in roots) and p not in current]
+            conn.executemany("DELETE FROM files WHERE folder = ?", gone)
+            conn.executemany("DELETE FROM folders WHERE path = ?", gone)
+        return seen, relisted
+
+    def rebuild(self, roots: list[str]) -> tuple[int, int]:
+        """Drop the whole index and re-list every folder under `roots`."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM folders")
+        return self.refresh(roots, force=True)
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+
+    def episodes(self, folder: str) -> set[tuple[int, int]]:
+        """(season, episode) pairs present in `folder` (refreshed by mtime first)."""
+        folder = os.path.normpath(folder)
+        self.refresh_folder(folder)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT season, episode FROM files WHERE folder = ?", (folder,)).fetchall()
+        return {(r["season"], r["episode"]) for r in rows}
+
+    def files_for(self, folder: str, season: int, episode: int) -> list[str]:
+        """Paths of the files holding (season, episode) in `folder` (refreshed by mtime first)."""
+        folder = os.path.normpath(folder)
+        self.refresh_folder(folder)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name FROM files WHERE folder = ? AND season = ? AND episode = ?",
+                (folder, season, episode)
+            ).fetchall()
+        return [os.path.join(folder, r["name"]) for r in rows]
+
+    # ── Updates from our own downloads/deletions ─────────────────────────────
+
+    def add_file(self, path: str):
+        """Index a file the bot just wrote. Non-episode names are ignored."""
+        path = os.path.normpath(path)
+        parsed = _parse(os.path.basename(path))
+        if not parsed:
+            return
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(folder, name) DO UPDATE SET season = excluded.season, "
+                "episode = excluded.episode, size = excluded.size, mtime_ns = excluded.mtime_ns",
+                (os.path.dirname(path), os.path.basename(path), parsed[0], parsed[1], st.st_size, st.st_mtime_ns)
+            )
+
+    def remove_file(self, path: str):
+        """Forget a file the bot just deleted."""
+        path = os.path.normpath(path)
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM files WHERE folder = ? AND name = ?",
+                (os.path.dirname(path), os.path.basename(path))
+            )
+
+
+# Global instance
+library_index = LibraryIndex()
+
+
+# ── CLI: python -m core.library_index rebuild | bench ───────────────────────
+
+def _bench(files: int, per_folder: int):
+    """
+    Build a synthetic library of `files` empty episode files in a temp dir and
+    time: the old listdir+regex scan of every folder, a full index rebuild,
+    an unchanged incremental refresh, and per-title lookups from the index.
+    """
+    tmp = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        root = os.path.join(tmp, "library")
+        folders = max(1, files // per_folder)
+        for f in range(folders):
+            folder = os.path.join(root, f"Title {f:05d}")
+            os.makedirs(folder)
+            for e in range(per_folder):
+                open(os.path.join(folder, f"Title {f:05d} - S01E{e + 1:02d}.mkv"), "wb").close()
+        index = LibraryIndex(os.path.join(tmp, "library.db"))
+        titles = [os.path.join(root, name) for name in os.listdir(root)]
+
+        start = time.perf_counter()
+        for folder in titles:
+            {_parse(name) for name in os.listdir(folder)}
+        listdir_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.rebuild([root])
+        rebuild_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.refresh([root])
+        refresh_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for folder in titles:
+            index.episodes(folder)
+        lookup_s = time.perf_counter() - start
+
+        print(f"{folders * per_folder} files in {folders} folders")
+        print(f"  listdir+regex scan of all folders: {listdir_s * 1000:9.1f} ms")
+        print(f"  index rebuild:                     {rebuild_s * 1000:9.1f} ms")
+        print(f"  incremental refresh (no changes):  {refresh_s * 1000:9.1f} ms")
+        print(f"  per-title lookups (all folders):   {lookup_s * 1000:9.1f} ms "
+              f"({lookup_s / folders * 1e6:.0f} µs/title)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Library index maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Re-list every title folder under DOWNLOAD_PATH and DORAMA_PATH")
+    bench = sub.add_parser("bench", help="Benchmark against a synthetic library tree")
+    bench.add_argument("--files", type=int, default=50_000)
+    bench.add_argument("--per-folder", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        from config.config import settings
+        seen, relisted = library_index.rebuild([settings.DOWNLOAD_PATH, settings.DORAMA_PATH])
+        print(f"Indexed {relisted} of {seen} title folders.")
+    else:
+        _bench(args.files, args.per_folder)
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+from core.disk_space import disk_gate
+
+logger = logging.getLogger(__name__)
+
+# How many files are copied into the library at once. The NAS is the
+# bottleneck — parallel copies just interleave their writes on it.
+MOVER_CONCURRENCY = 1
+
+# Copy buffer: few large sequential writes instead of Pyrogram's 1 MiB chunks
+# (and the SMB/NFS round trip each of those costs).
+COPY_BUFFER_BYTES = 16 * 1024 * 1024
+
+# The copy is verified with a full hash before the source is removed: the
+# source is hashed as it's read for copying, the destination is read back
+# (cache dropped first where the OS allows, so the bytes come from the NAS)
+# and hashed again. blake2b is faster than the disk on anything we run on.
+_HASH = hashlib.blake2b
+
+
+def _same_filesystem(src: str, dest_dir: str) -> bool:
+    try:
+        return os.stat(src).st_dev == os.stat(dest_dir).st_dev
+    except FileNotFoundError:
+        return False
+
+
+def _hash_back(path: str) -> str:
+    """Full hash of `path` as stored — its cached pages are dropped first where possible."""
+    h = _HASH()
+    buf = bytearray(COPY_BUFFER_BYTES)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        while n := f.readinto(buf):
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def _copy_verified(src: str, dest: str):
+    """
+    Copy `src` to `dest` through a ".moving" temp file with large sequential
+    writes (hashing `src` as it's read), fsync it, read the copy back and
+    compare the full hashes, then rename it into place and remove `src`.
+    Raises (leaving `src` untouched) on mismatch.
+    """
+    temp = f"{dest}.moving"
+    size = os.path.getsize(src)
+    buf = bytearray(COPY_BUFFER_BYTES)
+    view = memoryview(buf)
+    src_hash = _HASH()
+    try:
+        with open(src, "rb", buffering=0) as fin, open(temp, "wb", buffering=0) as fout:
+            while True:
+                n = fin.readinto(buf)
+                if not n:
+                    break
+                src_hash.update(view[:n])
+                written = 0
+                while written < n:
+                    written += fout.write(view[written:n])
+            os.fsync(fout.fileno())
+        if os.path.getsize(temp) != size or _hash_back(temp) != src_hash.hexdigest():
+            raise IOError(f"verification failed for {dest}")
+        os.replace(temp, dest)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    os.remove(src)
+
+
+def _prepare(src: str, dest: str) -> tuple[int, bool]:
+    """Create `dest`'s folder; returns (size of `src`, whether a rename will do)."""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    return os.path.getsize(src), _same_filesystem(src, os.path.dirname(dest))
+
+
+class Mover:
+    """
+    Moves finished downloads from the local scratch directory
+    (settings.SCRATCH_PATH) into the library.
+
+    Downloading straight onto a network mount turns Telegram's stream of
+    1 MiB chunks into many small writes over SMB/NFS — several times slower
+    than local disk, and a slow NAS throttles the Telegram transfer itself.
+    With a scratch dir, downloads land on local disk at full speed and this
+    copies them over with large sequential buffers, MOVER_CONCURRENCY at a
+    time, verifying the copy before the scratch file is removed.
+
+    stream_to_file() runs the move as a background task, so the download
+    slot is free as soon as the scratch write is done. `await mover.move()`
+    returns only once the file is in place; callers update the library
+    index / DB strictly after that.
+    """
+
+    def __init__(self, concurrency: int = MOVER_CONCURRENCY):
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def move(self, src: str, dest: str) -> str:
+        size, same_fs = await asyncio.to_thread(_prepare, src, dest)
+        if same_fs:
+            await asyncio.to_thread(os.replace, src, dest)
+            return dest
+        # The copy needs room on the library volume — held (not failed)
+        # until it fits, like a download.
+        async with disk_gate.reserve(os.path.dirname(dest), size):
+            async with self._slots:
+                logger.info(f"Moving {src} -> {dest} ({size / 1024**2:.0f} MB)")
+                await asyncio.to_thread(_copy_verified, src, dest)
+        return dest
+
+
+# Global instance
+mover = Mover()
@@ -2,20 +2,56 @@ import asyncio
 import logging
 from pyrogram import Client
 from pyrogram.types import Message
+from config.config import settings
+from core.disk_space import disk_gate
 from core.downloader import download_video
 
 logger = logging.getLogger(__name__)
 
+class OrderedTurns:
+    """
+    Lets concurrent producers put items into the queue in message order even
+    though they finish their own preparation (AI extraction, prompts) in any
+    order: each registers its message id on arrival, and wait_turn() returns
+    only once every smaller registered id has been released.
+    """
+
+    def __init__(self):
+        self._pending: set[int] = set()
+        self._cond = asyncio.Condition()
+
+    def register(self, key: int):
+        """Call synchronously on arrival, before the first await."""
+        self._pending.add(key)
+
+    async def wait_turn(self, key: int):
+        async with self._cond:
+            await self._cond.wait_for(lambda: min(self._pending, default=key) >= key)
+
+    async def release(self, key: int):
+        """Always call once per registered key (in a finally) — queued or not."""
+        async with self._cond:
+            self._pending.discard(key)
+            self._cond.notify_all()
+
+
 class QueueManager:
     def __init__(self):
         self.queue = asyncio.Queue()
+        # Downloads whose transfer is over but whose file is still being moved
+        # out of the scratch dir (see _after_download) — strong references,
+        # so the tasks aren't garbage-collected mid-move.
+        self._finishing: set[asyncio.Task] = set()
 
-    async def add_task(self, client: Client, message: Message, metadata: dict, status_msg: Message = None, reply_markup=None):
+    async def add_task(self, client: Client, message: Message, metadata: dict, status_msg: Message = None,
+                       reply_markup=None, on_done=None):
         """
         Adds a download task to the queue.
+        `on_done` — optional async callable(ok: bool), awaited once the
+        file is in place (used by burst jobs to keep one summary message).
         """
         q_size = self.queue.qsize()
-        await self.queue.put((client, message, metadata, status_msg, reply_markup))
+        await self.queue.put((client, message, metadata, status_msg, reply_markup, on_done))
         
         logger.info(f"Task added to queue. Current queue size: {q_size + 1}")
         
@@ -26,10 +62,41 @@ class QueueManager:
             # So if qsize > 0, there is definitely a wait.
             # If qsize == 0, it might be picked up immediately OR wait if worker is busy.
             # Let's just say "Queued" if we can't be sure, but "Position" implies waiting.
+            media = message.video or message.document
+            space_note = ""
+            if media and not await disk_gate.has_room(settings.DOWNLOAD_PATH, media.file_size or 0):
+                space_note = "\n⚠️ Зараз замало місця на диску — завантаження почнеться, щойно воно звільниться."
             if q_size > 0:
-                await status_msg.edit_text(f"⏳ Додано в чергу... Перед вами відео: {q_size}")
+                await status_msg.edit_text(f"⏳ Додано в чергу... Перед вами відео: {q_size}{space_note}")
             else:
-                await status_msg.edit_text("⏳ Додається в обробку...")
+                await status_msg.edit_text(f"⏳ Додається в обробку...{space_note}")
+
+    async def _after_download(self, finishing: asyncio.Task | None, client: Client, message: Message,
+                              reply_markup, on_done):
+        """Wait until a download's file is in place, then run its on_done / the queue-done notice."""
+        downloaded = None
+        if finishing:
+            try:
+                downloaded = await finishing
+            except Exception as e:
+                logger.error(f"Finishing download failed: {e}")
+
+        if on_done:
+            try:
+                await on_done(downloaded is not None)
+            except Exception as notify_err:
+                logger.warning(f"on_done callback failed: {notify_err}")
+
+        # After download: if queue is now empty and we have a keyboard → notify once
+        if self.queue.empty() and reply_markup is not None:
+            try:
+                await client.send_message(
+                    message.chat.id,
+                    "✅ Всі завантаження завершено!",
+                    reply_markup=reply_markup
+                )
+            except Exception as notify_err:
+                logger.warning(f"Failed to send queue-done notification: {notify_err}")
 
     async def worker(self):
         """
@@ -39,25 +106,38 @@ class QueueManager:
         while True:
             try:
                 # Wait for a task
-                client, message, metadata, status_msg, reply_markup = await self.queue.get()
+                client, message, metadata, status_msg, reply_markup, on_done = await self.queue.get()
 
+                finishing = None
+                provisional = metadata.get("provisional")
                 try:
-                    if status_msg:
-                        await status_msg.edit_text("🔄 Починаю завантаження...")
+                    if provisional and provisional.cancelled:
+                        # Cancelled from its title prompt while queued — already reported.
+                        logger.info("Skipping a provisional download cancelled while queued.")
+                        continue
 
-                    # Execute the download
-                    await download_video(client, message, metadata, status_msg)
+                    async def on_hold():
+                        if status_msg:
+                            await status_msg.edit_text("⏸ Очікую вільне місце на диску...")
 
-                    # After download: if queue is now empty and we have a keyboard → notify once
-                    if self.queue.empty() and reply_markup is not None:
-                        try:
-                            await client.send_message(
-                                message.chat.id,
-                                "✅ Всі завантаження завершено!",
-                                reply_markup=reply_markup
-                            )
-                        except Exception as notify_err:
-                            logger.warning(f"Failed to send queue-done notification: {notify_err}")
+                    media = message.video or message.document
+                    # Held (not failed) until the file fits — see core/disk_space.py.
+                    async with disk_gate.reserve(settings.DOWNLOAD_PATH, media.file_size if media else 0,
+                                                 on_hold=on_hold, chat_id=message.chat.id):
+                        if status_msg:
+                            await status_msg.edit_text("🔄 Починаю завантаження...")
+
+                        # Execute the download
+                        finishing = await download_video(client, message, metadata, status_msg)
+
+                    # download_video() returns once the transfer is over; a move
+                    # out of the scratch dir finishes in the background, so the
+                    # next download starts right away.
+                    task = asyncio.create_task(
+                        self._after_download(finishing, client, message, reply_markup, on_done)
+                    )
+                    self._finishing.add(task)
+                    task.add_done_callback(self._finishing.discard)
 
                 except Exception as e:
                     logger.error(f"Worker processing error: {e}")
@@ -66,7 +146,17 @@ class QueueManager:
                             await status_msg.edit_text(f"❌ Помилка під час обробки в черзі: {e}")
                         except:
                             pass
+                    if on_done:
+                        try:
+                            await on_done(False)
+                        except Exception:
+                            pass
                 finally:
+                    # Failed or cancelled before download_video() took it over
+                    # (e.g. while held for disk space) — don't leave the title
+                    # prompt's finalize() waiting.
+                    if provisional and finishing is None:
+                        provisional.abandon()
                     # Mark task as done
                     self.queue.task_done()
                     
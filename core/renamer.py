@@ -1,14 +1,10 @@
 import os
-import re
 import logging
 from config.config import settings
+from core.library_index import library_index
 
 logger = logging.getLogger(__name__)
 
-# Matches the "... - SxxExx.ext" suffix this project always generates
-# (see generate_filename below), regardless of the title portion.
-_EPISODE_FILE_RE = re.compile(r' - S(\d+)E(\d+)\.', re.IGNORECASE)
-
 
 def sanitize_title(title: str, max_len: int = 120) -> str:
     """
@@ -30,15 +26,11 @@ def scan_existing_episodes(folder_path: str) -> set[tuple[int, int]]:
     were already fetched manually (e.g. via Normal/Batch mode) before tracking
     started — the folder is title-specific, so any SxxExx match inside it
     belongs to this title regardless of the exact title text in the filename.
+
+    Served from the library index (core/library_index.py) — the folder is
+    only re-listed if its mtime changed since it was last indexed.
     """
-    found: set[tuple[int, int]] = set()
-    if not os.path.isdir(folder_path):
-        return found
-    for entry in os.listdir(folder_path):
-        m = _EPISODE_FILE_RE.search(entry)
-        if m:
-            found.add((int(m.group(1)), int(m.group(2))))
-    return found
+    return library_index.episodes(folder_path)
 
 
 def generate_filename(canonical_name: str, season: int, episode: int, original_ext: str = ".mp4") -> str:
@@ -0,0 +1,57 @@
+import logging
+from pathlib import Path
+
+from pyrogram.storage import FileStorage, MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DIR = Path("sessions")
+
+
+class SeededFileStorage(FileStorage):
+    """
+    File-backed Pyrogram session (sessions/<name>.session) seeded from a
+    session string.
+
+    Passing `session_string=` to a Client always makes Pyrogram use an
+    in-memory session, so its peer cache (channel ids, access hashes,
+    usernames) is thrown away on every restart and every chat has to be
+    re-resolved — right when the checker runs all titles at once. This keeps
+    the session string as the source of truth for the auth key, but stores
+    it (and the peer cache that accumulates next to it) in the sessions
+    volume, so known chats resolve from disk after a restart.
+
+    If the session string changes (different account / re-login), the file
+    is re-seeded and its peer cache dropped — access hashes are per-account.
+    """
+
+    def __init__(self, name: str, session_string: str, workdir: Path = SESSIONS_DIR):
+        super().__init__(name, workdir)
+        self.session_string = session_string
+
+    async def open(self):
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        await super().open()
+
+        seed = MemoryStorage(self.name, self.session_string)
+        await seed.open()
+        try:
+            auth_key = await seed.auth_key()
+            current = await self.auth_key()
+            if current == auth_key:
+                return
+            if current is not None:
+                logger.info(f"Session string for '{self.name}' changed — re-seeding and dropping cached peers.")
+                with self.conn:
+                    self.conn.execute("DELETE FROM peers")
+            else:
+                logger.info(f"Seeding persistent session '{self.database}' from session string.")
+            await self.dc_id(await seed.dc_id())
+            await self.api_id(await seed.api_id())
+            await self.test_mode(await seed.test_mode())
+            await self.auth_key(auth_key)
+            await self.user_id(await seed.user_id())
+            await self.is_bot(await seed.is_bot())
+            await self.save()
+        finally:
+            await seed.close()
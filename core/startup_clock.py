@@ -0,0 +1,5 @@
+import time
+
+# Process start, for the startup timing report in main.py. Its own module, so
+# main.py can import it before everything else without code between imports.
+PROCESS_START = time.perf_counter()
@@ -1,7 +1,9 @@
+from core.startup_clock import PROCESS_START  # first, so the report covers every import
 import asyncio
 import logging
 import os
 import re
+import time
 from enum import Enum
 from logging.handlers import RotatingFileHandler
 from pyrogram import Client, idle, filters
@@ -10,13 +12,21 @@ from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton,
 from pyrogram.errors import FloodWait
 from config.config import settings
 from analyzer.mapper import mapper
-from analyzer.ai_cleaner import extract_metadata, extract_episode, extract_watch_link
-from core.queue_manager import queue_manager
+from analyzer.ai_cleaner import extract_metadata, extract_metadata_batch, extract_episode, extract_watch_link, warm_up as warm_up_ai
+from core.queue_manager import queue_manager, OrderedTurns
+from core.db_executor import db_executor
+from core.burst import BurstCollector
+from core.conversation import conversations
+from core.downloader import ProvisionalDownload, discard_stale_pending, display_path
+from core.disk_space import disk_gate
+from core.session_storage import SeededFileStorage
 from core.renamer import sanitize_title, scan_existing_episodes
 from urllib.parse import quote
 from anime_tracker import db as anime_db, checker as anime_checker, fixer as anime_fixer
+from anime_tracker import realtime as anime_realtime, verifier as anime_verifier
 from anime_tracker.sites import get_handler as get_site_handler, supported_domains
 from anime_tracker.userbot import build_userbot_client
+from anime_tracker.api_scheduler import api_scheduler
 
 # Setup logging
 log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -43,28 +53,32 @@ os.makedirs("sessions", exist_ok=True)
 
 # --- Global State ---
 
-# chat_id -> asyncio.Future: waiting for text reply from user
-waiting_for_user_input: dict[int, asyncio.Future] = {}
-
 class BotMode(Enum):
     NORMAL = "normal"
     BATCH  = "batch"
 
 chat_modes:   dict[int, BotMode]       = {}
 batch_states: dict[int, dict]          = {}  # {title, season, timer_task}
-batch_locks:  dict[int, asyncio.Lock]  = {}
+batch_locks:  dict[int, asyncio.Lock]  = {}  # held only while a session's title/season is set up
+batch_orders: dict[int, OrderedTurns]  = {}  # queue videos in message order
+
+# Episode extractions (DeepSeek calls) running at once across Batch sessions;
+# the pace is additionally capped by ai_cleaner.rate_limiter.
+BATCH_EXTRACT_CONCURRENCY = 4
+batch_extract_slots = asyncio.Semaphore(BATCH_EXTRACT_CONCURRENCY)
 
 
 # --- Initialize Client ---
 WORKERS = 120
 
 if settings.SESSION_STRING:
+    # File-backed session seeded from SESSION_STRING (see core/session_storage.py)
+    # so the peer cache survives restarts.
     app = Client(
         "tg_downloader",
         api_id=settings.API_ID,
         api_hash=settings.API_HASH,
-        session_string=settings.SESSION_STRING,
-        in_memory=True,
+        storage=SeededFileStorage("tg_downloader_string", settings.SESSION_STRING),
         workers=WORKERS,
     )
 elif settings.BOT_TOKEN:
@@ -126,6 +140,7 @@ async def end_batch_session(chat_id: int, notify_text: str = None):
     if task and not task.done():
         task.cancel()
     batch_locks.pop(chat_id, None)
+    batch_orders.pop(chat_id, None)
     chat_modes.pop(chat_id, None)
     if notify_text:
         try:
@@ -287,7 +302,7 @@ async def mode_callback(client: Client, query: CallbackQuery):
 
     elif query.data == "mode_anime_list":
         await query.answer()
-        text, kb = _tracking_list_content("anime")
+        text, kb = await _tracking_list_content("anime")
         try:
             await query.message.reply_text(text, reply_markup=kb)
         except Exception:
@@ -297,11 +312,8 @@ async def mode_callback(client: Client, query: CallbackQuery):
 # 3. Text input router (passes replies to ask_user futures)
 @app.on_message(auth_filter & filters.text & ~filters.command(["start", "help", "id", "mode", "anime"]))
 async def text_handler(client: Client, message: Message):
-    chat_id = message.chat.id
-    if chat_id in waiting_for_user_input:
-        future = waiting_for_user_input[chat_id]
-        if not future.done():
-            future.set_result(message.text)
+    # An answer to an open ask_user()/ask_user_fresh() prompt (see core/conversation.py)
+    if conversations.route(message):
         return
 
     url = await _find_watch_link(message)
@@ -314,143 +326,148 @@ async def text_handler(client: Client, message: Message):
 
 async def ask_user(chat_id: int, prompt: str, status_msg: Message, timeout: int = 300) -> str | None:
     """Asks a question by EDITING an existing status message."""
-    loop = asyncio.get_running_loop()
-    future = loop.create_future()
-    waiting_for_user_input[chat_id] = future
     try:
-        await status_msg.edit_text(prompt)
-        reply = await asyncio.wait_for(future, timeout=timeout)
-        if reply.lower() == "cancel":
-            return None
-        return reply
-    finally:
-        waiting_for_user_input.pop(chat_id, None)
+        reply = await conversations.ask(chat_id, prompt, status_msg.edit_text, timeout)
+    except asyncio.TimeoutError:
+        return None
+    if reply.lower() == "cancel":
+        return None
+    return reply
 
 
 async def ask_user_fresh(chat_id: int, prompt: str, timeout: int = 300) -> str | None:
     """Asks a question by SENDING A NEW message (always appears at bottom of chat)."""
-    loop = asyncio.get_running_loop()
-    future = loop.create_future()
-    waiting_for_user_input[chat_id] = future
+    async def send(text: str):
+        return await app.send_message(chat_id, text)
+
     try:
-        await app.send_message(chat_id, prompt)
-        reply = await asyncio.wait_for(future, timeout=timeout)
-        if reply.lower() == "cancel":
-            return None
-        return reply
+        reply = await conversations.ask(chat_id, prompt, send, timeout)
     except asyncio.TimeoutError:
         try:
             await app.send_message(chat_id, "❌ Timeout. No reply received.")
         except Exception:
             pass
         return None
-    finally:
-        waiting_for_user_input.pop(chat_id, None)
+    if reply.lower() == "cancel":
+        return None
+    return reply
 
 
 # --- Batch Mode Handler ---
 
-async def handle_batch_video(client: Client, message: Message, status_msg: Message):
+def _register_batch_turn(message: Message) -> OrderedTurns:
+    """Claim the message's place in its chat's Batch order — synchronously, before any await."""
+    order = batch_orders.setdefault(message.chat.id, OrderedTurns())
+    order.register(message.id)
+    return order
+
+
+async def handle_batch_video(client: Client, message: Message, status_msg: Message | None,
+                             order: OrderedTurns):
+    """
+    Batch mode, one video. Only the SETUP phase (asking title + season for
+    the session's first video) holds the per-chat lock; once those are known,
+    each video extracts its episode on its own — up to
+    BATCH_EXTRACT_CONCURRENCY DeepSeek calls at a time, paced by the shared
+    rate limiter — instead of 25 forwarded videos waiting for 25 sequential
+    round trips. Downloads still enter the queue in original message order
+    (batch_orders) — the caller registers the turn (_register_batch_turn)
+    on arrival; it is released here.
+    """
     chat_id = message.chat.id
     media   = message.video or message.document
     filename_hint = (media.file_name if media else "") or "video.mp4"
 
-    if chat_id not in batch_locks:
-        batch_locks[chat_id] = asyncio.Lock()
-
-    # If lock is already held → show "in queue" immediately so the user knows bot is alive
-    if batch_locks[chat_id].locked():
-        try:
-            await status_msg.edit_text(f"⏳ In queue: `{filename_hint[:60]}`")
-        except Exception:
-            pass
-
-    async with batch_locks[chat_id]:
-        # Mode may have changed while waiting for the lock
-        if chat_modes.get(chat_id) != BotMode.BATCH:
-            return
-
-        # Reset the 30-min inactivity timer on every video
-        reset_batch_timer(chat_id)
-
-        state = batch_states.get(chat_id, {})
-
-        # ── SETUP PHASE: get title & season (first video only) ──────────────
-        # All questions are sent as NEW messages so they always appear at the
-        # bottom of the chat and never get buried under incoming video messages.
-        if not state.get("title"):
+    async def show(text: str):
+        # No status message for videos re-routed from a burst (_process_burst).
+        if status_msg:
             try:
-                await status_msg.edit_text(f"⚙️ `{filename_hint[:60]}` — analyzing title...")
+                await status_msg.edit_text(text)
             except Exception:
                 pass
 
-            text_to_analyze = message.caption or filename_hint
-            ai_data   = await extract_metadata(text_to_analyze)
-            raw_title = ai_data.get("title") if ai_data else None
+    if chat_id not in batch_locks:
+        batch_locks[chat_id] = asyncio.Lock()
+    try:
+        # If setup is in progress → show "in queue" immediately so the user knows bot is alive
+        if batch_locks[chat_id].locked():
+            await show(f"⏳ In queue: `{filename_hint[:60]}`")
 
-            if raw_title:
-                title_prompt = (
-                    f"🔎 AI detected: `{raw_title}`\n\n"
-                    f"Reply with the **Official Romaji Title** to confirm/correct\n"
-                    f"_(or reply `cancel` to abort)_"
-                )
-            else:
-                title_prompt = (
-                    "⚠️ AI couldn't detect the title.\n\n"
-                    "Reply with the **Official Romaji Title**\n"
-                    "_(or reply `cancel` to abort)_"
+        async with batch_locks[chat_id]:
+            # Mode may have changed while waiting for the lock
+            if chat_modes.get(chat_id) != BotMode.BATCH:
+                return
+
+            # Reset the 30-min inactivity timer on every video
+            reset_batch_timer(chat_id)
+
+            state = batch_states.get(chat_id, {})
+
+            # ── SETUP PHASE: get title & season (first video only) ──────────────
+            # All questions are sent as NEW messages so they always appear at the
+            # bottom of the chat and never get buried under incoming video messages.
+            if not state.get("title"):
+                await show(f"⚙️ `{filename_hint[:60]}` — analyzing title...")
+
+                text_to_analyze = message.caption or filename_hint
+                ai_data   = await extract_metadata(text_to_analyze)
+                raw_title = ai_data.get("title") if ai_data else None
+
+                if raw_title:
+                    title_prompt = (
+                        f"🔎 AI detected: `{raw_title}`\n\n"
+                        f"Reply with the **Official Romaji Title** to confirm/correct\n"
+                        f"_(or reply `cancel` to abort)_"
+                    )
+                else:
+                    title_prompt = (
+                        "⚠️ AI couldn't detect the title.\n\n"
+                        "Reply with the **Official Romaji Title**\n"
+                        "_(or reply `cancel` to abort)_"
+                    )
+
+                # Fresh message → always at the bottom even if new videos arrived
+                title = await ask_user_fresh(chat_id, title_prompt)
+                if not title:
+                    await show(f"❌ Cancelled: `{filename_hint[:60]}`")
+                    return
+
+                season_str = await ask_user_fresh(
+                    chat_id,
+                    f"📀 Title: **{title}**\n\nReply with the **Season number**\n_(or `cancel`)_"
                 )
+                if not season_str or not season_str.isdigit():
+                    await show(f"❌ Invalid season. Cancelled: `{filename_hint[:60]}`")
+                    return
 
-            # Fresh message → always at the bottom even if new videos arrived
-            title = await ask_user_fresh(chat_id, title_prompt)
-            if not title:
-                try:
-                    await status_msg.edit_text(f"❌ Cancelled: `{filename_hint[:60]}`")
-                except Exception:
-                    pass
-                return
+                state["title"]  = title.strip()
+                state["season"] = int(season_str)
+                batch_states[chat_id] = state
 
-            season_str = await ask_user_fresh(
-                chat_id,
-                f"📀 Title: **{title}**\n\nReply with the **Season number**\n_(or `cancel`)_"
-            )
-            if not season_str or not season_str.isdigit():
+                # Session summary — one permanent message, visible above all future videos
                 try:
-                    await status_msg.edit_text(f"❌ Invalid season. Cancelled: `{filename_hint[:60]}`")
+                    await app.send_message(
+                        chat_id,
+                        f"✅ **Batch session ready**\n"
+                        f"📺 {state['title']} — Season {state['season']}\n\n"
+                        f"_Processing queued videos..._"
+                    )
                 except Exception:
                     pass
-                return
 
-            state["title"]  = title.strip()
-            state["season"] = int(season_str)
-            batch_states[chat_id] = state
-
-            # Session summary — one permanent message, visible above all future videos
-            try:
-                await app.send_message(
-                    chat_id,
-                    f"✅ **Batch session ready**\n"
-                    f"📺 {state['title']} — Season {state['season']}\n\n"
-                    f"_Processing queued videos..._"
-                )
-            except Exception:
-                pass
-
-        title  = state["title"]
-        season = state["season"]
+            title  = state["title"]
+            season = state["season"]
 
         # Show per-video status while extracting episode
-        try:
-            await status_msg.edit_text(
-                f"🔍 `{filename_hint[:60]}`\n"
-                f"**{title}** S{season:02d} — detecting episode..."
-            )
-        except Exception:
-            pass
+        await show(
+            f"🔍 `{filename_hint[:60]}`\n"
+            f"**{title}** S{season:02d} — detecting episode..."
+        )
 
-        # ── EPISODE EXTRACTION ───────────────────────────────────────────────
-        text    = message.caption or filename_hint
-        episode = await extract_episode(text, title, season)
+        # ── EPISODE EXTRACTION (concurrent, bounded) ─────────────────────────
+        text = message.caption or filename_hint
+        async with batch_extract_slots:
+            episode = await extract_episode(text, title, season)
 
         if not episode:
             # Ask as a fresh message so it's always visible at the bottom
@@ -460,10 +477,7 @@ async def handle_batch_video(client: Client, message: Message, status_msg: Messa
                 f"Reply with the **Episode number** _(or `cancel` to skip)_"
             )
             if not episode_str or not episode_str.isdigit():
-                try:
-                    await status_msg.edit_text(f"⏭ Skipped: `{filename_hint[:60]}`")
-                except Exception:
-                    pass
+                await show(f"⏭ Skipped: `{filename_hint[:60]}`")
                 return
             episode = int(episode_str)
 
@@ -473,11 +487,15 @@ async def handle_batch_video(client: Client, message: Message, status_msg: Messa
             "season":  season,
             "episode": episode,
         }
+        # Earlier videos of the chat first, even if this one resolved sooner.
+        await order.wait_turn(message.id)
         await queue_manager.add_task(
             client, message, metadata,
             status_msg=status_msg,
             reply_markup=mode_keyboard(BotMode.BATCH)
         )
+    finally:
+        await order.release(message.id)
 
 
 # Channel posts announcing a new episode are often a poster PHOTO with a
@@ -502,6 +520,17 @@ async def video_handler(client: Client, message: Message):
 
     logger.info(f"New video from: {message.chat.title or message.chat.first_name}")
 
+    # Branch: Batch mode
+    if chat_modes.get(message.chat.id) == BotMode.BATCH:
+        await _handle_batch_message(client, message)
+        return
+
+    # Normal mode: held briefly so a multi-video forward is processed as ONE
+    # job (see core/burst.py and _process_burst below).
+    burst_collector.add(message.chat.id, message)
+
+
+async def _handle_batch_message(client: Client, message: Message):
     # Opportunistic: some channel posts forwarded together with a video
     # include a link to the full topic/archive in their caption (e.g.
     # "Онлайн в телеграмі: t.me/...") — if found, kick off anime tracking for
@@ -509,25 +538,217 @@ async def video_handler(client: Client, message: Message):
     # single-video download below (already-downloaded episodes are skipped
     # via the existing-files scan, so this doesn't duplicate this video).
     asyncio.create_task(_maybe_track_from_caption(client, message))
-
+    # Before the first await — otherwise a later video whose reply lands
+    # sooner could take its queue turn ahead of this one.
+    order = _register_batch_turn(message)
+    media = message.video or message.document
     status_msg = None
     try:
         status_msg = await message.reply_text(
             f"⏳ Processing: `{(media.file_name or 'video.mp4')[:60]}`"
         )
+    except asyncio.CancelledError:
+        await order.release(message.id)
+        raise
     except Exception as e:
         logger.warning(f"Could not reply: {e}")
+    await handle_batch_video(client, message, status_msg, order)
 
-    # Branch: Batch mode
-    if chat_modes.get(message.chat.id) == BotMode.BATCH:
-        await handle_batch_video(client, message, status_msg)
+
+def _analysis_text(message: Message) -> str:
+    """Caption if it says anything, else the file name — what the AI extracts metadata from."""
+    media = message.video or message.document
+    text = message.caption or ""
+    if len(text) < 5:
+        text = (media.file_name if media else None) or "video.mp4"
+    return text
+
+
+def _episode_ranges(episodes: list[int]) -> str:
+    """[1, 2, 3, 5, 7, 8] -> "E01–E03, E05, E07–E08"."""
+    parts = []
+    for ep in sorted(set(episodes)):
+        if parts and ep == parts[-1][1] + 1:
+            parts[-1][1] = ep
+        else:
+            parts.append([ep, ep])
+    return ", ".join(f"E{a:02d}" if a == b else f"E{a:02d}–E{b:02d}" for a, b in parts)
+
+
+async def _process_burst(chat_id: int, messages: list[Message]):
+    """Flush callback of burst_collector: one forwarded video, or a whole burst of them."""
+    # The caption-link check, once per distinct caption — a 40-video forward
+    # usually repeats the same channel footer 40 times.
+    seen_captions = set()
+    for m in messages:
+        if (m.caption or "") not in seen_captions:
+            seen_captions.add(m.caption or "")
+            asyncio.create_task(_maybe_track_from_caption(app, m))
+
+    # Switched to Batch while the burst was being collected.
+    if chat_modes.get(chat_id) == BotMode.BATCH:
+        for m in messages:
+            asyncio.create_task(handle_batch_video(app, m, None, _register_batch_turn(m)))
         return
 
+    if len(messages) == 1:
+        await _process_single_video(app, messages[0])
+    else:
+        await _process_video_burst(app, chat_id, messages)
+
+
+burst_collector = BurstCollector(_process_burst)
+
+
+async def _process_video_burst(client: Client, chat_id: int, messages: list[Message]):
+    """
+    Normal mode for several videos forwarded at once: ONE status message,
+    ONE DeepSeek call for all captions (extract_metadata_batch), ONE mapper
+    lookup — and at most one title question — per distinct title, then every
+    episode is queued in episode order with the status message as a running
+    summary. Videos whose title or episode can't be determined then go
+    through the single-video path one at a time — asked about like a
+    single forward, after the rest is queued.
+    """
+    status_msg = None
+    try:
+        status_msg = await messages[0].reply_text(
+            f"📦 Received {len(messages)} videos — detecting title and episodes..."
+        )
+    except Exception as e:
+        logger.warning(f"Could not reply: {e}")
+
+    metas = await extract_metadata_batch([_analysis_text(m) for m in messages])
+    groups: dict[str, list[tuple[Message, dict]]] = {}
+    unrecognized: list[Message] = []
+    for m, meta in zip(messages, metas):
+        if meta and meta.get("title"):
+            groups.setdefault(meta["title"], []).append((m, meta))
+        else:
+            unrecognized.append(m)
+    logger.info(f"Burst of {len(messages)}: titles {list(groups)}, {len(unrecognized)} unrecognized.")
+
+    if not groups and status_msg:
+        try:
+            await status_msg.edit_text(
+                f"❓ Couldn't recognize any of the {len(messages)} videos — asking about them one by one."
+            )
+        except Exception:
+            pass
+
+    for i, (raw_title, items) in enumerate(groups.items()):
+        group_status = status_msg
+        if i > 0:
+            try:
+                group_status = await items[0][0].reply_text(f"📦 `{raw_title}` — {len(items)} videos...")
+            except Exception:
+                group_status = None
+        unrecognized += await _enqueue_burst_group(client, chat_id, raw_title, items, group_status)
+
+    # One at a time, in arrival order — each may ask the user (title /
+    # episode / season), exactly like a single forwarded video.
+    for m in sorted(unrecognized, key=lambda m: m.id):
+        try:
+            await _process_single_video(client, m)
+        except Exception as e:
+            logger.error(f"Burst video {m.id} failed: {e}", exc_info=True)
+
+
+async def _enqueue_burst_group(client: Client, chat_id: int, raw_title: str,
+                               items: list[tuple[Message, dict]], status_msg: Message | None) -> list[Message]:
+    """
+    Confirm one title of a burst and queue its episodes. Returns the videos
+    whose episode wasn't detected — the caller asks about those one by one.
+    """
+    final_title = await mapper.aio.get_mapping(raw_title)
+    if not final_title:
+        search_query = quote(raw_title)
+        anitube_url = f"https://anitube.in.ua/index.php?do=search&subaction=search&story={search_query}"
+        google_url  = f"https://www.google.com/search?q={search_query}+anime"
+        user_reply = await ask_user_fresh(
+            chat_id,
+            f"⚠️ Unknown Title: `{raw_title}` ({len(items)} videos)\n"
+            f"🔎 [Anitube]({anitube_url}) | [Google]({google_url})\n\n"
+            f"Reply with the **Official Romaji Title** to save it _(or `cancel`)_:"
+        )
+        if not user_reply:
+            if status_msg:
+                try: await status_msg.edit_text(f"❌ Cancelled by user: `{raw_title}` ({len(items)} videos).")
+                except Exception: pass
+            return []
+        await mapper.aio.add_mapping(raw_title, user_reply)
+        final_title = user_reply
+
+    safe_title = sanitize_title(final_title)
+    queued: list[tuple[Message, int, int]] = []
+    no_episode: list[Message] = []
+    skipped = []
+    seen = set()
+    for m, meta in sorted(items, key=lambda it: (it[1].get("season") or 1, it[1].get("episode") or 0)):
+        season, episode = meta.get("season") or 1, meta.get("episode")
+        if episode is None:
+            no_episode.append(m)
+        elif (season, episode) in seen:
+            skipped.append(f"{_analysis_text(m)} (duplicate S{season:02d}E{episode:02d})")
+        else:
+            seen.add((season, episode))
+            queued.append((m, season, episode))
+
+    by_season: dict[int, list[int]] = {}
+    for _, season, episode in queued:
+        by_season.setdefault(season, []).append(episode)
+    episodes_text = "\n".join(f"S{season:02d}: {_episode_ranges(eps)}" for season, eps in sorted(by_season.items()))
+    skipped_text = (
+        f"\n\n⏭ Skipped ({len(skipped)}):\n" +
+        "\n".join(f"`{t[:60]}`" for t in skipped[:10]) +
+        (f"\n…and {len(skipped) - 10} more" if len(skipped) > 10 else "")
+    ) if skipped else ""
+    if no_episode:
+        skipped_text += f"\n\n❓ {len(no_episode)} without a detected episode — asking about them separately."
+    progress = {"ok": 0, "failed": 0}
+
+    async def render():
+        if not status_msg:
+            return
+        done = progress["ok"] + progress["failed"]
+        state = (
+            f"✅ All {len(queued)} downloaded" if done == len(queued) and not progress["failed"]
+            else f"⏳ {progress['ok']}/{len(queued)} downloaded"
+                 + (f", ❌ {progress['failed']} failed" if progress["failed"] else "")
+        )
+        try:
+            await status_msg.edit_text(f"📦 **{final_title}**\n{episodes_text}\n\n{state}{skipped_text}")
+        except FloodWait as e:
+            logger.warning(f"FloodWait: need to wait {e.value}s. Skipping burst summary update.")
+        except Exception as e:
+            logger.debug(f"Failed to update burst summary: {e}")
+
+    async def on_done(ok: bool):
+        progress["ok" if ok else "failed"] += 1
+        await render()
+
+    for m, season, episode in queued:
+        await queue_manager.add_task(
+            client, m,
+            {"canonical_name": safe_title, "season": season, "episode": episode},
+            on_done=on_done,
+        )
+    await render()
+    return no_episode
+
+
+async def _process_single_video(client: Client, message: Message):
+    media = message.video or message.document
+    status_msg = None
+    try:
+        status_msg = await message.reply_text(
+            f"⏳ Processing: `{(media.file_name or 'video.mp4')[:60]}`"
+        )
+    except Exception as e:
+        logger.warning(f"Could not reply: {e}")
+
     # ── NORMAL MODE ──────────────────────────────────────────────────────────
-    text_to_analyze = message.caption or ""
-    filename = media.file_name or "video.mp4"
-    if len(text_to_analyze) < 5:
-        text_to_analyze = filename
+    text_to_analyze = _analysis_text(message)
 
     if status_msg:
         try:
@@ -579,7 +800,7 @@ async def video_handler(client: Client, message: Message):
     logger.info(f"AI Extracted: {ai_data}")
 
     # Step B: Mapper check
-    mapped_title = mapper.get_mapping(ai_data['title'])
+    mapped_title = await mapper.aio.get_mapping(ai_data['title'])
     final_title = None
 
     if mapped_title:
@@ -593,7 +814,18 @@ async def video_handler(client: Client, message: Message):
             except Exception as e:
                 logger.debug(f"Failed to update status: {e}")
     else:
-        # Step C: Ask user for official title
+        # Step C: Ask user for official title — the download starts right
+        # away under the AI title (staged in DOWNLOAD_PATH/.pending) instead
+        # of idling until the user answers; see core.downloader.ProvisionalDownload.
+        season, episode = ai_data.get('season', 1), ai_data.get('episode')
+        provisional = ProvisionalDownload(sanitize_title(ai_data['title']), message.id)
+        await queue_manager.add_task(client, message, {
+            "canonical_name": provisional.provisional_name,
+            "season":         season,
+            "episode":        episode,
+            "provisional":    provisional,
+        }, status_msg=status_msg)
+
         search_query = quote(ai_data['title'])
         anitube_url = f"https://anitube.in.ua/index.php?do=search&subaction=search&story={search_query}"
         google_url  = f"https://www.google.com/search?q={search_query}+anime"
@@ -602,19 +834,31 @@ async def video_handler(client: Client, message: Message):
             message.chat.id,
             f"⚠️ Unknown Title: `{ai_data['title']}`\n"
             f"🔎 [Anitube]({anitube_url}) | [Google]({google_url})\n\n"
-            f"Reply with the **Official Romaji Title** to save it _(or `cancel`)_:"
+            f"Reply with the **Official Romaji Title** to save it _(or `cancel`)_\n"
+            f"_(already downloading meanwhile)_:"
         )
+        # Neither branch waits for the download (it may be far back in the
+        # queue) — the file is renamed or discarded in the background.
         if not user_reply:
+            provisional.cancel()
+            provisional.finalize_later(season, episode)  # discards whatever gets downloaded
             if status_msg:
                 try: await status_msg.edit_text("❌ Cancelled by user.")
                 except Exception: pass
             return
 
-        mapper.add_mapping(ai_data['title'], user_reply)
+        await mapper.aio.add_mapping(ai_data['title'], user_reply)
         final_title = user_reply
-        if status_msg:
-            try: await status_msg.edit_text(f"✅ Saved & Using: `{final_title}`")
-            except Exception: pass
+        provisional.confirm(sanitize_title(final_title))
+        logger.info(f"Title confirmed for provisional download: {ai_data['title']} -> {final_title}")
+
+        async def report(path):
+            if status_msg and path:
+                try: await status_msg.edit_text(f"✅ Saved & Using: `{final_title}`\nSaved to: `{display_path(path)}`")
+                except Exception: pass
+
+        provisional.finalize_later(season, episode, report)
+        return
 
     # Step D: Queue download
     safe_canonical_name = sanitize_title(final_title)
@@ -634,14 +878,14 @@ _CATEGORY_HINTS = {
 }
 
 
-def _tracking_list_content(category: str) -> tuple[str, InlineKeyboardMarkup | None]:
+async def _tracking_list_content(category: str) -> tuple[str, InlineKeyboardMarkup | None]:
     """
     Build message text + keyboard for the shared anime tracking list — every
     authorized user tracks the same pool of titles (and gets notified of every
     download), so the list is shared too, not scoped to whoever added a title.
     """
     label = _CATEGORY_LABELS.get(category, category.capitalize())
-    series_list = anime_db.get_all_active_series(category)
+    series_list = await anime_db.aio.get_all_active_series(category)
     if not series_list:
         return (
             f"📋 **{label} / відстеження**\n\n"
@@ -658,7 +902,7 @@ def _tracking_list_content(category: str) -> tuple[str, InlineKeyboardMarkup | N
     ]]
     for s in series_list:
         started = s["started_at"][:10]
-        display = anime_db.resolve_display_title(s)  # backfills legacy rows via mapper.db reverse lookup
+        display = await anime_db.aio.resolve_display_title(s)  # backfills legacy rows via mapper.db reverse lookup
 
         text += (
             f"• **{display}**\n"
@@ -675,8 +919,8 @@ async def anime_stopask_callback(client: Client, query: CallbackQuery):
     """First tap on ⏹ — ask for confirmation instead of stopping immediately,
     since a stray tap would otherwise silently unsubscribe/unfile a channel."""
     series_id = int(query.data.split("_")[-1])
-    series = anime_db.get_series_by_id(series_id)
-    title = anime_db.resolve_display_title(series) if series else f"#{series_id}"
+    series = await anime_db.aio.get_series_by_id(series_id)
+    title = await anime_db.aio.resolve_display_title(series) if series else f"#{series_id}"
     await query.answer()
     kb = InlineKeyboardMarkup([[
         InlineKeyboardButton("✅ Так, зупинити", callback_data=f"anime_stopyes_{series_id}"),
@@ -691,11 +935,11 @@ async def anime_stopask_callback(client: Client, query: CallbackQuery):
 @app.on_callback_query(auth_filter & filters.regex("^anime_stopyes_"))
 async def anime_stopyes_callback(client: Client, query: CallbackQuery):
     series_id = int(query.data.split("_")[-1])
-    series = anime_db.get_series_by_id(series_id)
-    title = anime_db.resolve_display_title(series) if series else f"#{series_id}"
+    series = await anime_db.aio.get_series_by_id(series_id)
+    title = await anime_db.aio.resolve_display_title(series) if series else f"#{series_id}"
     category = series["category"] if series else "anime"
 
-    anime_db.stop_series(series_id)
+    await anime_db.aio.stop_series(series_id)
     await query.answer(f"⏹ Зупинено: {title}")
 
     if series:
@@ -707,7 +951,7 @@ async def anime_stopyes_callback(client: Client, query: CallbackQuery):
             logger.warning(f"cleanup() on manual stop failed: {e}")
 
     # Refresh the list in-place (same category the stopped title belonged to)
-    text, kb = _tracking_list_content(category)
+    text, kb = await _tracking_list_content(category)
     try:
         await query.message.edit_text(text, reply_markup=kb)
     except Exception:
@@ -717,11 +961,11 @@ async def anime_stopyes_callback(client: Client, query: CallbackQuery):
 @app.on_callback_query(auth_filter & filters.regex("^anime_stopcancel_"))
 async def anime_stopcancel_callback(client: Client, query: CallbackQuery):
     series_id = int(query.data.split("_")[-1])
-    series = anime_db.get_series_by_id(series_id)
+    series = await anime_db.aio.get_series_by_id(series_id)
     category = series["category"] if series else "anime"
     await query.answer("Скасовано")
 
-    text, kb = _tracking_list_content(category)
+    text, kb = await _tracking_list_content(category)
     try:
         await query.message.edit_text(text, reply_markup=kb)
     except Exception:
@@ -734,14 +978,14 @@ async def anime_stopcancel_callback(client: Client, query: CallbackQuery):
 # with the correct one (e.g. the dub) — the bot has already marked that
 # episode downloaded and won't revisit it on its own. ──────────────────────
 
-def _fix_series_label(s) -> str:
+async def _fix_series_label(s) -> str:
     status = "🟢" if s["active"] else "⏹"
-    return f"{status} {anime_db.resolve_display_title(s)}"
+    return f"{status} {await anime_db.aio.resolve_display_title(s)}"
 
 
 @app.on_callback_query(auth_filter & filters.regex("^anime_fixlist$"))
 async def anime_fixlist_callback(client: Client, query: CallbackQuery):
-    series_list = anime_db.get_recent_series()
+    series_list = await anime_db.aio.get_recent_series()
     await query.answer()
     if not series_list:
         try:
@@ -756,9 +1000,10 @@ async def anime_fixlist_callback(client: Client, query: CallbackQuery):
         return
 
     buttons = [
-        [InlineKeyboardButton(_fix_series_label(s), callback_data=f"anime_fixsel_{s['id']}")]
+        [InlineKeyboardButton(await _fix_series_label(s), callback_data=f"anime_fixsel_{s['id']}")]
         for s in series_list
     ]
+    buttons.append([InlineKeyboardButton("🩺 Перевірити файли", callback_data="anime_fixverify")])
     buttons.append([InlineKeyboardButton("⬅ Назад", callback_data="anime_fixback")])
     try:
         await query.message.edit_text(
@@ -769,10 +1014,73 @@ async def anime_fixlist_callback(client: Client, query: CallbackQuery):
         pass
 
 
+# Broken files listed (with 🔄 buttons) after a 🩺 run — a Telegram message
+# holds at most ~100 inline buttons and 4096 characters.
+MAX_VERIFY_LISTED = 30
+
+
+@app.on_callback_query(auth_filter & filters.regex("^anime_fixverify$"))
+async def anime_fixverify_callback(client: Client, query: CallbackQuery):
+    """Runs anime_tracker.verifier over the recent titles and lists broken/missing files."""
+    await query.answer("🩺 Перевіряю файли...")
+    status = None
+    try:
+        status = await query.message.reply_text("🩺 Перевіряю скачані епізоди (ffprobe)...")
+    except Exception:
+        pass
+
+    last_edit = 0.0
+
+    async def _progress(done: int, total: int):
+        nonlocal last_edit
+        now = time.monotonic()
+        if status and (done == total or now - last_edit >= 5):
+            last_edit = now
+            await status.edit_text(f"🩺 Перевіряю скачані епізоди: {done}/{total}")
+
+    async def _run():
+        try:
+            found = await anime_verifier.verify_library(progress=_progress)
+        except Exception as e:
+            logger.error(f"Library verify failed: {e}", exc_info=True)
+            if status:
+                try:
+                    await status.edit_text(f"❌ Перевірка не вдалась: `{e}`")
+                except Exception:
+                    pass
+            return
+        if not status:
+            return
+        if not found:
+            try:
+                await status.edit_text("✅ Перевірка завершена — всі файли в порядку.")
+            except Exception:
+                pass
+            return
+        lines, buttons = [], []
+        for f in found[:MAX_VERIFY_LISTED]:
+            label = f"{f['title']} S{f['season']:02d}E{f['episode']:02d}"
+            lines.append(f"🩺 {label} — `{(f['reason'] or '')[:60]}`")
+            buttons.append([InlineKeyboardButton(
+                f"🔄 {label}"[:60],
+                callback_data=f"anime_fixredl_{f['series_id']}_{f['season']}_{f['episode']}"
+            )])
+        more = f"\n…і ще {len(found) - MAX_VERIFY_LISTED}" if len(found) > MAX_VERIFY_LISTED else ""
+        try:
+            await status.edit_text(
+                f"🩺 **Проблемні файли: {len(found)}**\n" + "\n".join(lines) + more,
+                reply_markup=InlineKeyboardMarkup(buttons)
+            )
+        except Exception:
+            pass
+
+    asyncio.create_task(_run())
+
+
 @app.on_callback_query(auth_filter & filters.regex("^anime_fixback$"))
 async def anime_fixback_callback(client: Client, query: CallbackQuery):
     await query.answer()
-    text, kb = _tracking_list_content("anime")
+    text, kb = await _tracking_list_content("anime")
     try:
         await query.message.edit_text(text, reply_markup=kb)
     except Exception:
@@ -780,16 +1088,18 @@ async def anime_fixback_callback(client: Client, query: CallbackQuery):
 
 
 async def _show_fix_episodes(query: CallbackQuery, series_id: int):
-    series = anime_db.get_series_by_id(series_id)
+    series = await anime_db.aio.get_series_by_id(series_id)
     if not series:
         try:
             await query.message.edit_text("Тайтл не знайдено (можливо, видалений).")
         except Exception:
             pass
         return
-    display = anime_db.resolve_display_title(series)
-    episodes = anime_db.get_episodes(series_id)
-    if not episodes:
+    display = await anime_db.aio.resolve_display_title(series)
+    episodes = await anime_db.aio.get_episodes(series_id)
+    failures = await anime_db.aio.get_download_failures(series_id)
+    bad_files = await anime_db.aio.get_failed_checks(series_id)
+    if not episodes and not failures:
         try:
             await query.message.edit_text(
                 f"🔧 **{display}**: немає скачаних епізодів у базі.",
@@ -804,15 +1114,37 @@ async def _show_fix_episodes(query: CallbackQuery, series_id: int):
     buttons = []
     for ep in episodes:
         label = f"S{ep['season']:02d}E{ep['episode']:02d}"
+        # 🩺 = the last "Перевірити файли" run found this file broken.
+        if (ep["season"], ep["episode"]) in bad_files:
+            label = f"🩺 {label}"
         buttons.append([
             InlineKeyboardButton(f"🗑 {label}", callback_data=f"anime_fixdelask_{series_id}_{ep['season']}_{ep['episode']}"),
             InlineKeyboardButton(f"🔄 {label}", callback_data=f"anime_fixredl_{series_id}_{ep['season']}_{ep['episode']}"),
         ])
+    # Episodes the checker failed to download (retry ledger) — 💀 = gave up
+    # after MAX_DOWNLOAD_ATTEMPTS, ⚠️ = still retrying on its own.
+    failure_lines = []
+    for f in failures:
+        label = f"S{f['season']:02d}E{f['episode']:02d}"
+        mark = "💀" if f["dead"] else "⚠️"
+        failure_lines.append(f"{mark} {label} — спроб: {f['attempts']}, `{(f['last_error'] or '')[:80]}`")
+        buttons.append([
+            InlineKeyboardButton(f"{mark} 🔄 {label}", callback_data=f"anime_fixredl_{series_id}_{f['season']}_{f['episode']}"),
+        ])
     buttons.append([InlineKeyboardButton("⬅ Назад", callback_data="anime_fixlist")])
+    failures_text = (
+        "\n\n**Не вдалось завантажити:**\n" + "\n".join(failure_lines) if failure_lines else ""
+    )
+    if bad_files:
+        failures_text += "\n\n**Пошкоджені файли:**\n" + "\n".join(
+            f"🩺 S{season:02d}E{episode:02d} — `{(reason or '')[:80]}`"
+            for (season, episode), reason in sorted(bad_files.items())
+        )
     try:
         await query.message.edit_text(
             f"🔧 **{display}** — скачані епізоди:\n"
-            f"🗑 видалити (з диску і бази) · 🔄 перезавантажити (перекачати заново з каналу)",
+            f"🗑 видалити (з диску і бази) · 🔄 перезавантажити (перекачати заново з каналу)"
+            f"{failures_text}",
             reply_markup=InlineKeyboardMarkup(buttons)
         )
     except Exception:
@@ -830,8 +1162,8 @@ async def anime_fixsel_callback(client: Client, query: CallbackQuery):
 async def anime_fixdelask_callback(client: Client, query: CallbackQuery):
     parts = query.data.split("_")
     series_id, season, episode = int(parts[-3]), int(parts[-2]), int(parts[-1])
-    series = anime_db.get_series_by_id(series_id)
-    display = anime_db.resolve_display_title(series) if series else f"#{series_id}"
+    series = await anime_db.aio.get_series_by_id(series_id)
+    display = await anime_db.aio.resolve_display_title(series) if series else f"#{series_id}"
     await query.answer()
     kb = InlineKeyboardMarkup([[
         InlineKeyboardButton("✅ Так, видалити", callback_data=f"anime_fixdelyes_{series_id}_{season}_{episode}"),
@@ -851,11 +1183,11 @@ async def anime_fixdelask_callback(client: Client, query: CallbackQuery):
 async def anime_fixdelyes_callback(client: Client, query: CallbackQuery):
     parts = query.data.split("_")
     series_id, season, episode = int(parts[-3]), int(parts[-2]), int(parts[-1])
-    series = anime_db.get_series_by_id(series_id)
+    series = await anime_db.aio.get_series_by_id(series_id)
     if not series:
         await query.answer("Тайтл не знайдено.")
         return
-    file_deleted = anime_fixer.delete_episode(series, season, episode)
+    file_deleted = await anime_fixer.delete_episode(series, season, episode)
     await query.answer("🗑 Видалено (файл + запис у базі)" if file_deleted else "🗑 Запис видалено (файл на диску не знайдено)")
     await _show_fix_episodes(query, series_id)
 
@@ -864,11 +1196,11 @@ async def anime_fixdelyes_callback(client: Client, query: CallbackQuery):
 async def anime_fixredl_callback(client: Client, query: CallbackQuery):
     parts = query.data.split("_")
     series_id, season, episode = int(parts[-3]), int(parts[-2]), int(parts[-1])
-    series = anime_db.get_series_by_id(series_id)
+    series = await anime_db.aio.get_series_by_id(series_id)
     if not series:
         await query.answer("Тайтл не знайдено.")
         return
-    display = anime_db.resolve_display_title(series)
+    display = await anime_db.aio.resolve_display_title(series)
     await query.answer(f"🔄 Перезавантажую S{season:02d}E{episode:02d}...")
 
     status = None
@@ -895,21 +1227,15 @@ async def anime_fixredl_callback(client: Client, query: CallbackQuery):
 
 async def _run_checkall(client: Client, series_list: list, status_msg: Message):
     """
-    Run process_series for every title, then finalize the status message.
-    Strictly sequential, WITH a pause between titles — not asyncio.gather.
-    This all runs through ONE userbot account, so firing every title's
-    Telegram API calls back-to-back (even non-concurrently, with no pause)
-    was still enough to trip FLOOD_WAIT once there were more than a couple
-    of tracked titles; there's no real parallelism to gain here anyway.
+    Run the checker over every title, then finalize the status message.
+    Same path as the background cycle (anime_checker.check_series_batch):
+    titles sharing a channel are listed in one pass, then processed a few at
+    a time — the userbot's API calls are paced by anime_tracker/api_scheduler.py.
     """
     try:
-        for i, s in enumerate(series_list):
-            try:
-                await anime_checker.process_series(s, client)
-            except Exception as e:
-                logger.error(f"checkall: error processing '{s['title']}': {e}")
-            if i < len(series_list) - 1:
-                await asyncio.sleep(anime_checker.INTER_SERIES_DELAY_SECONDS)
+        await anime_checker.check_series_batch(series_list, client)
+    except Exception as e:
+        logger.error(f"checkall failed: {e}", exc_info=True)
     finally:
         try:
             await status_msg.edit_text(f"✅ Перевірку завершено ({len(series_list)} тайтлів).")
@@ -920,7 +1246,7 @@ async def _run_checkall(client: Client, series_list: list, status_msg: Message):
 @app.on_callback_query(auth_filter & filters.regex("^anime_checkall_"))
 async def anime_checkall_callback(client: Client, query: CallbackQuery):
     category = query.data.replace("anime_checkall_", "", 1)
-    series_list = anime_db.get_all_active_series(category)
+    series_list = await anime_db.aio.get_all_active_series(category)
     if not series_list:
         await query.answer("Немає активних тайтлів.")
         return
@@ -937,7 +1263,7 @@ async def anime_checkall_callback(client: Client, query: CallbackQuery):
 ANIME_HELP = (
     "🎬 **Аніме — авто-відстеження нових серій**\n\n"
     "Скинь посилання на топік у Telegram-каналі (медіатеці) — тайтл одразу "
-    "додається до відстеження. Бот перевірятиме нові серії кожні **6 годин**.\n\n"
+    "додається до відстеження. Нові серії бот підхоплює одразу після публікації (повна звірка — раз на добу).\n\n"
     "**Як додати:**\n"
     "Просто кинь посилання боту (можна без команди):\n"
     "`https://t.me/КаналНазва/12345`\n"
@@ -1067,7 +1393,7 @@ async def _track_anime_url(client: Client, message: Message, url: str):
     raw_title = await handler.get_series_title(url)
 
     if raw_title:
-        mapped_title = mapper.get_mapping(raw_title)
+        mapped_title = await mapper.aio.get_mapping(raw_title)
         if mapped_title:
             title = mapped_title  # known title — zero friction
         else:
@@ -1084,7 +1410,7 @@ async def _track_anime_url(client: Client, message: Message, url: str):
                 try: await status.edit_text("❌ Скасовано.")
                 except Exception: pass
                 return
-            mapper.add_mapping(raw_title, title)
+            await mapper.aio.add_mapping(raw_title, title)
     else:
         title = await ask_user_fresh(
             chat_id,
@@ -1097,7 +1423,7 @@ async def _track_anime_url(client: Client, message: Message, url: str):
 
     # Prevent adding the same title twice (e.g. via two different channels'
     # links for the same anime) — check by the resolved official title.
-    existing_series = anime_db.find_active_series_by_title(title, category="anime")
+    existing_series = await anime_db.aio.find_active_series_by_title(title, category="anime")
     if existing_series:
         try:
             await status.edit_text(
@@ -1108,17 +1434,17 @@ async def _track_anime_url(client: Client, message: Message, url: str):
         return
 
     display_title = raw_title or title
-    series_id = anime_db.add_series(chat_id, title, url, category="anime", display_title=display_title)
-    series_row = anime_db.get_series_by_id(series_id)
+    series_id = await anime_db.aio.add_series(chat_id, title, url, category="anime", display_title=display_title)
+    series_row = await anime_db.aio.get_series_by_id(series_id)
 
     # Pre-seed episodes already present on disk (e.g. from earlier manual
     # Normal/Batch downloads of this same anime) so the checker doesn't
     # re-download from scratch — a plain filename scan, no AI needed since
     # the naming convention ("... - SxxExx.ext") is fixed and unambiguous.
     existing_folder = os.path.join(settings.DOWNLOAD_PATH, sanitize_title(title))
-    existing_episodes = scan_existing_episodes(existing_folder)
+    existing_episodes = await asyncio.to_thread(scan_existing_episodes, existing_folder)
     if existing_episodes:
-        anime_db.seed_downloaded_episodes(series_id, existing_episodes)
+        await anime_db.aio.seed_downloaded_episodes(series_id, existing_episodes)
         logger.info(
             f"[{title}] знайдено {len(existing_episodes)} вже наявних серій на диску."
         )
@@ -1136,9 +1462,16 @@ async def _track_anime_url(client: Client, message: Message, url: str):
     except Exception:
         pass
 
-    asyncio.create_task(
-        anime_checker.process_series(series_row, client, initial_status_msg=status)
-    )
+    asyncio.create_task(_initial_check(series_row, client, status))
+
+
+async def _initial_check(series_row, client: Client, status: Message):
+    """
+    First check of a newly added title, then re-index real-time routing —
+    a private channel only gets its chat id once the first check joins it.
+    """
+    await anime_checker.process_series(series_row, client, initial_status_msg=status)
+    await anime_realtime.refresh_index()
 
 
 @app.on_message(auth_filter & filters.command("anime"))
@@ -1151,46 +1484,102 @@ async def anime_command(client: Client, message: Message):
         return
 
     if not arg or arg == "list":
-        text, kb = _tracking_list_content("anime")
+        text, kb = await _tracking_list_content("anime")
         await message.reply_text(text, reply_markup=kb)
         return
 
     await _track_anime_url(client, message, arg)
 
 
+async def _notify_all_users(text: str, fallback_chats=()):
+    """
+    Send a service notice (e.g. low disk space) to every allowed user — or,
+    with no allow-list configured, to `fallback_chats` (the chats the
+    affected jobs belong to), like the checker's download notices.
+    """
+    for uid in settings.allowed_users_set or fallback_chats:
+        try:
+            await app.send_message(uid, text)
+        except Exception as e:
+            logger.warning(f"Failed to notify {uid}: {e}")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _log_warm_up(task: asyncio.Task):
+    if task.cancelled():
+        return
+    if task.exception():
+        logger.warning(f"AI client warm-up failed (it will load on first use): {task.exception()}")
+    else:
+        logger.info("AI client warmed up")
+
+
 if __name__ == "__main__":
     logger.info("Bot starting...")
 
     async def main():
-        anime_db.init_db()
+        # Startup timing report — each phase's wall time, logged once the bot answers.
+        phases = [("imports", time.perf_counter() - PROCESS_START)]
+        mark = time.perf_counter()
+
+        def phase(name: str):
+            nonlocal mark
+            now = time.perf_counter()
+            phases.append((name, now - mark))
+            mark = now
 
-        await app.start()
+        anime_db.init_db()
+        await asyncio.to_thread(discard_stale_pending)
+        phase("db init")
 
+        # Bot and userbot connect (and, for the userbot, sync its session)
+        # concurrently — previously strictly one after the other.
         userbot = build_userbot_client()
+        await asyncio.gather(app.start(), *([userbot.start()] if userbot else []))
+        disk_gate.set_notifier(_notify_all_users)
+        phase("clients start")
+
+        async def register_commands():
+            await app.set_bot_commands([
+                BotCommand("start", "Welcome & your User ID"),
+                BotCommand("id", "Get your Telegram User ID"),
+                BotCommand("help", "This message"),
+                BotCommand("mode", "Switch operating mode"),
+                BotCommand("anime", "Авто-відстеження аніме за посиланням"),
+            ])
+            logger.info("Bot commands registered")
+
         if userbot:
-            await userbot.start()
             logger.info("Userbot client started (Telegram-source anime tracking enabled)")
+            anime_realtime.install(userbot, app)
+            # Bot API call and userbot topic resolution don't depend on each other.
+            await asyncio.gather(register_commands(), anime_realtime.refresh_index())
+        else:
+            await register_commands()
+        phase("commands + realtime index")
 
-        await app.set_bot_commands([
-            BotCommand("start", "Welcome & your User ID"),
-            BotCommand("id", "Get your Telegram User ID"),
-            BotCommand("help", "This message"),
-            BotCommand("mode", "Switch operating mode"),
-            BotCommand("anime", "Авто-відстеження аніме за посиланням"),
-        ])
-        logger.info("Bot commands registered")
-
+        db_executor.start_lag_monitor()
         worker_task  = asyncio.create_task(queue_manager.worker())
-        checker_task = asyncio.create_task(anime_checker.run_checker(app))
+        checker_task = asyncio.create_task(anime_checker.run_checker(app, realtime_covered=anime_realtime.covered))
         logger.info("Queue worker started")
         logger.info("Anime checker started")
+        phase("background tasks")
+        logger.info(
+            f"Startup took {time.perf_counter() - PROCESS_START:.2f}s: "
+            + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in phases)
+        )
+        # openai is imported lazily — load it now, in the background, so the
+        # first forwarded video doesn't pay for it.
+        warm_up_task = asyncio.create_task(warm_up_ai())
+        warm_up_task.add_done_callback(_log_warm_up)
 
         await idle()
 
         worker_task.cancel()
         checker_task.cancel()
+        db_executor.log_stats()
+        api_scheduler.log_stats()
         if userbot:
             await userbot.stop()
         await app.stop()